@@ -0,0 +1,7 @@
+"""
+Benchmarks for the Medical Expert System backend.
+
+Run from the backend directory, e.g.:
+    python -m benchmarks.bench_keyword_matcher
+    python -m benchmarks.bench_library run --baseline benchmarks/baseline.json
+"""
@@ -0,0 +1,157 @@
+"""
+Benchmark: chat streaming latency during a burst of diagnoses.
+
+Starts the stub LLM server and one uvicorn worker per mode, then keeps
+--diagnose-clients clients posting the worst-case diagnosis in a loop
+while --streams clients stream chat replies, and reports diagnosis
+throughput and shed requests next to the streams' time to first chunk and
+the gaps between chunks. Every chunk is written by the worker's event loop,
+so the gaps show how long the loop was held up by diagnoses:
+
+    thread  DIAGNOSIS_PROCESSES=0: diagnoses run in a thread of the worker
+    pool    DIAGNOSIS_PROCESSES=N: diagnoses run in the process pool
+
+Usage:
+    python -m benchmarks.bench_event_loop [--processes 2] [--diagnose-clients 16]
+        [--streams 4] [--duration 10] [--output event_loop.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.bench_memory import free_port, wait_ready
+from benchmarks.cases import WORST_CASE
+
+
+DIAGNOSE_BODY = {
+    "symptoms": WORST_CASE["symptoms"],
+    "patient": WORST_CASE["patient_info"],
+    "lab_results": WORST_CASE["lab_results"],
+    "dehydration_signs": WORST_CASE["dehydration_signs"],
+}
+
+CHAT_BODY = {"message": "I have had fever, chills and heavy sweating every other day since my trip."}
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def diagnose_loop(client: httpx.AsyncClient, deadline: float, statuses: Dict[int, int]) -> None:
+    while time.monotonic() < deadline:
+        response = await client.post("/api/expert/diagnose", json=DIAGNOSE_BODY)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code in (429, 503):
+            # A shed client backs off briefly, as a real one would honour Retry-After
+            await asyncio.sleep(0.05)
+
+
+async def stream_loop(client: httpx.AsyncClient, deadline: float, first_chunk: List[float],
+                      gaps: List[float]) -> None:
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        last = None
+        async with client.stream("POST", "/api/chat/message/stream", json=CHAT_BODY) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                now = time.perf_counter()
+                if last is None:
+                    first_chunk.append(now - started)
+                else:
+                    gaps.append(now - last)
+                last = now
+
+
+async def drive(port: int, diagnose_clients: int, streams: int, duration: float) -> Dict:
+    statuses: Dict[int, int] = {}
+    first_chunk: List[float] = []
+    gaps: List[float] = []
+    limits = httpx.Limits(max_connections=diagnose_clients + streams)
+    async with httpx.AsyncClient(base_url=f"http://localhost:{port}", timeout=60.0, limits=limits) as client:
+        deadline = time.monotonic() + duration
+        await asyncio.gather(
+            *(diagnose_loop(client, deadline, statuses) for _ in range(diagnose_clients)),
+            *(stream_loop(client, deadline, first_chunk, gaps) for _ in range(streams)),
+        )
+    return {
+        "diagnoses_per_second": statuses.get(200, 0) / duration,
+        "diagnoses_shed": statuses.get(429, 0) + statuses.get(503, 0),
+        "diagnose_statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "streams": len(first_chunk),
+        "first_chunk_p50_ms": statistics.median(first_chunk) * 1000 if first_chunk else 0.0,
+        "first_chunk_p99_ms": percentile(first_chunk, 0.99) * 1000,
+        "gap_p50_ms": statistics.median(gaps) * 1000 if gaps else 0.0,
+        "gap_p99_ms": percentile(gaps, 0.99) * 1000,
+        "gap_max_ms": max(gaps, default=0.0) * 1000,
+    }
+
+
+def measure(mode: str, processes: int, args) -> Dict:
+    stub_port, port = free_port(), free_port()
+    stub = subprocess.Popen([sys.executable, "-m", "tools.stub_llm_server", "--port", str(stub_port),
+                             "--ttft", "fixed:0.05", "--tokens-per-sec", "100", "--seed", "1"])
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="src.config.settings_api", METRICS_MULTIPROCESS="0",
+               TRACE_SAMPLE_RATE="0", SLOW_REQUEST_MS="0", GROQ_API_KEY="stub",
+               OPEN_API_BASE_URL=f"http://127.0.0.1:{stub_port}",
+               DIAGNOSIS_PROCESSES=str(processes), DIAGNOSIS_MAX_QUEUE=str(args.max_queue))
+    # Cached replies would skip the upstream and stream in one burst
+    env.pop("LLM_CACHE_BACKEND", None)
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "src.config.asgi:app", "--port", str(port),
+                               "--log-level", "warning"], env=env)
+    try:
+        wait_ready(port, workers=1)
+        result = asyncio.run(drive(port, args.diagnose_clients, args.streams, args.duration))
+    finally:
+        for process in (server, stub):
+            process.terminate()
+            process.wait(timeout=30)
+    return {"mode": mode, "processes": processes, **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat streaming latency during a burst of diagnoses")
+    parser.add_argument("--processes", type=int, default=2, help="DIAGNOSIS_PROCESSES in pool mode")
+    parser.add_argument("--max-queue", type=int, default=16, help="DIAGNOSIS_MAX_QUEUE in pool mode")
+    parser.add_argument("--diagnose-clients", type=int, default=16, help="Concurrent diagnosis clients")
+    parser.add_argument("--streams", type=int, default=4, help="Concurrent chat streams")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for mode, processes in (("thread", 0), ("pool", args.processes)):
+        print(f"  {mode} ...", file=sys.stderr)
+        results.append(measure(mode, processes, args))
+
+    print(f"{'mode':<8} {'diag/s':>8} {'shed':>6} {'streams':>8} {'first p50':>10} {'first p99':>10} "
+          f"{'gap p50':>8} {'gap p99':>8} {'gap max':>8}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['diagnoses_per_second']:>8.1f} {r['diagnoses_shed']:>6} {r['streams']:>8} "
+              f"{r['first_chunk_p50_ms']:>10.1f} {r['first_chunk_p99_ms']:>10.1f} {r['gap_p50_ms']:>8.1f} "
+              f"{r['gap_p99_ms']:>8.1f} {r['gap_max_ms']:>8.1f}")
+    print("(latencies in ms)")
+
+    if args.output:
+        from benchmarks.harness import environment
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
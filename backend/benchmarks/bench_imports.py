@@ -0,0 +1,126 @@
+"""
+Benchmark: import cost of a cold worker.
+
+Runs a fresh interpreter under `python -X importtime` that imports the ASGI
+application and loads the URLconf (everything a worker imports before it
+can answer its first request), several times, and reports the median
+total, self time grouped by top-level package and the most expensive
+modules. The first run, which also writes .pyc files, is discarded.
+
+Usage:
+    python -m benchmarks.bench_imports [--runs 7] [--top 20] [--output imports.json]
+        [--baseline benchmarks/imports_baseline.json] [--threshold 0.10]
+
+With --baseline, exits non-zero when the median total grew by more than
+the threshold. Refresh the committed baseline with
+`make bench-imports-baseline`.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+COLD_START = (
+    "import src.config.asgi\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every line of -X importtime output."""
+    entries = []
+    for line in output.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def run_once(settings_module: str) -> List[Tuple[str, int, int, int]]:
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module, METRICS_MULTIPROCESS="0")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", COLD_START],
+                            env=env, capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def summarize(runs: List[List[Tuple[str, int, int, int]]], top: int) -> Dict:
+    totals, packages, modules = [], defaultdict(list), defaultdict(list)
+    for entries in runs:
+        totals.append(sum(cumulative for _, _, cumulative, depth in entries if depth == 0) / 1000)
+        per_package = defaultdict(int)
+        for module, self_us, _, _ in entries:
+            per_package[module.split(".")[0]] += self_us
+            modules[module].append(self_us / 1000)
+        for package, self_us in per_package.items():
+            packages[package].append(self_us / 1000)
+    package_ms = {name: statistics.median(values) for name, values in packages.items()}
+    module_ms = {name: statistics.median(values) for name, values in modules.items()}
+    return {
+        "total_ms": statistics.median(totals),
+        "total_mad_ms": statistics.median(abs(t - statistics.median(totals)) for t in totals),
+        "modules_imported": statistics.median(len(entries) for entries in runs),
+        "packages": dict(sorted(package_ms.items(), key=lambda item: -item[1])[:top]),
+        "modules": dict(sorted(module_ms.items(), key=lambda item: -item[1])[:top]),
+        "app_modules": dict(sorted(((m, ms) for m, ms in module_ms.items() if m.startswith("src.")),
+                                   key=lambda item: -item[1])[:top]),
+    }
+
+
+def print_summary(summary: Dict) -> None:
+    print(f"cold-start imports: {summary['total_ms']:.1f} ms ± {summary['total_mad_ms']:.1f} "
+          f"({summary['modules_imported']:.0f} modules)\n")
+    for title, key in (("self time by package", "packages"), ("slowest modules (self)", "modules"),
+                       ("slowest app modules (self)", "app_modules")):
+        print(f"{title:<44} {'ms':>8}")
+        for name, ms in summary[key].items():
+            print(f"  {name:<42} {ms:>8.1f}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time of a cold worker (python -X importtime)")
+    parser.add_argument("--runs", type=int, default=7, help="Timed interpreter runs")
+    parser.add_argument("--top", type=int, default=20, help="Rows per table")
+    parser.add_argument("--settings", default="src.config.settings_api", help="DJANGO_SETTINGS_MODULE")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--baseline", help="Compare with a previous --output file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed relative growth of the total against the baseline")
+    args = parser.parse_args()
+
+    run_once(args.settings)  # compiles .pyc files
+    summary = summarize([run_once(args.settings) for _ in range(args.runs)], args.top)
+    print_summary(summary)
+
+    if args.output:
+        from benchmarks.harness import environment
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "settings": args.settings, **summary}, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        change = summary["total_ms"] / baseline["total_ms"] - 1
+        print(f"total vs baseline: {baseline['total_ms']:.1f} -> {summary['total_ms']:.1f} ms ({change:+.1%})")
+        # Differences within the run-to-run noise are not regressions
+        if change > args.threshold and summary["total_ms"] - baseline["total_ms"] > 2 * summary["total_mad_ms"]:
+            print(f"Import time regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark: diagnosis throughput across CPython versions.
+
+Runs the expert system (engine construction, run_diagnosis on the
+run_quick_test scenarios and the worst case) in each given interpreter
+and prints the per-call medians side by side, with the speed-up over the
+first interpreter. Every interpreter must produce identical diagnoses and
+recommendations for all cases; the run fails otherwise, which makes this
+the compatibility check for the experta shim (src/lib/expert_system/compat.py)
+as well.
+
+The engine needs only experta and its pinned dependencies, so --setup
+creates a venv per interpreter (in the temp directory) with just the
+experta requirement from requirements.txt; without it the interpreters
+must already have experta installed.
+
+Usage:
+    python -m benchmarks.bench_interpreters [--python python3.8 python3.12 ...] [--setup]
+        [--samples 15] [--output interpreters.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+CANDIDATES = [f"python3.{minor}" for minor in range(8, 14)]
+
+
+def measure(samples: int, min_time: float) -> Dict:
+    """Run in the child interpreter: time the cases and digest their results."""
+    import platform
+
+    from benchmarks.cases import QUICK_TEST_CASES, WORST_CASE
+    from benchmarks.harness import Suite, run_benchmark
+    from src.lib.expert_system.diagnosis_engine import MedicalDiagnosisEngine, run_diagnosis
+
+    cases = {**QUICK_TEST_CASES, "worst_case": WORST_CASE}
+    digest = hashlib.sha256(json.dumps(
+        {name: run_diagnosis(**case) for name, case in cases.items()}, sort_keys=True, default=str,
+    ).encode()).hexdigest()
+
+    suite = Suite()
+    suite.add("engine_init", MedicalDiagnosisEngine, description="MedicalDiagnosisEngine() construction")
+    for name, case in cases.items():
+        suite.add(f"diagnose.{name}", lambda case=case: run_diagnosis(**case),
+                  description=f"run_diagnosis ({name}) on a pooled engine")
+    results = [run_benchmark(b, samples=samples, min_sample_time=min_time, allocations=False)
+               for b in suite.select()]
+    return {"python": platform.python_version(), "digest": digest, "results": results}
+
+
+def setup_venv(python: str) -> str:
+    """A venv for python with the engine's dependency installed; returns its interpreter."""
+    requirement = next(line.strip() for line in (BACKEND_DIR / "requirements.txt").read_text().splitlines()
+                       if line.strip().startswith("experta"))
+    venv = Path(tempfile.gettempdir()) / "medical-expert-bench" / Path(python).name
+    executable = venv / "bin" / "python"
+    if not executable.exists():
+        subprocess.run([python, "-m", "venv", str(venv)], check=True)
+    subprocess.run([str(executable), "-m", "pip", "install", "--quiet", requirement], check=True)
+    return str(executable)
+
+
+def run_interpreter(python: str, samples: int, min_time: float) -> Dict:
+    env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR), METRICS_MULTIPROCESS="0", TRACE_SAMPLE_RATE="0")
+    output = subprocess.run(
+        [python, "-m", "benchmarks.bench_interpreters", "--child", "--samples", str(samples),
+         "--min-time", str(min_time)],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_table(runs: List[Dict]) -> None:
+    base = runs[0]
+    names = [r["name"] for r in base["results"]]
+    header = f"{'case (median ms)':<22}" + "".join(f"{'py' + run['python']:>14}" for run in runs)
+    print(header + (f"{'speed-up':>10}" if len(runs) > 1 else ""))
+    for name in names:
+        medians = [next(r["median_ms"] for r in run["results"] if r["name"] == name) for run in runs]
+        line = f"{name:<22}" + "".join(f"{ms:>14.3f}" for ms in medians)
+        if len(runs) > 1:
+            line += f"{medians[0] / medians[-1]:>9.2f}x"
+        print(line)
+    print(f"\n{'diagnoses/s (malaria)':<22}" + "".join(
+        f"{1000 / next(r['median_ms'] for r in run['results'] if r['name'] == 'diagnose.malaria'):>14.0f}"
+        for run in runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnosis throughput across interpreter versions")
+    parser.add_argument("--python", nargs="+", help="Interpreters to compare (default: python3.8..3.13 on PATH)")
+    parser.add_argument("--setup", action="store_true", help="Create a venv with experta for each interpreter")
+    parser.add_argument("--samples", type=int, default=15, help="Timed samples per case")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Minimum seconds per sample; sets the loop count")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.samples, args.min_time)))
+        return
+
+    interpreters = args.python or [name for name in CANDIDATES if shutil.which(name)]
+    runs = []
+    for python in interpreters:
+        print(f"  {python} ...", file=sys.stderr)
+        executable = setup_venv(python) if args.setup else python
+        runs.append(run_interpreter(executable, args.samples, args.min_time))
+    print_table(runs)
+
+    mismatched = [run["python"] for run in runs if run["digest"] != runs[0]["digest"]]
+    if mismatched:
+        print(f"\nResults differ from Python {runs[0]['python']} on: {', '.join(mismatched)}")
+    else:
+        print(f"\nIdentical diagnoses on all {len(runs)} interpreters")
+
+    if args.output:
+        from benchmarks.harness import environment
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "interpreters": interpreters, "runs": runs}, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {args.output}")
+    if mismatched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: symptom/disease keyword extraction on long transcripts.
+
+Compares the original per-keyword substring scan against the precompiled
+Aho-Corasick KeywordMatcher, on the shipped vocabulary and on a synthetic
+vocabulary of thousands of clinical synonyms.
+
+Usage:
+    python -m benchmarks.bench_keyword_matcher [--turns 400] [--synonyms 5000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from src.api.routers.chat import SYMPTOM_KEYWORDS, DISEASE_KEYWORDS  # noqa: E402
+from src.lib.ai.keyword_matcher import KeywordMatcher  # noqa: E402
+
+
+SAMPLE_TURNS = [
+    "I've had a fever and chills for three days, mostly at night.",
+    "The diarrhoea is watery, almost like rice water, and I keep throwing up.",
+    "My head ache is worse in the morning and I feel exhausted all the time.",
+    "No blood in the stool but my urine looks dark, kind of like cola.",
+    "I got a flu shot last month and tweaked my back lifting boxes.",
+    "We travelled to an area with lots of mosquitoes two weeks ago.",
+    "I'm very thirsty and my mouth is dry even after drinking water.",
+]
+
+
+def naive_extract(text, vocabulary):
+    """The original extraction: substring search for every keyword."""
+    text_lower = text.lower()
+    found = []
+    for label, keywords in vocabulary.items():
+        for keyword in keywords:
+            if keyword in text_lower:
+                found.append(label)
+                break
+    return list(set(found))
+
+
+def build_transcript(turns, seed=7):
+    rng = random.Random(seed)
+    return "\n".join(rng.choice(SAMPLE_TURNS) for _ in range(turns))
+
+
+def build_synthetic_vocabulary(synonyms, seed=7):
+    """Extend the real vocabulary with synthetic multi-word clinical synonyms."""
+    rng = random.Random(seed)
+    roots = ["febrile", "gastric", "hepatic", "renal", "neuro", "dermal", "cardiac", "pulmonary"]
+    qualifiers = ["acute", "chronic", "intermittent", "persistent", "episodic", "nocturnal"]
+    vocabulary = {label: list(keywords) for label, keywords in SYMPTOM_KEYWORDS.items()}
+    vocabulary.update({label: list(keywords) for label, keywords in DISEASE_KEYWORDS.items()})
+    for i in range(synonyms):
+        label = f"synthetic_{i % 500}"
+        keyword = f"{rng.choice(qualifiers)} {rng.choice(roots)} sign{i}"
+        vocabulary.setdefault(label, []).append(keyword)
+    return vocabulary
+
+
+def time_call(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def run(turns, synonyms, repeat):
+    transcript = build_transcript(turns)
+    print(f"Transcript: {turns} turns, {len(transcript):,} chars\n")
+
+    cases = [
+        ("shipped vocabulary", {**SYMPTOM_KEYWORDS, **DISEASE_KEYWORDS}),
+        (f"+{synonyms:,} synonyms", build_synthetic_vocabulary(synonyms)),
+    ]
+    print(f"{'vocabulary':<24}{'patterns':>10}{'build ms':>10}{'naive ms':>11}{'automaton ms':>14}")
+    for name, vocabulary in cases:
+        start = time.perf_counter()
+        matcher = KeywordMatcher(vocabulary)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        naive_ms = time_call(lambda: naive_extract(transcript, vocabulary), repeat)
+        automaton_ms = time_call(lambda: matcher.ordered_labels(transcript), repeat)
+        print(f"{name:<24}{matcher.pattern_count:>10,}{build_ms:>10.1f}{naive_ms:>11.2f}{automaton_ms:>14.2f}")
+
+    # Word-boundary behaviour on the shipped vocabulary
+    matcher = KeywordMatcher(SYMPTOM_KEYWORDS)
+    sample = "I got a flu shot and tweaked my back"
+    print(f"\nFalse positives on {sample!r}:")
+    print(f"  naive:     {sorted(naive_extract(sample, SYMPTOM_KEYWORDS))}")
+    print(f"  automaton: {sorted(matcher.labels(sample))}")
+    sample = "I have headaches and fevers and a bad chill"
+    print(f"Inflected forms in {sample!r}:")
+    print(f"  naive:     {sorted(naive_extract(sample, SYMPTOM_KEYWORDS))}")
+    print(f"  automaton: {sorted(matcher.labels(sample))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=400, help="Transcript length in turns")
+    parser.add_argument("--synonyms", type=int, default=5000, help="Synthetic synonyms to add")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed repetitions per case")
+    args = parser.parse_args()
+    run(args.turns, args.synonyms, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark: library hot paths (diagnosis engine, knowledge base, prompts).
+
+Times run_diagnosis with a cold engine per call (the engine pool is off
+unless ENGINE_POOL_SIZE is set, so results stay comparable with the
+baseline), a warm reused engine, each run_quick_test scenario and a worst-case input that
+fires most rules, plus KnowledgeBase.load, get_relevant_context,
+extract_symptoms_from_text, build_system_prompt and build_diagnosis_context.
+Every case reports median/MAD/IQR timings and tracemalloc allocation counts.
+
+Usage:
+    python -m benchmarks.bench_library run [--filter diagnosis] [--output bench.json]
+        [--baseline benchmarks/baseline.json] [--threshold 0.10]
+    python -m benchmarks.bench_library compare OLD.json NEW.json [--threshold 0.10]
+
+run exits non-zero when --baseline is given and a case regressed; compare
+always does. Refresh the committed baseline with `make bench-baseline`.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.config.settings")
+os.environ.setdefault("ENGINE_POOL_SIZE", "0")
+
+import django  # noqa: E402
+
+django.setup()
+
+from benchmarks.bench_keyword_matcher import build_transcript  # noqa: E402
+from benchmarks.cases import QUICK_TEST_CASES, WORST_CASE  # noqa: E402
+from benchmarks.harness import Suite, compare, environment, run_benchmark  # noqa: E402
+from src.api.routers.chat import extract_symptoms_from_text  # noqa: E402
+from src.lib.ai.knowledge_base import KnowledgeBase  # noqa: E402
+from src.lib.ai.prompts import build_diagnosis_context, build_system_prompt  # noqa: E402
+from src.lib.expert_system.diagnosis_engine import MedicalDiagnosisEngine, run_diagnosis  # noqa: E402
+from src.lib.expert_system.facts import DehydrationSign, LabResult, Patient, Symptom  # noqa: E402
+
+
+CHAT_MESSAGE = (
+    "I've had a fever with chills and sweating every other night, a bad headache, "
+    "and since yesterday watery diarrhea and vomiting. I travelled to a malaria area last month."
+)
+
+PATIENT_INFO = {"age": 34, "is_pregnant": False, "travel_endemic_area": True, "endemic_resident": False}
+
+
+def warm_engine():
+    return MedicalDiagnosisEngine()
+
+
+def diagnose_on_engine(engine, case):
+    """run_diagnosis on a reused engine, as the engine pool does."""
+    engine.reset()
+    if case.get("patient_info"):
+        engine.declare(Patient(**case["patient_info"]))
+    for symptom in case["symptoms"]:
+        engine.declare(Symptom(**symptom))
+    for lab in case.get("lab_results") or []:
+        engine.declare(LabResult(**lab))
+    for sign in case.get("dehydration_signs") or []:
+        engine.declare(DehydrationSign(**sign))
+    engine.run()
+    return engine.get_diagnoses()
+
+
+def loaded_knowledge_base():
+    kb = KnowledgeBase()
+    kb.load()
+    return kb
+
+
+def knowledge_context():
+    return loaded_knowledge_base().get_relevant_context(
+        symptoms=["fever", "chills", "sweating"], diseases=["malaria"], query=CHAT_MESSAGE,
+    )
+
+
+def build_suite() -> Suite:
+    suite = Suite()
+
+    suite.add("diagnosis.engine_init", MedicalDiagnosisEngine,
+              description="MedicalDiagnosisEngine() construction (rule network build)")
+    suite.add("diagnosis.cold", lambda: run_diagnosis(**QUICK_TEST_CASES["malaria"]),
+              description="run_diagnosis with a new engine per call (malaria case)")
+    suite.add("diagnosis.warm", lambda engine: diagnose_on_engine(engine, QUICK_TEST_CASES["malaria"]),
+              setup=warm_engine, description="reset/declare/run on a reused engine (malaria case)")
+    for name, case in QUICK_TEST_CASES.items():
+        suite.add(f"diagnosis.quick.{name}", lambda case=case: run_diagnosis(**case),
+                  description=f"run_quick_test {name} scenario")
+    suite.add("diagnosis.worst_case", lambda: run_diagnosis(**WORST_CASE),
+              description="every symptom, exposure, positive lab and severe dehydration")
+    suite.add("diagnosis.worst_case_warm", lambda engine: diagnose_on_engine(engine, WORST_CASE),
+              setup=warm_engine, description="worst case on a reused engine")
+
+    suite.add("knowledge.load", loaded_knowledge_base,
+              description="KnowledgeBase().load() (read, chunk and index markdown)")
+    suite.add("knowledge.relevant_context",
+              lambda kb: kb.get_relevant_context(
+                  symptoms=["fever", "chills", "sweating"], diseases=["malaria"], query=CHAT_MESSAGE,
+              ),
+              setup=loaded_knowledge_base, description="get_relevant_context on a loaded knowledge base")
+    suite.add("knowledge.relevant_context_query_only",
+              lambda kb: kb.get_relevant_context(query=CHAT_MESSAGE),
+              setup=loaded_knowledge_base, description="get_relevant_context from free text only")
+
+    suite.add("chat.extract_symptoms", lambda: extract_symptoms_from_text(CHAT_MESSAGE),
+              description="extract_symptoms_from_text on one message")
+    suite.add("chat.extract_symptoms_transcript", extract_symptoms_from_text,
+              setup=lambda: build_transcript(400), description="extract_symptoms_from_text on a 400-turn transcript")
+
+    suite.add("prompts.system_prompt", build_system_prompt, description="build_system_prompt()")
+    suite.add("prompts.diagnosis_context",
+              lambda context: build_diagnosis_context(
+                  symptoms=["fever", "chills", "sweating", "headache"],
+                  patient_info=PATIENT_INFO,
+                  knowledge_context=context,
+              ),
+              setup=knowledge_context, description="build_diagnosis_context with five retrieved chunks")
+    return suite
+
+
+def print_results(results):
+    print(f"{'case':<40} {'median ms':>10} {'mad':>8} {'iqr':>8} {'min':>9} {'loops':>7} "
+          f"{'net blk':>8} {'peak KB':>9}")
+    for r in results:
+        print(f"{r['name']:<40} {r['median_ms']:>10.4f} {r['mad_ms']:>8.4f} {r['iqr_ms']:>8.4f} "
+              f"{r['min_ms']:>9.4f} {r['loops']:>7} {r.get('alloc_net_blocks', '-'):>8} "
+              f"{r.get('alloc_peak_kb', '-'):>9}")
+
+
+def print_comparison(rows) -> bool:
+    """Print a comparison table; returns True if any case regressed."""
+    print(f"{'case':<40} {'base ms':>10} {'now ms':>10} {'change':>8} {'alloc':>8}  status")
+    for row in rows:
+        alloc = f"{row['alloc_change']:+.0%}" if row["alloc_change"] is not None else "-"
+        print(f"{row['name']:<40} {row['baseline_ms']:>10.4f} {row['current_ms']:>10.4f} "
+              f"{row['change']:>+8.1%} {alloc:>8}  {row['status']}")
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+    return bool(regressions)
+
+
+def run(args) -> int:
+    benchmarks = build_suite().select(args.filter)
+    if not benchmarks:
+        print(f"No benchmarks match {args.filter!r}", file=sys.stderr)
+        return 2
+
+    results = []
+    for benchmark in benchmarks:
+        print(f"  {benchmark.name} ...", file=sys.stderr)
+        results.append(run_benchmark(
+            benchmark, samples=args.samples, min_sample_time=args.min_time,
+            allocations=not args.no_alloc,
+        ))
+    report = {"environment": environment(), "results": results}
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline} (revision {baseline['environment'].get('revision')}):")
+        return 1 if print_comparison(compare(baseline, report, args.threshold)) else 0
+    return 0
+
+
+def compare_files(args) -> int:
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    return 1 if print_comparison(compare(old, new, args.threshold)) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the library hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the suite")
+    run_parser.add_argument("--filter", help="Only run cases whose name contains this string")
+    run_parser.add_argument("--samples", type=int, default=15, help="Timed samples per case")
+    run_parser.add_argument("--min-time", type=float, default=0.02,
+                            help="Minimum seconds per sample; sets the loop count")
+    run_parser.add_argument("--no-alloc", action="store_true", help="Skip the tracemalloc pass")
+    run_parser.add_argument("--output", help="Write results as JSON")
+    run_parser.add_argument("--baseline", help="Compare against a saved run")
+    run_parser.add_argument("--threshold", type=float, default=0.10,
+                            help="Relative slowdown that counts as a regression")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two saved runs")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+    compare_parser.set_defaults(handler=compare_files)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark: total memory of an N-worker server, per launch mode.
+
+Starts the server as `uvicorn --workers N` (spawned workers, each importing
+and building everything itself) and as the pre-fork server with and
+without gc.freeze(), waits until the workers are ready, sends some
+traffic, and then sums memory over the whole process tree (master, workers
+and helper processes) from /proc/<pid>/smaps_rollup:
+
+    rss  resident pages per process, counting shared pages once per process
+    pss  proportional set size: each shared page split among its sharers,
+         so the sum is the memory the server really occupies
+    uss  pages private to one process (what killing it would free)
+
+Linux only. The LLM upstream is not contacted; the traffic is diagnoses
+and metadata requests.
+
+Usage:
+    python -m benchmarks.bench_memory [--workers 4] [--requests 400] [--output memory.json]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+
+MODES = {
+    "uvicorn": ["-m", "uvicorn", "src.config.asgi:app", "--workers", "{workers}", "--port", "{port}",
+                "--log-level", "warning"],
+    "prefork-no-freeze": ["-m", "src.config.prefork", "--workers", "{workers}", "--port", "{port}",
+                          "--log-level", "warning", "--no-gc-freeze"],
+    "prefork": ["-m", "src.config.prefork", "--workers", "{workers}", "--port", "{port}",
+                "--log-level", "warning"],
+}
+
+DIAGNOSE_BODY = json.dumps({
+    "symptoms": [{"name": "fever", "pattern": "cyclical"}, {"name": "chills"}, {"name": "sweating"}],
+    "patient": {"travel_endemic_area": True},
+})
+
+TRAFFIC = (
+    ("POST", "/api/expert/diagnose", DIAGNOSE_BODY),
+    ("GET", "/api/expert/symptoms", None),
+    ("GET", "/api/expert/diseases/malaria", None),
+    ("GET", "/api/chat/models", None),
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def descendants(root: int) -> List[int]:
+    """root and every process below it."""
+    parents: Dict[int, int] = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name may contain spaces; fields after it are fixed
+        parents[int(entry.name)] = int(stat.rsplit(")", 1)[1].split()[1])
+    tree, frontier = [root], [root]
+    while frontier:
+        children = [pid for pid, ppid in parents.items() if ppid in frontier]
+        tree.extend(children)
+        frontier = children
+    return tree
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def request(port: int, method: str, path: str, body=None) -> int:
+    conn = http.client.HTTPConnection("localhost", port, timeout=10)
+    try:
+        headers = {"Content-Type": "application/json"} if body else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def wait_ready(port: int, workers: int, timeout: float = 120.0) -> float:
+    """Seconds until /api/ready answered 200 often enough to have reached every worker."""
+    started = time.monotonic()
+    streak = 0
+    while streak < 4 * workers:
+        if time.monotonic() - started > timeout:
+            raise TimeoutError("server did not become ready")
+        try:
+            streak = streak + 1 if request(port, "GET", "/api/ready") == 200 else 0
+        except OSError:
+            streak = 0
+        if not streak:
+            time.sleep(0.05)
+    return time.monotonic() - started
+
+
+def measure(mode: str, workers: int, requests: int) -> Dict:
+    port = free_port()
+    args = [arg.format(workers=workers, port=port) for arg in MODES[mode]]
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="src.config.settings_api", METRICS_MULTIPROCESS="0")
+    env.pop("GROQ_API_KEY", None)
+    server = subprocess.Popen([sys.executable, *args], env=env)
+    try:
+        ready_seconds = wait_ready(port, workers)
+        for i in range(requests):
+            method, path, body = TRAFFIC[i % len(TRAFFIC)]
+            status = request(port, method, path, body)
+            assert status == 200, (path, status)
+        time.sleep(1.0)
+        processes = {pid: memory_kb(pid) for pid in descendants(server.pid)}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    totals = {key: sum(p[key] for p in processes.values()) for key in ("rss", "pss", "uss")}
+    return {"mode": mode, "workers": workers, "processes": len(processes), "ready_seconds": ready_seconds,
+            **{f"{key}_mb": value / 1024 for key, value in totals.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Total memory of an N-worker server per launch mode")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes")
+    parser.add_argument("--requests", type=int, default=400, help="Requests sent before measuring")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated subset of " + ", ".join(MODES))
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(","):
+        print(f"  {mode} ...", file=sys.stderr)
+        results.append(measure(mode, args.workers, args.requests))
+
+    print(f"{'mode':<20} {'procs':>5} {'ready s':>8} {'rss MB':>9} {'pss MB':>9} {'uss MB':>9}")
+    for r in results:
+        print(f"{r['mode']:<20} {r['processes']:>5} {r['ready_seconds']:>8.2f} {r['rss_mb']:>9.1f} "
+              f"{r['pss_mb']:>9.1f} {r['uss_mb']:>9.1f}")
+
+    if args.output:
+        from benchmarks.harness import environment
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
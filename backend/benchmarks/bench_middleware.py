@@ -0,0 +1,122 @@
+"""
+Benchmark: per-request overhead of the full and API-only settings profiles.
+
+Each profile runs in its own subprocess (Django settings are per process)
+and sends requests through Django's ASGI request handling with AsyncClient,
+so every middleware layer, URL resolution and Ninja's view wrapper run as
+they do under uvicorn; only the socket layer is skipped.
+
+Usage:
+    python -m benchmarks.bench_middleware [--samples 15] [--output middleware.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+PROFILES = {
+    "full": "src.config.settings",
+    "api": "src.config.settings_api",
+}
+
+DIAGNOSE_BODY = {
+    "symptoms": [
+        {"name": "fever", "pattern": "cyclical"},
+        {"name": "chills"},
+        {"name": "sweating"},
+    ],
+    "patient": {"travel_endemic_area": True},
+}
+
+
+def measure_profile(samples: int, min_time: float) -> list:
+    """Run in the child process: time the cases under the configured settings."""
+    import asyncio
+
+    import django
+
+    django.setup()
+
+    from django.conf import settings
+    from django.test import AsyncClient
+
+    from benchmarks.harness import Suite, run_benchmark
+
+    # AsyncClient always sends "Host: testserver" (Django's test runner allows it the same way)
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+    client = AsyncClient()
+    loop = asyncio.new_event_loop()
+    body = json.dumps(DIAGNOSE_BODY)
+
+    def request(coro_factory):
+        response = loop.run_until_complete(coro_factory())
+        assert response.status_code == 200, response.status_code
+        return response
+
+    suite = Suite()
+    suite.add("ping", lambda: request(lambda: client.get("/api/ping")), description="GET /api/ping")
+    suite.add("diagnose", lambda: request(
+        lambda: client.post("/api/expert/diagnose", data=body, content_type="application/json")),
+        description="POST /api/expert/diagnose (three symptoms)")
+    results = [run_benchmark(b, samples=samples, min_sample_time=min_time, allocations=False)
+               for b in suite.select()]
+    for result in results:
+        result["middleware"] = len(settings.MIDDLEWARE)
+        result["apps"] = len(settings.INSTALLED_APPS)
+    return results
+
+
+def run_profile(settings_module: str, samples: int, min_time: float) -> list:
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module,
+               # Keep telemetry and compression identical in both profiles, and
+               # diagnose in-process so the numbers are not dominated by pool IPC
+               TRACE_SAMPLE_RATE="0", SLOW_REQUEST_MS="0", METRICS_MULTIPROCESS="0", DIAGNOSIS_PROCESSES="0")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_middleware", "--child",
+         "--samples", str(samples), "--min-time", str(min_time)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request overhead of the settings profiles")
+    parser.add_argument("--samples", type=int, default=15, help="Timed samples per case")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Minimum seconds per sample; sets the loop count")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_profile(args.samples, args.min_time)))
+        return
+
+    results = {}
+    for name, module in PROFILES.items():
+        print(f"  {name} ({module}) ...", file=sys.stderr)
+        results[name] = {r["name"]: r for r in run_profile(module, args.samples, args.min_time)}
+
+    full, api = results["full"], results["api"]
+    print(f"{'case':<12} {'full µs':>10} {'± mad':>8} {'api µs':>10} {'± mad':>8} {'saved µs':>10} {'change':>8}"
+          f"   middleware full/api")
+    for case in full:
+        before, after = full[case]["median_ms"] * 1000, api[case]["median_ms"] * 1000
+        print(f"{case:<12} {before:>10.1f} {full[case]['mad_ms'] * 1000:>8.1f} {after:>10.1f} "
+              f"{api[case]['mad_ms'] * 1000:>8.1f} {before - after:>10.1f} {after / before - 1:>+8.1%}"
+              f"   {full[case]['middleware']}/{api[case]['middleware']}")
+
+    if args.output:
+        from benchmarks.harness import environment
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "profiles": PROFILES, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
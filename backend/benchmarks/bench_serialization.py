@@ -0,0 +1,143 @@
+"""
+Benchmark: JSON rendering and parsing of large API bodies.
+
+Renders a ChatResponse carrying a long conversation_history and a batch of
+worst-case DiagnoseResponse bodies the way Ninja does (model_dump() to a
+dict, then the renderer) with the stdlib JSONRenderer and ORJSONRenderer,
+and with model_response()'s direct model_dump_json(). Request bodies are
+parsed with Ninja's Parser and ORJSONParser.
+
+Usage:
+    python -m benchmarks.bench_serialization [--turns 200] [--batch 100]
+        [--filter chat] [--output serialization.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import RequestFactory  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from ninja.parser import Parser  # noqa: E402
+from ninja.renderers import JSONRenderer  # noqa: E402
+
+from benchmarks.bench_keyword_matcher import SAMPLE_TURNS  # noqa: E402
+from benchmarks.bench_library import print_results  # noqa: E402
+from benchmarks.cases import WORST_CASE  # noqa: E402
+from benchmarks.harness import Suite, environment, run_benchmark  # noqa: E402
+from src.api.renderers import ORJSONParser, ORJSONRenderer, orjson  # noqa: E402
+from src.api.routers.expert import diagnose_response, diagnosis_inputs  # noqa: E402
+from src.api.schemas.chat import ChatMessage, ChatResponse, TokenUsage  # noqa: E402
+from src.api.schemas.expert import DiagnoseRequest, DiagnoseResponse  # noqa: E402
+from src.lib.expert_system.diagnosis_engine import run_diagnosis  # noqa: E402
+
+
+ASSISTANT_REPLY = (
+    "Fever with chills and sweating that recurs every other day is typical of malaria, "
+    "especially after travel to an endemic area. Please get a blood smear or rapid test "
+    "today; if you become confused, stop drinking or pass very little urine, seek "
+    "emergency care immediately. "
+) * 2
+
+
+def build_chat_response(turns: int) -> ChatResponse:
+    history = []
+    for i in range(turns):
+        history.append(ChatMessage(role="user", content=SAMPLE_TURNS[i % len(SAMPLE_TURNS)]))
+        history.append(ChatMessage(role="assistant", content=ASSISTANT_REPLY))
+    return ChatResponse(
+        response=ASSISTANT_REPLY,
+        model_used="llama-3.3-70b-versatile",
+        conversation_history=history,
+        extracted_symptoms=["fever", "chills", "sweating", "headache", "diarrhea", "vomiting"],
+        suggested_diseases=["malaria", "cholera"],
+        usage=TokenUsage(estimated_prompt_tokens=3100, static_prefix_tokens=900, summarized_turns=turns - 8),
+    )
+
+
+def build_diagnose_batch(size: int) -> List[DiagnoseResponse]:
+    request = DiagnoseRequest(
+        symptoms=WORST_CASE["symptoms"],
+        patient=WORST_CASE["patient_info"],
+        lab_results=WORST_CASE["lab_results"],
+        dehydration_signs=WORST_CASE["dehydration_signs"],
+    )
+    response = diagnose_response(run_diagnosis(**diagnosis_inputs(request)))
+    return [response.model_copy(deep=True) for _ in range(size)]
+
+
+def build_suite(turns: int, batch: int) -> Suite:
+    suite = Suite()
+    stdlib, fast = JSONRenderer(), ORJSONRenderer()
+    chat = build_chat_response(turns)
+    diagnoses = build_diagnose_batch(batch)
+    batch_adapter = TypeAdapter(List[DiagnoseResponse])
+
+    cases = {
+        "chat": (chat.model_dump, chat.model_dump_json, f"ChatResponse with {2 * turns} history messages"),
+        "diagnose_batch": (
+            lambda: batch_adapter.dump_python(diagnoses),
+            lambda: batch_adapter.dump_json(diagnoses),
+            f"{batch} worst-case DiagnoseResponse bodies",
+        ),
+    }
+    for name, (dump, dump_json, description) in cases.items():
+        suite.add(f"render.{name}.stdlib", lambda dump=dump: stdlib.render(None, dump(), response_status=200),
+                  description=f"model_dump + JSONRenderer: {description}")
+        if orjson is not None:
+            suite.add(f"render.{name}.orjson", lambda dump=dump: fast.render(None, dump(), response_status=200),
+                      description=f"model_dump + ORJSONRenderer: {description}")
+        suite.add(f"render.{name}.model_dump_json", dump_json,
+                  description=f"model_response (pydantic-core): {description}")
+
+    factory = RequestFactory()
+    chat_request = factory.post("/api/chat/message", data=json.dumps({
+        "message": SAMPLE_TURNS[0],
+        "conversation_history": [m.model_dump() for m in chat.conversation_history],
+    }), content_type="application/json")
+    chat_request.body  # read the stream once so every sample parses the cached bytes
+    suite.add("parse.chat.stdlib", lambda: Parser().parse_body(chat_request),
+              description=f"Parser: ChatRequest with {2 * turns} history messages")
+    if orjson is not None:
+        suite.add("parse.chat.orjson", lambda: ORJSONParser().parse_body(chat_request),
+                  description=f"ORJSONParser: ChatRequest with {2 * turns} history messages")
+    return suite
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON rendering/parsing benchmarks")
+    parser.add_argument("--turns", type=int, default=200, help="Conversation turns in the chat bodies")
+    parser.add_argument("--batch", type=int, default=100, help="DiagnoseResponse bodies in the batch")
+    parser.add_argument("--filter", help="Only run cases whose name contains this string")
+    parser.add_argument("--samples", type=int, default=15, help="Timed samples per case")
+    parser.add_argument("--min-time", type=float, default=0.02,
+                        help="Minimum seconds per sample; sets the loop count")
+    parser.add_argument("--no-alloc", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed; only the stdlib cases run", file=sys.stderr)
+    results = []
+    for benchmark in build_suite(args.turns, args.batch).select(args.filter):
+        print(f"  {benchmark.name} ...", file=sys.stderr)
+        results.append(run_benchmark(benchmark, samples=args.samples, min_sample_time=args.min_time,
+                                     allocations=not args.no_alloc))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
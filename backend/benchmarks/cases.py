@@ -0,0 +1,82 @@
+"""
+Diagnosis inputs shared by the benchmarks.
+
+Kept free of Django (and of everything but the expert system), so
+bench_interpreters can run them on interpreters that only have experta
+installed.
+"""
+
+# The run_quick_test scenarios from src/lib/expert_system/main.py
+QUICK_TEST_CASES = {
+    "malaria": {
+        "symptoms": [
+            {"name": "fever", "present": True, "pattern": "cyclical"},
+            {"name": "chills", "present": True},
+            {"name": "sweating", "present": True},
+            {"name": "headache", "present": True},
+        ],
+        "patient_info": {"travel_endemic_area": True, "age": 30},
+    },
+    "cholera": {
+        "symptoms": [
+            {"name": "diarrhea", "present": True, "description": "rice_water", "severity": "severe"},
+            {"name": "dehydration", "present": True, "severity": "severe"},
+            {"name": "vomiting", "present": True},
+        ],
+        "patient_info": {"endemic_resident": True, "unsafe_water": True, "age": 25},
+    },
+    "typhoid": {
+        "symptoms": [
+            {"name": "fever", "present": True, "pattern": "stepladder", "duration_days": 7},
+            {"name": "relative_bradycardia", "present": True},
+            {"name": "rose_spots", "present": True},
+            {"name": "abdominal_pain", "present": True},
+        ],
+        "patient_info": {"street_food": True, "unsafe_water": True, "age": 35},
+    },
+    "nonspecific": {
+        "symptoms": [
+            {"name": "fever", "present": True},
+            {"name": "headache", "present": True},
+        ],
+        "patient_info": {"age": 28},
+    },
+}
+
+# Every exposure, every positive lab, severe dehydration and overlapping
+# fever patterns, so nearly all rules (and both differentials) fire
+WORST_CASE = {
+    "symptoms": [
+        {"name": "fever", "present": True, "pattern": "cyclical", "duration_days": 7},
+        {"name": "fever", "present": True, "pattern": "stepladder", "duration_days": 7},
+        {"name": "diarrhea", "present": True, "description": "rice_water", "severity": "severe"},
+        {"name": "diarrhea", "present": True, "description": "watery", "severity": "moderate"},
+        {"name": "dehydration", "present": True, "severity": "severe"},
+        {"name": "anemia", "present": True, "severity": "severe"},
+        {"name": "dark_urine", "present": True, "description": "cola"},
+        *({"name": name, "present": True} for name in [
+            "chills", "sweating", "headache", "vomiting", "constipation", "abdominal_pain",
+            "severe_abdominal_pain", "rose_spots", "relative_bradycardia", "prostration",
+            "melena", "bloody_stool", "convulsions", "altered_consciousness",
+            "body_aches", "bitter_taste",
+        ]),
+    ],
+    "patient_info": {
+        "age": 40, "endemic_resident": True, "travel_endemic_area": True,
+        "unsafe_water": True, "street_food": True,
+    },
+    "lab_results": [
+        {"test": "blood_smear", "result": "positive"},
+        {"test": "rdt_malaria", "result": "positive"},
+        {"test": "rdt_cholera", "result": "positive"},
+        {"test": "stool_culture", "result": "positive", "details": "Vibrio cholerae O1"},
+        {"test": "blood_culture", "result": "positive", "details": "Salmonella typhi"},
+        {"test": "typhidot", "result": "positive"},
+        {"test": "widal", "result": "positive", "details": "O 1:200"},
+    ],
+    "dehydration_signs": [
+        {"sign": "mental_state", "finding": "lethargic"},
+        {"sign": "eyes", "finding": "sunken"},
+        {"sign": "skin_pinch", "finding": "very_slow"},
+    ],
+}
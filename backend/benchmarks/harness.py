@@ -0,0 +1,217 @@
+"""
+Micro-benchmark harness.
+
+Times a callable in calibrated batches (so each sample is long enough to
+measure reliably), with the garbage collector paused during samples, and
+reports robust statistics (median, MAD, IQR) alongside mean/stdev.
+Allocation counts come from a separate tracemalloc pass so tracing does
+not distort the timings.
+
+Results are plain dicts so suites can be saved as JSON baselines and
+compared later; compare() flags cases whose median got slower by more than
+a threshold and by more than the measured noise.
+"""
+
+import gc
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class Benchmark:
+    """A named callable to time; setup() runs once and its result is passed to func."""
+    name: str
+    func: Callable
+    setup: Optional[Callable] = None
+    description: str = ""
+
+
+@dataclass
+class Suite:
+    """An ordered collection of benchmarks."""
+    benchmarks: List[Benchmark] = field(default_factory=list)
+
+    def add(self, name: str, func: Callable, setup: Optional[Callable] = None, description: str = "") -> None:
+        self.benchmarks.append(Benchmark(name, func, setup, description))
+
+    def select(self, pattern: Optional[str] = None) -> List[Benchmark]:
+        if not pattern:
+            return list(self.benchmarks)
+        return [b for b in self.benchmarks if pattern in b.name]
+
+
+def _calibrate(call: Callable, min_sample_time: float) -> int:
+    """Smallest power-of-two loop count whose batch takes at least min_sample_time."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            call()
+        if time.perf_counter() - start >= min_sample_time or loops >= 1 << 20:
+            return loops
+        loops *= 2
+
+
+def measure_time(call: Callable, samples: int = 15, warmup: int = 2, min_sample_time: float = 0.02) -> Dict:
+    """
+    Time call() and return per-call statistics in milliseconds.
+
+    Each sample is a batch of `loops` calls; the GC is collected before and
+    disabled during every batch so collection pauses do not land randomly.
+    """
+    loops = _calibrate(call, min_sample_time)
+    for _ in range(warmup):
+        for _ in range(loops):
+            call()
+
+    per_call = []
+    gc_was_enabled = gc.isenabled()
+    try:
+        for _ in range(samples):
+            gc.collect()
+            gc.disable()
+            start = time.perf_counter()
+            for _ in range(loops):
+                call()
+            elapsed = time.perf_counter() - start
+            gc.enable()
+            per_call.append(elapsed / loops * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    ordered = sorted(per_call)
+    median = statistics.median(ordered)
+    mad = statistics.median(abs(x - median) for x in ordered)
+    quartiles = statistics.quantiles(ordered, n=4) if len(ordered) > 1 else [median, median, median]
+    outliers = sum(1 for x in ordered if mad and abs(x - median) > 5 * mad)
+    return {
+        "loops": loops,
+        "samples": len(ordered),
+        "median_ms": median,
+        "mean_ms": statistics.fmean(ordered),
+        "stdev_ms": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "min_ms": ordered[0],
+        "max_ms": ordered[-1],
+        "iqr_ms": quartiles[2] - quartiles[0],
+        "mad_ms": mad,
+        "outliers": outliers,
+    }
+
+
+def measure_allocations(call: Callable, calls: int = 5) -> Dict:
+    """
+    Allocation profile of call() under tracemalloc (after one untraced warm-up).
+
+    Returns per-call averages of blocks still alive after a collection
+    (net, i.e. retained or leaked), their size, and the peak traced memory
+    while the calls ran (transient allocation).
+    """
+    call()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start_current, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    diff = after.compare_to(before, "filename")
+    net_blocks = sum(stat.count_diff for stat in diff)
+    net_bytes = sum(stat.size_diff for stat in diff)
+    return {
+        "alloc_net_blocks": round(net_blocks / calls, 1),
+        "alloc_net_kb": round(net_bytes / calls / 1024, 2),
+        "alloc_peak_kb": round((peak - start_current) / 1024, 2),
+    }
+
+
+def run_benchmark(benchmark: Benchmark, samples: int, min_sample_time: float, allocations: bool = True) -> Dict:
+    """Time one benchmark (and profile its allocations)."""
+    arg = benchmark.setup() if benchmark.setup else None
+    call = (lambda: benchmark.func(arg)) if benchmark.setup else benchmark.func
+    result = {"name": benchmark.name, "description": benchmark.description}
+    result.update(measure_time(call, samples=samples, min_sample_time=min_sample_time))
+    if allocations:
+        result.update(measure_allocations(call))
+    return result
+
+
+def environment() -> Dict:
+    """Interpreter and machine details recorded with every run."""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "revision": revision,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "argv": sys.argv[1:],
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.10, alloc_threshold: float = 0.25) -> List[Dict]:
+    """
+    Compare two runs case by case.
+
+    A case regresses when its median is more than `threshold` slower and the
+    slowdown exceeds twice the combined MAD of both runs (i.e. is not noise),
+    or when its peak allocation grew by more than `alloc_threshold`.
+
+    Returns:
+        One row per case present in both runs, with a "status" of
+        "regression", "improvement" or "ok"
+    """
+    base_cases = {case["name"]: case for case in baseline.get("results", [])}
+    rows = []
+    for case in current.get("results", []):
+        base = base_cases.get(case["name"])
+        if base is None:
+            continue
+        change = (case["median_ms"] - base["median_ms"]) / base["median_ms"] if base["median_ms"] else 0.0
+        noise = 2 * (case.get("mad_ms", 0.0) + base.get("mad_ms", 0.0))
+        delta = case["median_ms"] - base["median_ms"]
+
+        status = "ok"
+        if change > threshold and delta > noise:
+            status = "regression"
+        elif change < -threshold and -delta > noise:
+            status = "improvement"
+
+        alloc_change = None
+        if base.get("alloc_peak_kb") and case.get("alloc_peak_kb") is not None:
+            alloc_change = (case["alloc_peak_kb"] - base["alloc_peak_kb"]) / base["alloc_peak_kb"]
+            if alloc_change > alloc_threshold and status != "regression":
+                status = "regression"
+
+        rows.append({
+            "name": case["name"],
+            "baseline_ms": base["median_ms"],
+            "current_ms": case["median_ms"],
+            "change": change,
+            "alloc_change": alloc_change,
+            "status": status,
+        })
+    return rows
@@ -0,0 +1,212 @@
+"""
+Admission queues for classes of requests.
+
+An AdmissionQueue admits up to `limit` requests of its class at a time.
+Further requests wait in a bounded queue, urgent ones ahead of the rest,
+and get a slot as soon as an admitted request releases one; a request that
+finds the queue full, or is still waiting when its wait budget runs out,
+is rejected with an AdmissionRejected carrying the HTTP status and a
+Retry-After estimate. Urgent requests may also use `urgent_reserve` slots
+beyond the limit, so they do not wait while the class is merely busy.
+
+Waiting works from async code (ASGI) and from threads (WSGI) alike: the
+state is guarded by a threading lock and a released slot is handed
+directly to the next waiter.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from src.lib.telemetry.metrics import counter, gauge, histogram
+
+
+ADMISSION_IN_FLIGHT = gauge("admission_in_flight", "Admitted requests being processed by class", ["class"])
+ADMISSION_QUEUE_DEPTH = gauge("admission_queue_depth", "Requests waiting for admission by class", ["class"])
+ADMISSION_QUEUE_WAIT = histogram("admission_queue_wait_seconds", "Time admitted requests waited by class and priority",
+                                 ["class", "priority"])
+ADMISSION_REJECTED = counter("admission_rejected_total",
+                             "Requests shed by class and reason (queue_full, timeout, deadline)", ["class", "reason"])
+
+URGENT, NORMAL = 0, 1
+PRIORITY_NAMES = {URGENT: "urgent", NORMAL: "normal"}
+
+
+class AdmissionRejected(Exception):
+    """The request was shed; answer with status and a Retry-After of retry_after seconds."""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued request: woken through its event loop's future, or a threading event."""
+
+    __slots__ = ("priority", "loop", "future", "event", "granted")
+
+    def __init__(self, priority: int, loop: Optional[asyncio.AbstractEventLoop]):
+        self.priority = priority
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionQueue:
+    """
+    Concurrency limit and priority queue for one class of requests.
+
+    Args:
+        name: Class name (metrics label)
+        limit: Requests admitted at a time
+        queue_size: Normal-priority requests allowed to wait (urgent ones
+            are never rejected for a full queue)
+        max_wait: Seconds a request may wait before it is rejected
+        urgent_reserve: Extra slots only urgent requests may use
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float, urgent_reserve: int = 0):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.urgent_reserve = urgent_reserve
+        self.active = 0
+        self._waiters: List[Tuple[int, int, _Waiter]] = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of how long admitted requests hold their slot, for Retry-After
+        self._hold_seconds = 0.1
+
+    def _capacity(self, priority: int) -> int:
+        return self.limit + (self.urgent_reserve if priority == URGENT else 0)
+
+    def retry_after(self) -> float:
+        """Seconds until the queue ahead of a new request is expected to have drained."""
+        return (len(self._waiters) + 1) * self._hold_seconds / max(1, self.limit)
+
+    def _reject(self, status: int, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        ADMISSION_REJECTED.inc(self.name, reason)
+        return AdmissionRejected(status, reason, self.retry_after())
+
+    def expired(self) -> AdmissionRejected:
+        """Rejection for a request whose deadline passed before it could be queued."""
+        with self._lock:
+            return self._reject(503, "deadline")
+
+    def _enter(self, priority: int, loop: Optional[asyncio.AbstractEventLoop]) -> Optional[_Waiter]:
+        """Take a slot (None) or join the queue (the waiter to wait on)."""
+        with self._lock:
+            ahead = any(p <= priority for p, _, _ in self._waiters)
+            if not ahead and self.active < self._capacity(priority):
+                self.active += 1
+                self.admitted += 1
+                ADMISSION_IN_FLIGHT.inc(self.name)
+                ADMISSION_QUEUE_WAIT.observe(0.0, self.name, PRIORITY_NAMES[priority])
+                return None
+            if priority != URGENT and len(self._waiters) >= self.queue_size:
+                raise self._reject(429, "queue_full")
+            waiter = _Waiter(priority, loop)
+            heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+        ADMISSION_QUEUE_DEPTH.inc(self.name)
+        return waiter
+
+    def _wait_budget(self, deadline: Optional[float]) -> Tuple[float, str]:
+        budget, reason = self.max_wait, "timeout"
+        if deadline is not None and deadline - time.monotonic() < budget:
+            budget, reason = deadline - time.monotonic(), "deadline"
+        return budget, reason
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Leave the queue after a timeout; True when a slot was granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+            heapq.heapify(self._waiters)
+        ADMISSION_QUEUE_DEPTH.dec(self.name)
+        return False
+
+    def _admitted_after(self, waiter: _Waiter, started: float) -> None:
+        ADMISSION_QUEUE_WAIT.observe(time.monotonic() - started, self.name, PRIORITY_NAMES[waiter.priority])
+
+    def acquire(self, priority: int = NORMAL, deadline: Optional[float] = None) -> None:
+        """Block the calling thread until admitted; raises AdmissionRejected."""
+        started = time.monotonic()
+        waiter = self._enter(priority, None)
+        if waiter is None:
+            return
+        budget, reason = self._wait_budget(deadline)
+        if not waiter.event.wait(max(0.0, budget)) and not self._abandon(waiter):
+            with self._lock:
+                raise self._reject(503, reason)
+        self._admitted_after(waiter, started)
+
+    async def acquire_async(self, priority: int = NORMAL, deadline: Optional[float] = None) -> None:
+        """Wait on the running loop until admitted; raises AdmissionRejected."""
+        started = time.monotonic()
+        waiter = self._enter(priority, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        budget, reason = self._wait_budget(deadline)
+        try:
+            await asyncio.wait_for(waiter.future, max(0.0, budget))
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                with self._lock:
+                    raise self._reject(503, reason)
+        except asyncio.CancelledError:
+            # The client went away while queued
+            if self._abandon(waiter):
+                self.release()
+            raise
+        self._admitted_after(waiter, started)
+
+    def release(self, held: Optional[float] = None) -> None:
+        """Give the slot back (held: seconds it was used) and admit whoever is next."""
+        with self._lock:
+            if held is not None:
+                self._hold_seconds += 0.1 * (held - self._hold_seconds)
+            self.active -= 1
+            waiter = None
+            if self._waiters and self.active < self._capacity(self._waiters[0][0]):
+                waiter = heapq.heappop(self._waiters)[2]
+                waiter.granted = True
+                self.active += 1
+                self.admitted += 1
+        if waiter is None:
+            ADMISSION_IN_FLIGHT.dec(self.name)
+        else:
+            ADMISSION_QUEUE_DEPTH.dec(self.name)
+            waiter.wake()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "queue_size": self.queue_size,
+                "active": self.active,
+                "queued": len(self._waiters),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
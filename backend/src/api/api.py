@@ -3,9 +3,17 @@ Medical Expert API.
 
 Production-grade API for medical diagnostics with AI-powered chat assistance.
 """
+import math
+
+from django.http import HttpResponse
 from ninja import NinjaAPI
 
-from .routers import expert_router, chat_router
+from src.lib.ai.rate_limit import LLMBusyError
+from src.lib.expert_system.process_pool import DiagnosisBusyError
+from src.lib.telemetry.metrics import CONTENT_TYPE, get_registry
+from .renderers import get_parser, get_renderer
+from .routers import expert_router, chat_router, admin_router
+from . import warmup
 
 # Initialize API with metadata
 api = NinjaAPI(
@@ -40,11 +48,40 @@ This system is for educational and informational purposes only.
 Always consult a healthcare professional for medical advice.
     """,
     docs_url="/docs",
+    renderer=get_renderer(),
+    parser=get_parser(),
 )
 
 # Register routers
 api.add_router("/expert", expert_router)
 api.add_router("/chat", chat_router)
+api.add_router("/admin", admin_router)
+
+
+@api.exception_handler(LLMBusyError)
+def llm_busy(request, exc: LLMBusyError):
+    """Upstream LLM capacity is exhausted: tell the client when to retry."""
+    retry_after = max(1, math.ceil(exc.retry_after))
+    response = api.create_response(
+        request,
+        {"detail": "The assistant is busy. Please retry shortly.", "retry_after": retry_after},
+        status=503,
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+@api.exception_handler(DiagnosisBusyError)
+def diagnosis_busy(request, exc: DiagnosisBusyError):
+    """The diagnosis process pool is saturated: shed the request instead of queueing it."""
+    retry_after = max(1, math.ceil(exc.retry_after))
+    response = api.create_response(
+        request,
+        {"detail": "The expert system is busy. Please retry shortly.", "retry_after": retry_after},
+        status=503,
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
 
 
 @api.get("/ping", tags=["Health & Info"], summary="Simple ping check")
@@ -53,6 +90,24 @@ def ping(request):
     return {"message": "pong"}
 
 
+@api.get("/ready", tags=["Health & Info"], summary="Readiness check")
+async def ready(request):
+    """200 once this worker has finished warming up, 503 while it is still warming (or failed)."""
+    if warmup.state.status == warmup.PENDING:
+        # No lifespan startup ran (e.g. the dev server): warm up on the first probe
+        await warmup.warm_up()
+    response = api.create_response(request, warmup.state.to_dict(), status=200 if warmup.state.ready else 503)
+    if not warmup.state.ready:
+        response["Retry-After"] = "1"
+    return response
+
+
+@api.get("/metrics", tags=["Health & Info"], summary="Prometheus metrics")
+def metrics(request):
+    """Request, LLM, retrieval, diagnosis and cache metrics (all workers) in Prometheus text format."""
+    return HttpResponse(get_registry().render(), content_type=CONTENT_TYPE)
+
+
 @api.get("/", tags=["Health & Info"], summary="API info")
 def root(request):
     """Return basic API information."""
@@ -64,5 +119,8 @@ def root(request):
         "endpoints": {
             "expert": "/api/expert - Structured expert system access",
             "chat": "/api/chat - AI-powered conversational assistant",
+            "ready": "/api/ready - Readiness (200 once warm-up has finished)",
+            "metrics": "/api/metrics - Prometheus metrics",
+            "admin": "/api/admin - Operational tools (X-Admin-Token required)",
         }
     }
@@ -0,0 +1,90 @@
+"""
+Content-coding negotiation and compressors for API responses.
+
+gzip is always available; brotli ("br") is offered when the optional
+`brotli` package is installed. compress() handles whole bodies;
+StreamCompressor compresses a stream chunk by chunk, flushing after each
+chunk so the client can decode every event as soon as it arrives.
+"""
+
+import gzip
+import zlib
+from typing import Dict, Optional, Sequence
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+# Preferred first when the client accepts several with equal weight
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map of coding -> q-value from an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(header: str, offered: Sequence[str] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """Best coding in `offered` the client accepts, or None for identity."""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Compress a whole body; precomputed responses use the maximum level."""
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and anything derived from it) deterministic
+        return gzip.compress(body, compresslevel=9 if level is None else level, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11 if level is None else level)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+class StreamCompressor:
+    """Incremental compressor whose output can be decoded after every flush."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            # wbits=31: zlib stream with a gzip header and trailer
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br" and brotli is not None:
+            self._brotli = brotli.Compressor(quality=level)
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress chunk and flush, so everything so far is decodable."""
+        if self.encoding == "gzip":
+            return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        return self._brotli.process(chunk) + self._brotli.flush()
+
+    def finish(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._zlib.flush(zlib.Z_FINISH)
+        return self._brotli.finish()
@@ -0,0 +1,17 @@
+"""
+API Middleware Package.
+"""
+
+from .admission import AdmissionMiddleware
+from .compression import CompressionMiddleware
+from .metrics import MetricsMiddleware
+from .profiling import ProfilingMiddleware
+from .tracing import TracingMiddleware
+
+__all__ = [
+    "AdmissionMiddleware",
+    "CompressionMiddleware",
+    "MetricsMiddleware",
+    "ProfilingMiddleware",
+    "TracingMiddleware",
+]
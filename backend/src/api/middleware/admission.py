@@ -0,0 +1,242 @@
+"""
+Admission control middleware.
+
+Requests are sorted into classes that share a worker very differently:
+
+    expert    POST /api/expert/*  CPU-bound diagnoses
+    chat      POST /api/chat/*    long-lived LLM calls and streams
+    metadata  everything else     cheap reads (symptoms, diseases, models)
+
+and each class gets its own AdmissionQueue (src.api.admission), so a
+burst of one kind cannot take the slots of another. ADMISSION_LIMITS sets
+the concurrency limit and queue size per class and worker, as
+"class=limit:queue" pairs; ADMISSION_MAX_WAIT_MS bounds the time in the
+queue. A request that finds its queue full gets 429, one that waited too
+long 503, both with Retry-After. A streaming response keeps its slot until
+the last chunk is sent. Health checks and metrics scrapes (/api/ping,
+/api/ready, /api/metrics), the token-protected /api/admin/ endpoints and
+CORS preflights are never queued.
+
+Urgent requests go ahead of the queue and may use ADMISSION_URGENT_RESERVE
+slots beyond the class limit. Diagnoses whose inputs contain a danger sign
+are urgent; other requests only when they send "X-Priority: urgent"
+together with an X-Priority-Token matching ADMISSION_PRIORITY_TOKEN, so
+that anonymous clients cannot promote themselves into the reserve.
+
+A client may send X-Request-Timeout-Ms, the time it is prepared to wait.
+The request is shed if that runs out while it is queued, and the deadline
+is made current (src.lib.deadline) for the view, so waits further down
+(the diagnosis pool, the LLM client) end with it too.
+"""
+
+import hmac
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import JsonResponse
+
+from src.api.admission import NORMAL, PRIORITY_NAMES, URGENT, AdmissionQueue, AdmissionRejected
+from src.lib import deadline
+from src.lib.expert_system.diagnosis_engine import has_danger_signs
+from src.lib.telemetry.tracing import annotate, span
+from .streaming import wrap_streaming_content
+
+
+EXPERT, CHAT, METADATA = "expert", "chat", "metadata"
+DEFAULT_LIMITS = "expert=4:32,chat=64:64,metadata=128:256"
+
+# Never queued or shed
+EXEMPT_PATHS = ("/api/ping", "/api/ready", "/api/metrics")
+# Admin endpoints check their own token and may run for minutes (profiling)
+EXEMPT_PREFIXES = ("/api/admin/",)
+READ_METHODS = ("GET", "HEAD")
+
+SHED_MESSAGES = {
+    429: "Too many requests of this kind. Please retry shortly.",
+    503: "The server is busy. Please retry shortly.",
+}
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """{"expert": (limit, queue), ...} from "expert=4:32,chat=64:64"."""
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, values = item.partition("=")
+        limit, _, queue = values.partition(":")
+        limits[name.strip()] = (int(limit), int(queue or 0))
+    return limits
+
+
+class AdmissionConfig:
+    """Per-class limits and waits, read from ADMISSION_* variables."""
+
+    def __init__(self, enabled: bool = True, limits: Optional[Dict[str, Tuple[int, int]]] = None,
+                 max_wait: float = 2.0, urgent_reserve: int = 2, priority_token: str = ""):
+        self.enabled = enabled
+        self.limits = {**parse_limits(DEFAULT_LIMITS), **(limits or {})}
+        self.max_wait = max_wait
+        self.urgent_reserve = urgent_reserve
+        # X-Priority is ignored unless the caller also presents this token
+        self.priority_token = priority_token
+
+    @classmethod
+    def from_env(cls) -> "AdmissionConfig":
+        return cls(
+            enabled=os.getenv("ADMISSION_CONTROL", "1") != "0",
+            limits=parse_limits(os.getenv("ADMISSION_LIMITS", "")),
+            max_wait=float(os.getenv("ADMISSION_MAX_WAIT_MS", "2000")) / 1000,
+            urgent_reserve=int(os.getenv("ADMISSION_URGENT_RESERVE", "2")),
+            priority_token=os.getenv("ADMISSION_PRIORITY_TOKEN", ""),
+        )
+
+
+def route_class(request) -> Optional[str]:
+    """Admission class of a request, or None when it is exempt."""
+    path = request.path_info
+    # CORS preflights are answered by CorsMiddleware and cost nothing
+    if request.method == "OPTIONS" or path.rstrip("/") in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if request.method in READ_METHODS:
+        return METADATA
+    if path.startswith("/api/expert/"):
+        return EXPERT
+    if path.startswith("/api/chat/"):
+        return CHAT
+    return METADATA
+
+
+def trusted_priority(request, token: str) -> bool:
+    """True when the request asks for urgent admission and presents the priority token."""
+    if not token or request.META.get("HTTP_X_PRIORITY", "").strip().lower() != "urgent":
+        return False
+    presented = request.META.get("HTTP_X_PRIORITY_TOKEN", "")
+    return hmac.compare_digest(presented.encode(), token.encode())
+
+
+def request_priority(request, route: str, priority_token: str = "") -> int:
+    if trusted_priority(request, priority_token):
+        return URGENT
+    if route != EXPERT:
+        return NORMAL
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return NORMAL
+    if not isinstance(payload, dict):
+        return NORMAL
+    symptoms, signs = payload.get("symptoms"), payload.get("dehydration_signs")
+    if has_danger_signs(symptoms if isinstance(symptoms, list) else None,
+                        signs if isinstance(signs, list) else None):
+        return URGENT
+    return NORMAL
+
+
+def request_deadline(request) -> Optional[float]:
+    """Monotonic deadline from X-Request-Timeout-Ms, or None."""
+    value = request.META.get("HTTP_X_REQUEST_TIMEOUT_MS")
+    if not value:
+        return None
+    try:
+        return time.monotonic() + float(value) / 1000
+    except ValueError:
+        return None
+
+
+def shed_response(exc: AdmissionRejected) -> JsonResponse:
+    retry_after = max(1, int(-(-exc.retry_after // 1)))
+    response = JsonResponse({"detail": SHED_MESSAGES[exc.status], "retry_after": retry_after}, status=exc.status)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+class AdmissionMiddleware:
+    """Limit concurrent requests per class, queue the excess by priority and shed the rest."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = AdmissionConfig.from_env()
+        self.queues = {
+            name: AdmissionQueue(name, limit, queue_size, self.config.max_wait, self.config.urgent_reserve)
+            for name, (limit, queue_size) in self.config.limits.items()
+        }
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _classify(self, request) -> Optional[Tuple[AdmissionQueue, int, Optional[float]]]:
+        if not self.config.enabled:
+            return None
+        queue = self.queues.get(route_class(request))
+        if queue is None:
+            return None
+        priority = request_priority(request, queue.name, self.config.priority_token)
+        annotate(admission_class=queue.name, priority=PRIORITY_NAMES[priority])
+        return queue, priority, request_deadline(request)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        admission = self._classify(request)
+        if admission is None:
+            return self.get_response(request)
+        queue, priority, request_deadline = admission
+        try:
+            with span("admission.queue", **{"class": queue.name}):
+                if request_deadline is not None and request_deadline <= time.monotonic():
+                    raise queue.expired()
+                queue.acquire(priority, request_deadline)
+        except AdmissionRejected as exc:
+            return shed_response(exc)
+        started = time.monotonic()
+        token = deadline.activate(request_deadline)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            queue.release(time.monotonic() - started)
+            raise
+        finally:
+            deadline.deactivate(token)
+        return self._hold_until_sent(queue, response, started, request_deadline)
+
+    async def __acall__(self, request):
+        admission = self._classify(request)
+        if admission is None:
+            return await self.get_response(request)
+        queue, priority, request_deadline = admission
+        try:
+            with span("admission.queue", **{"class": queue.name}):
+                if request_deadline is not None and request_deadline <= time.monotonic():
+                    raise queue.expired()
+                await queue.acquire_async(priority, request_deadline)
+        except AdmissionRejected as exc:
+            return shed_response(exc)
+        started = time.monotonic()
+        token = deadline.activate(request_deadline)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            queue.release(time.monotonic() - started)
+            raise
+        finally:
+            deadline.deactivate(token)
+        return self._hold_until_sent(queue, response, started, request_deadline)
+
+    @staticmethod
+    def _hold_until_sent(queue: AdmissionQueue, response, started: float, request_deadline: Optional[float]):
+        """Release the slot now, or after the last chunk of a streaming response."""
+        if not response.streaming:
+            queue.release(time.monotonic() - started)
+            return response
+        wrap_streaming_content(
+            response,
+            enter=lambda: deadline.activate(request_deadline),
+            exit=lambda token: (deadline.deactivate(token), queue.release(time.monotonic() - started)),
+        )
+        return response
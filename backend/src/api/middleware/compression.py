@@ -0,0 +1,158 @@
+"""
+Response compression middleware.
+
+Compresses JSON, text and event-stream responses with the best coding the
+client accepts (brotli when installed, then gzip). Bodies smaller than
+COMPRESSION_MIN_BYTES are sent as-is, as are responses that already carry a
+Content-Encoding (the precomputed metadata responses). Streaming responses
+(SSE, NDJSON) are compressed chunk by chunk with a flush after each one, so
+events are not held back and the body is never buffered.
+
+Bytes before/after and the CPU time spent compressing are exported as
+metrics; /api/metrics also reports the resulting ratio per coding.
+"""
+
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.cache import patch_vary_headers
+
+from src.api.compression import StreamCompressor, compress, negotiate_encoding
+from src.lib.telemetry.metrics import counter, histogram
+from src.lib.telemetry.tracing import span
+
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+COMPRESSION_BYTES = counter("http_compression_bytes_total",
+                            "Response bytes before (in) and after (out) compression", ["encoding", "direction"])
+COMPRESSION_CPU = counter("http_compression_cpu_seconds_total", "CPU time spent compressing responses", ["encoding"])
+COMPRESSION_RATIO = histogram("http_compression_ratio", "Compressed / original size per response", ["encoding"],
+                              buckets=(0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0))
+
+
+class CompressionConfig:
+    """Thresholds and levels, read from COMPRESSION_* variables."""
+
+    def __init__(self, enabled: bool = True, min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.enabled = enabled
+        self.min_bytes = min_bytes
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    @classmethod
+    def from_env(cls) -> "CompressionConfig":
+        return cls(
+            enabled=os.getenv("COMPRESSION_ENABLED", "1") != "0",
+            min_bytes=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+            gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+            brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+        )
+
+
+def _compressible(response) -> bool:
+    content_type = response.get("Content-Type", "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or "+json" in content_type
+
+
+def _record(encoding: str, original: int, compressed: int, cpu_seconds: float) -> None:
+    COMPRESSION_BYTES.inc(encoding, "in", amount=original)
+    COMPRESSION_BYTES.inc(encoding, "out", amount=compressed)
+    COMPRESSION_CPU.inc(encoding, amount=cpu_seconds)
+    if original:
+        COMPRESSION_RATIO.observe(compressed / original, encoding)
+
+
+class CompressionMiddleware:
+    """Negotiate Content-Encoding and compress eligible responses."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = CompressionConfig.from_env()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._process(request, await self.get_response(request))
+
+    def _process(self, request, response):
+        if not self.config.enabled or response.has_header("Content-Encoding") or not _compressible(response):
+            return response
+        if not response.streaming and len(response.content) < self.config.min_bytes:
+            return response
+
+        # Representation depends on Accept-Encoding from here on, even when sent uncompressed
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        level = self.config.levels[encoding]
+        if response.streaming:
+            self._compress_stream(response, encoding, level)
+        else:
+            original = response.content
+            with span("http.compress", encoding=encoding, bytes=len(original)):
+                started = time.thread_time()
+                compressed = compress(original, encoding, level)
+                _record(encoding, len(original), len(compressed), time.thread_time() - started)
+            if len(compressed) >= len(original):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        response["Content-Encoding"] = encoding
+        # The compressed bytes differ from the identity representation
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+    def _compress_stream(self, response, encoding: str, level: int) -> None:
+        compressor = StreamCompressor(encoding, level)
+        totals = {"in": 0, "out": 0, "cpu": 0.0}
+
+        def encode(chunk):
+            started = time.thread_time()
+            out = compressor.compress(chunk)
+            totals["cpu"] += time.thread_time() - started
+            totals["in"] += len(chunk)
+            totals["out"] += len(out)
+            return out
+
+        def finish():
+            started = time.thread_time()
+            out = compressor.finish()
+            totals["cpu"] += time.thread_time() - started
+            totals["out"] += len(out)
+            _record(encoding, totals["in"], totals["out"], totals["cpu"])
+            return out
+
+        content = response.streaming_content
+        if response.is_async:
+            async def stream():
+                async for chunk in content:
+                    yield encode(chunk)
+                yield finish()
+        else:
+            def stream():
+                for chunk in content:
+                    yield encode(chunk)
+                yield finish()
+        response.streaming_content = stream()
+        if response.has_header("Content-Length"):
+            del response["Content-Length"]
@@ -0,0 +1,87 @@
+"""
+Request metrics middleware.
+
+Counts requests and observes latency per URL route (the pattern, e.g.
+"api/expert/diseases/<disease_name>", so path parameters do not explode
+label cardinality) and tracks requests in flight. For streaming responses
+the latency (and the count, which needs the final status) is recorded when
+the last chunk has been sent.
+"""
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.urls import Resolver404, resolve
+
+from src.lib.telemetry.metrics import counter, gauge, get_registry, histogram
+from .streaming import wrap_streaming_content
+
+
+REQUESTS = counter("http_requests_total", "HTTP requests by route, method and status", ["route", "method", "status"])
+LATENCY = histogram("http_request_duration_seconds", "HTTP request latency by route", ["route", "method"])
+IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests being processed by route", ["route"])
+
+
+def route_of(request) -> str:
+    """URL pattern the request resolves to, or "unmatched"."""
+    try:
+        return resolve(request.path_info).route or "unmatched"
+    except Resolver404:
+        return "unmatched"
+
+
+class MetricsMiddleware:
+    """Record request count, latency and concurrency for every request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.registry = get_registry()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Publish this worker's metrics for whichever worker gets scraped. Started
+        # on the first request rather than here: the pre-fork master builds the
+        # middleware too, and must not fork with the flusher thread running
+        self.registry.start_flusher()
+        route = route_of(request)
+        IN_FLIGHT.inc(route)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            IN_FLIGHT.dec(route)
+            raise
+        self._record(request, route, response, started)
+        return response
+
+    async def __acall__(self, request):
+        self.registry.start_flusher()
+        route = route_of(request)
+        IN_FLIGHT.inc(route)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            IN_FLIGHT.dec(route)
+            raise
+        self._record(request, route, response, started)
+        return response
+
+    @staticmethod
+    def _record(request, route: str, response, started: float) -> None:
+        # A stream is in flight until its body has been sent, not just its headers
+        def observe(_=None):
+            IN_FLIGHT.dec(route)
+            REQUESTS.inc(route, request.method, response.status_code)
+            LATENCY.observe(time.perf_counter() - started, route, request.method)
+
+        if response.streaming:
+            wrap_streaming_content(response, enter=lambda: None, exit=observe)
+        else:
+            observe()
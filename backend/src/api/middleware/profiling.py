@@ -0,0 +1,67 @@
+"""
+Profiling middleware.
+
+Marks requests as captured while an admin-started profile session
+(POST /api/admin/profile) is running, so the sampling profiler only runs
+while those requests are being handled. Streaming responses stay captured
+until their last chunk is sent. Without a session the cost is one global
+lookup per request.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from src.lib.telemetry.profiler import current_session
+from .streaming import wrap_streaming_content
+
+
+# Admin requests (including the one waiting for the profile) are never captured
+EXCLUDED_PREFIX = "/api/admin/"
+
+
+class ProfilingMiddleware:
+    """Feed the next N requests to the running profile session."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _begin(self, request):
+        session = current_session()
+        if session is None or request.path.startswith(EXCLUDED_PREFIX):
+            return None
+        return session if session.begin_request(request.path) else None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        session = self._begin(request)
+        if session is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            session.end_request()
+            raise
+        return self._finish(session, response)
+
+    async def __acall__(self, request):
+        session = self._begin(request)
+        if session is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            session.end_request()
+            raise
+        return self._finish(session, response)
+
+    def _finish(self, session, response):
+        if response.streaming:
+            wrap_streaming_content(response, enter=lambda: None, exit=lambda _: session.end_request())
+        else:
+            session.end_request()
+        return response
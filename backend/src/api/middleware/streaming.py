@@ -0,0 +1,29 @@
+"""
+Helpers for middleware that must act when a streamed response finishes.
+"""
+
+from typing import Any, Callable
+
+
+def wrap_streaming_content(response, enter: Callable[[], Any], exit: Callable[[Any], None]) -> None:
+    """
+    Run enter() when the server starts iterating a streaming response and
+    exit(enter_result) after the last chunk (or when the client goes away).
+    """
+    content = response.streaming_content
+    if response.is_async:
+        async def stream():
+            state = enter()
+            try:
+                async for chunk in content:
+                    yield chunk
+            finally:
+                exit(state)
+    else:
+        def stream():
+            state = enter()
+            try:
+                yield from content
+            finally:
+                exit(state)
+    response.streaming_content = stream()
@@ -0,0 +1,92 @@
+"""
+Request tracing and slow-request logging middleware.
+
+Starts a trace for a sampled fraction of requests (TRACE_SAMPLE_RATE),
+logs its spans as JSON when the request finishes and, with
+TRACE_SERVER_TIMING=1, reports the stage breakdown in a Server-Timing
+header (shown in browser devtools). Streaming responses are traced until
+the last chunk is sent; their header only covers the stages finished
+before the stream started.
+
+With SLOW_REQUEST_MS set, every request records its stages (without
+logging them) so that requests over the threshold can be logged with
+their stage timings and input sizes.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from src.lib.telemetry.tracing import Trace, TracingConfig, activate, deactivate, should_sample
+from .streaming import wrap_streaming_content
+
+
+class TracingMiddleware:
+    """Trace sampled requests and expose their timings."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = TracingConfig.from_env()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        sampled = should_sample(self.config.sample_rate)
+        if not sampled and self.config.slow_request_ms <= 0:
+            return None
+        attributes = {"method": request.method, "path": request.path}
+        if request.META.get("CONTENT_LENGTH"):
+            try:
+                attributes["request_bytes"] = int(request.META["CONTENT_LENGTH"])
+            except ValueError:
+                # Malformed header: Django answers it with a 400, not the tracer with a 500
+                pass
+        return Trace("http.request", attributes, sampled=sampled)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trace = self._start(request)
+        if trace is None:
+            return self.get_response(request)
+        token = activate(trace)
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate(token)
+        return self._finish(trace, response)
+
+    async def __acall__(self, request):
+        trace = self._start(request)
+        if trace is None:
+            return await self.get_response(request)
+        token = activate(trace)
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate(token)
+        return self._finish(trace, response)
+
+    def _finish(self, trace: Trace, response):
+        trace.attributes["status"] = response.status_code
+        if trace.sampled:
+            response["X-Trace-Id"] = trace.trace_id
+            if self.config.server_timing:
+                response["Server-Timing"] = trace.server_timing()
+        if response.streaming:
+            wrap_streaming_content(
+                response,
+                enter=lambda: activate(trace),
+                exit=lambda token: (deactivate(token), self._emit(trace)),
+            )
+        else:
+            self._emit(trace)
+        return response
+
+    def _emit(self, trace: Trace) -> None:
+        trace.finish()
+        if trace.sampled and self.config.log_spans:
+            trace.log()
+        if 0 < self.config.slow_request_ms <= trace.duration_ms:
+            trace.log_slow(self.config.slow_request_ms)
@@ -0,0 +1,109 @@
+"""
+Precomputed responses for endpoints whose payload is fixed at runtime.
+
+A PrecomputedResponse serializes its payload once, compresses it with every
+supported content coding and derives a strong ETag from the body, so serving
+it is a header comparison and a bytes copy. Conditional requests whose
+If-None-Match matches get 304 Not Modified.
+
+Builders decorated with @precompute run on first use, or all at once via
+prime_responses() (e.g. during worker warm-up).
+"""
+
+import hashlib
+import os
+import threading
+from typing import Any, Callable, Dict, List, TypeVar
+
+from django.http import HttpResponse, HttpResponseNotModified
+from pydantic import TypeAdapter
+
+from .compression import SUPPORTED_ENCODINGS, compress, negotiate_encoding
+
+
+# Metadata only changes with a deploy, which also changes the ETag
+METADATA_CACHE_CONTROL = f"public, max-age={int(os.getenv('METADATA_MAX_AGE', '3600'))}"
+
+T = TypeVar("T")
+
+
+def _etag_matches(if_none_match: str, tag: str) -> bool:
+    """Weak comparison (RFC 9110 13.1.2): any listed tag with the same opaque value."""
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == tag:
+            return True
+    return False
+
+
+class PrecomputedResponse:
+    """Serialized, pre-compressed JSON body with a strong ETag."""
+
+    def __init__(self, body: bytes, cache_control: str = METADATA_CACHE_CONTROL,
+                 content_type: str = "application/json"):
+        self.body = body
+        self.cache_control = cache_control
+        self.content_type = content_type
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Each representation gets its own tag; conditional requests accept any of them
+        self.etags = {None: f'"{digest}"'}
+        self.encoded = {}
+        for encoding in SUPPORTED_ENCODINGS:
+            compressed = compress(body, encoding)
+            if len(compressed) < len(body):
+                self.encoded[encoding] = compressed
+                self.etags[encoding] = f'"{digest}-{encoding}"'
+
+    @classmethod
+    def from_value(cls, schema: Any, value: Any, **kwargs) -> "PrecomputedResponse":
+        """Serialize value through the endpoint's response schema."""
+        return cls(TypeAdapter(schema).dump_json(value), **kwargs)
+
+    def serve(self, request) -> HttpResponse:
+        encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), tuple(self.encoded))
+        etag = self.etags[encoding]
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match and any(_etag_matches(if_none_match, tag) for tag in self.etags.values()):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(self.encoded[encoding] if encoding else self.body,
+                                    content_type=self.content_type)
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Cache-Control"] = self.cache_control
+        if self.encoded:
+            response["Vary"] = "Accept-Encoding"
+        return response
+
+
+_builders: List[Callable[[], Any]] = []
+
+
+def precompute(build: Callable[[], T]) -> Callable[[], T]:
+    """Run build once, on first call, and return its result from then on."""
+    lock = threading.Lock()
+    result: Dict[str, T] = {}
+
+    def get() -> T:
+        if "value" not in result:
+            with lock:
+                if "value" not in result:
+                    result["value"] = build()
+        return result["value"]
+
+    get.__name__ = build.__name__
+    get.__doc__ = build.__doc__
+    _builders.append(get)
+    return get
+
+
+def prime_responses() -> int:
+    """Build every registered precomputed response now; returns how many."""
+    for get in _builders:
+        get()
+    return len(_builders)
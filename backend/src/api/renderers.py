@@ -0,0 +1,76 @@
+"""
+JSON rendering and parsing for the Ninja API.
+
+With orjson installed, response bodies are encoded straight to bytes by
+orjson and request bodies are decoded by it, instead of going through the
+stdlib json module and Django's encoder class. Without orjson (or with
+JSON_BACKEND=stdlib) Ninja's own JSONRenderer and Parser are used.
+
+Views returning large Pydantic models can skip Ninja's model_dump() to a
+dict entirely with model_response(), which lets pydantic-core write the
+JSON bytes directly.
+"""
+
+import os
+from typing import Any
+
+from django.http import HttpResponse
+from ninja.parser import Parser
+from ninja.renderers import BaseRenderer, JSONRenderer
+from ninja.responses import NinjaJSONEncoder
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+_fallback_encoder = NinjaJSONEncoder()
+
+
+def _default(obj: Any) -> Any:
+    """Types orjson does not handle natively (Decimal, lazy strings, nested models...)."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Render response data to JSON bytes with orjson."""
+
+    media_type = "application/json"
+    # Dict keys that are not strings (e.g. ints) are rendered as json.dumps would
+    options = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    def render(self, request, data: Any, *, response_status: int) -> bytes:
+        return orjson.dumps(data, default=_default, option=self.options)
+
+
+class ORJSONParser(Parser):
+    """Parse JSON request bodies with orjson (query strings and forms are unchanged)."""
+
+    def parse_body(self, request):
+        return orjson.loads(request.body)
+
+
+def json_backend() -> str:
+    """"orjson" when available and not disabled with JSON_BACKEND=stdlib."""
+    if orjson is None or os.getenv("JSON_BACKEND", "orjson").lower() == "stdlib":
+        return "stdlib"
+    return "orjson"
+
+
+def get_renderer() -> BaseRenderer:
+    return ORJSONRenderer() if json_backend() == "orjson" else JSONRenderer()
+
+
+def get_parser() -> Parser:
+    return ORJSONParser() if json_backend() == "orjson" else Parser()
+
+
+def model_response(model: BaseModel, status: int = 200) -> HttpResponse:
+    """Response serialized by pydantic-core, without an intermediate dict."""
+    return HttpResponse(model.model_dump_json(), status=status, content_type=JSON_CONTENT_TYPE)
@@ -4,5 +4,6 @@ API Routers Package.
 
 from .expert import router as expert_router
 from .chat import router as chat_router
+from .admin import router as admin_router
 
-__all__ = ["expert_router", "chat_router"]
+__all__ = ["expert_router", "chat_router", "admin_router"]
@@ -0,0 +1,69 @@
+"""
+Admin API Router.
+
+Operational endpoints for capturing evidence from a running worker. Every
+endpoint requires the X-Admin-Token header to match ADMIN_TOKEN; when
+ADMIN_TOKEN is unset the endpoints reject all requests.
+"""
+
+import asyncio
+import hmac
+import os
+import time
+
+from django.http import HttpResponse
+from ninja import Query, Router
+from ninja.errors import HttpError
+from ninja.security import APIKeyHeader
+
+from src.lib.telemetry.profiler import ProfilerBusyError, finish_session, start_session
+
+
+class AdminToken(APIKeyHeader):
+    param_name = "X-Admin-Token"
+
+    def authenticate(self, request, key):
+        expected = os.getenv("ADMIN_TOKEN", "")
+        if expected and key and hmac.compare_digest(key.encode(), expected.encode()):
+            return "admin"
+        return None
+
+
+router = Router(tags=["Admin"], auth=AdminToken())
+
+
+@router.post(
+    "/profile",
+    summary="Profile the next requests in this worker",
+    description=(
+        "Runs a sampling profiler over the next `requests` requests handled by the worker that "
+        "receives this call (optionally only paths under `path_prefix`) and returns their stacks "
+        "in collapsed format (`frame;frame;frame count` per line) for flamegraph.pl or speedscope. "
+        "Returns whatever was captured when `timeout` seconds pass first."
+    ),
+)
+async def profile(
+    request,
+    requests: int = Query(20, ge=1, le=1000),
+    interval_ms: float = Query(5.0, ge=1.0, le=100.0),
+    timeout: float = Query(60.0, gt=0, le=600),
+    path_prefix: str = "/api/",
+):
+    """Capture a collapsed-stack profile of upcoming requests."""
+    try:
+        session = start_session(requests=requests, interval=interval_ms / 1000, path_prefix=path_prefix)
+    except ProfilerBusyError as exc:
+        raise HttpError(409, str(exc))
+    deadline = time.monotonic() + timeout
+    try:
+        while not session.done.is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+    finally:
+        finish_session(session)
+
+    stats = session.stats()
+    response = HttpResponse(session.collapsed(), content_type="text/plain; charset=utf-8")
+    response["X-Profile-Worker"] = str(os.getpid())
+    response["X-Profile-Requests"] = str(stats["completed"])
+    response["X-Profile-Samples"] = str(stats["samples"])
+    return response
@@ -5,13 +5,35 @@ Provides conversational interface powered by LLM with expert system knowledge as
 """
 
 import asyncio
-import re
+import json
+import logging
+from dataclasses import dataclass
+from asgiref.sync import async_to_sync
+from django.http import StreamingHttpResponse
 from ninja import Router
 from typing import Optional, List
 
 from src.lib.ai.llm_client import LLMClient, get_available_models, DEFAULT_MODEL
+from src.lib.ai.circuit_breaker import CircuitOpenError
+from src.lib.ai.retry import LLMUnavailableError
 from src.lib.ai.knowledge_base import get_knowledge_base
-from src.lib.ai.prompts import build_system_prompt, build_diagnosis_context
+from src.lib.ai.keyword_matcher import KeywordMatcher
+from src.lib.ai.prompts import (
+    build_system_prompt,
+    build_diagnosis_context,
+    build_context_message,
+    build_degraded_response,
+    get_system_prompt_tokens,
+)
+from src.lib.expert_system.process_pool import run_diagnosis_async
+from src.api.routers.expert import CONFIDENCE_ORDER, VALID_SYMPTOMS
+from src.lib.ai.prompt_packer import PackedPrompt, get_prompt_packer
+from src.lib.ai.model_routing import AUTO_MODEL, get_model_router
+from src.lib.ai.rate_limit import LLMBusyError
+from src.lib.ai.tokenizer import count_tokens
+from src.lib.telemetry.tracing import annotate, span
+from src.api.precomputed import PrecomputedResponse, precompute
+from src.api.renderers import model_response
 from src.api.schemas.chat import (
     ChatMessage,
     ChatRequest,
@@ -19,11 +41,29 @@ from src.api.schemas.chat import (
     ModelInfo,
     ModelSettingsRequest,
     ModelsResponse,
+    ModelStatsInfo,
+    RoutingInfo,
+    TokenUsage,
 )
+from src.api.schemas.expert import PatientInput
+
+
+logger = logging.getLogger(__name__)
 
 
 router = Router(tags=["AI Chat"])
 
+# Tokens reserved for each assistant reply
+CHAT_MAX_TOKENS = 1024
+
+# Reported as model_used when the expert system answers in place of the LLM
+EXPERT_SYSTEM_MODEL = "expert-system"
+
+CHAT_ERROR_MESSAGE = (
+    "I apologize, but I'm unable to respond right now. "
+    "Please try again in a moment or rephrase your question."
+)
+
 
 # Symptom keywords for extraction
 SYMPTOM_KEYWORDS = {
@@ -31,7 +71,7 @@ SYMPTOM_KEYWORDS = {
     "chills": ["chills", "rigors", "shivering", "shaking"],
     "sweating": ["sweating", "sweats", "diaphoresis", "perspiration"],
     "diarrhea": ["diarrhea", "diarrhoea", "loose stool", "watery stool"],
-    "vomiting": ["vomiting", "vomit", "throwing up", "nausea"],
+    "vomiting": ["vomiting", "vomit", "throwing up", "nausea", "nauseated", "nauseous"],
     "headache": ["headache", "head pain", "head ache"],
     "abdominal_pain": ["abdominal pain", "stomach pain", "belly pain", "tummy pain"],
     "body_aches": ["body aches", "muscle pain", "joint pain", "myalgia", "arthralgia"],
@@ -51,48 +91,238 @@ DISEASE_KEYWORDS = {
 }
 
 
+# Chat symptom labels that the expert system knows under another name
+ENGINE_SYMPTOM_NAMES = {
+    "confusion": "altered_consciousness",
+}
+
+
+# Automata are compiled once at import; each scan is a single pass over the text
+SYMPTOM_MATCHER = KeywordMatcher(SYMPTOM_KEYWORDS)
+DISEASE_MATCHER = KeywordMatcher(DISEASE_KEYWORDS)
+
+
 def extract_symptoms_from_text(text: str) -> List[str]:
-    """Extract mentioned symptoms from user text."""
-    text_lower = text.lower()
-    found_symptoms = []
+    """Extract mentioned symptoms from user text, in order of first mention."""
+    return SYMPTOM_MATCHER.ordered_labels(text)
+
+
+def extract_diseases_from_text(text: str) -> List[str]:
+    """Extract mentioned diseases from user text, in order of first mention."""
+    return DISEASE_MATCHER.ordered_labels(text)
+
+
+async def _await(coro):
+    return await coro
+
+
+def run_async(coro):
+    """
+    Run async coroutine in sync context.
     
-    for symptom, keywords in SYMPTOM_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                found_symptoms.append(symptom)
-                break
+    Under ASGI the view runs in a worker thread and the coroutine is handed
+    back to the server's event loop (with the request's context, e.g. its
+    trace), where it shares the upstream connection pool; elsewhere it gets
+    a loop of its own.
+    """
+    return async_to_sync(_await)(coro)
+
+
+async def _expert_system_answer(data: ChatRequest, symptoms: List[str], knowledge_context: List[dict]) -> str:
+    """
+    Answer from the rule-based expert system when the LLM is unavailable.
     
-    return list(set(found_symptoms))
+    Extracted symptoms are mapped onto the engine's symptom names, run
+    through the diagnosis process pool (like /api/expert/diagnose) together
+    with any patient context, and rendered with the retrieved knowledge into
+    a templated response.
+    """
+    engine_symptoms = []
+    for name in symptoms:
+        name = ENGINE_SYMPTOM_NAMES.get(name, name)
+        if name in VALID_SYMPTOMS and name not in engine_symptoms:
+            engine_symptoms.append(name)
+    
+    patient_info = None
+    if data.patient_context:
+        patient_info = {
+            key: value for key, value in data.patient_context.items()
+            if key in PatientInput.model_fields and value is not None
+        } or None
+    
+    diagnoses, recommendations = [], []
+    if engine_symptoms:
+        result = await run_diagnosis_async(
+            symptoms=[{"name": name, "present": True} for name in engine_symptoms],
+            patient_info=patient_info,
+        )
+        diagnoses = sorted(
+            result.get("diagnoses", []),
+            key=lambda d: CONFIDENCE_ORDER.get(d.get("confidence"), 4),
+        )
+        recommendations = result.get("recommendations", [])
+    
+    if not knowledge_context and symptoms:
+        knowledge_context = await asyncio.to_thread(
+            get_knowledge_base().get_relevant_context, symptoms=symptoms, query=data.message, max_chunks=3,
+        )
+    
+    return build_degraded_response(
+        symptoms=symptoms,
+        diagnoses=diagnoses,
+        recommendations=recommendations,
+        knowledge_context=knowledge_context,
+    )
 
 
-def extract_diseases_from_text(text: str) -> List[str]:
-    """Extract mentioned diseases from user text."""
-    text_lower = text.lower()
-    found_diseases = []
+def _route_model(data: ChatRequest):
+    """
+    Resolve the model for a request.
     
-    for disease, keywords in DISEASE_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                found_diseases.append(disease)
-                break
+    Adaptive routing applies when the client asks for model "auto", or sends
+    no model while LLM_ROUTING_MODE=adaptive; explicit model ids are honored.
     
-    return list(set(found_diseases))
+    Returns:
+        (model_id, routing_reason) - reason is None when routing was not used
+    """
+    model_router = get_model_router()
+    if data.model != AUTO_MODEL and not (data.model is None and model_router.adaptive):
+        return data.model or DEFAULT_MODEL, None
+    
+    conversation_tokens = count_tokens(data.message) + sum(
+        count_tokens(msg.content) for msg in data.conversation_history
+    )
+    # Prefer models that fit the whole conversation without summarizing
+    required_context = (
+        get_system_prompt_tokens(include_rules=data.include_expert_context)
+        + conversation_tokens + CHAT_MAX_TOKENS
+    )
+    return model_router.choose(
+        conversation_tokens=conversation_tokens,
+        turns=len(data.conversation_history),
+        required_context=required_context,
+    )
 
 
-def run_async(coro):
-    """Run async coroutine in sync context."""
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Create a new loop if current is running
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, coro)
-                return future.result()
-        else:
-            return loop.run_until_complete(coro)
-    except RuntimeError:
-        return asyncio.run(coro)
+def _build_usage(packed, upstream_usage: Optional[dict], include_rules: bool) -> TokenUsage:
+    """Combine local prompt estimates with the provider's reported usage."""
+    upstream_usage = upstream_usage or {}
+    details = upstream_usage.get("prompt_tokens_details") or {}
+    return TokenUsage(
+        estimated_prompt_tokens=packed.prompt_tokens,
+        static_prefix_tokens=get_system_prompt_tokens(include_rules=include_rules),
+        summarized_turns=packed.summarized_turns,
+        prompt_tokens=upstream_usage.get("prompt_tokens"),
+        cached_prompt_tokens=details.get("cached_tokens"),
+        completion_tokens=upstream_usage.get("completion_tokens"),
+    )
+
+
+@dataclass
+class PreparedChat:
+    """Everything needed to call the LLM for one chat request."""
+    extracted_symptoms: List[str]
+    knowledge_context: List[dict]
+    model: str
+    routing_reason: Optional[str]
+    packed: PackedPrompt
+
+
+def _prepare_chat(data: ChatRequest) -> PreparedChat:
+    """Extract symptoms, retrieve knowledge, pick the model and pack the prompt."""
+    # Extract symptoms and diseases from conversation for context
+    with span("chat.extract_symptoms", history_turns=len(data.conversation_history)) as s:
+        all_text = data.message
+        for msg in data.conversation_history:
+            all_text += " " + msg.content
+        
+        extracted_symptoms = extract_symptoms_from_text(all_text)
+        extracted_diseases = extract_diseases_from_text(all_text)
+        s.set(symptoms=len(extracted_symptoms), diseases=len(extracted_diseases))
+    annotate(
+        history_turns=len(data.conversation_history),
+        history_chars=len(all_text) - len(data.message),
+        message_chars=len(data.message),
+        symptoms=len(extracted_symptoms),
+    )
+    
+    # Get relevant knowledge context if enabled
+    knowledge_context = []
+    if data.include_expert_context and (extracted_symptoms or extracted_diseases):
+        with span("chat.retrieve_knowledge") as s:
+            kb = get_knowledge_base()
+            knowledge_context = kb.get_relevant_context(
+                symptoms=extracted_symptoms,
+                diseases=extracted_diseases if extracted_diseases else None,
+                query=data.message,
+                max_chunks=3,
+            )
+            s.set(chunks=len(knowledge_context))
+    
+    with span("chat.build_prompt"):
+        # System prompt with expert rules
+        system_prompt = build_system_prompt(
+            include_rules=data.include_expert_context,
+            include_guidelines=True,
+        )
+        
+        # Per-request context travels in its own message after the user turn
+        context_message = None
+        if knowledge_context or data.patient_context:
+            context = build_diagnosis_context(
+                symptoms=extracted_symptoms if extracted_symptoms else None,
+                patient_info=data.patient_context,
+                knowledge_context=knowledge_context,
+            )
+            if context:
+                context_message = build_context_message(context, extracted_symptoms)
+    
+    with span("chat.route_model") as s:
+        model, routing_reason = _route_model(data)
+        s.set(model=model, reason=routing_reason)
+    
+    # Fit history into the model's context window; older turns are summarized
+    with span("chat.pack_prompt") as s:
+        packed = get_prompt_packer().pack(
+            system_prompt=system_prompt,
+            history=[{"role": msg.role, "content": msg.content} for msg in data.conversation_history],
+            user_message=data.message,
+            model_id=model,
+            max_tokens=CHAT_MAX_TOKENS,
+            context_message=context_message,
+        )
+        s.set(prompt_tokens=packed.prompt_tokens, summarized_turns=packed.summarized_turns)
+    
+    return PreparedChat(
+        extracted_symptoms=extracted_symptoms,
+        knowledge_context=knowledge_context,
+        model=model,
+        routing_reason=routing_reason,
+        packed=packed,
+    )
+
+
+def _suggest_diseases(extracted_symptoms: List[str]) -> Optional[List[str]]:
+    """Diseases suggested by the extracted symptoms, if any."""
+    if not extracted_symptoms:
+        return None
+    suggested = []
+    if any(s in ["fever", "chills", "sweating", "bitter_taste"] for s in extracted_symptoms):
+        suggested.append("malaria")
+    if any(s in ["diarrhea", "vomiting", "dehydration"] for s in extracted_symptoms):
+        suggested.append("cholera")
+    if any(s in ["fever", "constipation", "abdominal_pain"] for s in extracted_symptoms):
+        suggested.append("typhoid_fever")
+    return list(set(suggested)) or None
+
+
+def _log_usage(model: str, routing_reason: Optional[str], usage: TokenUsage) -> None:
+    logger.info(
+        "chat prompt tokens: model=%s routing=%s estimated=%d static_prefix=%d summarized_turns=%d "
+        "upstream=%s cached=%s",
+        model, routing_reason, usage.estimated_prompt_tokens, usage.static_prefix_tokens,
+        usage.summarized_turns, usage.prompt_tokens, usage.cached_prompt_tokens,
+    )
 
 
 @router.post(
@@ -108,91 +338,169 @@ def chat_message(request, data: ChatRequest):
     The assistant uses LLM capabilities enhanced with expert system knowledge
     to provide helpful medical guidance.
     """
-    # Extract symptoms and diseases from conversation for context
-    all_text = data.message
-    for msg in data.conversation_history:
-        all_text += " " + msg.content
-    
-    extracted_symptoms = extract_symptoms_from_text(all_text)
-    extracted_diseases = extract_diseases_from_text(all_text)
-    
-    # Get relevant knowledge context if enabled
-    knowledge_context = []
-    if data.include_expert_context and (extracted_symptoms or extracted_diseases):
-        kb = get_knowledge_base()
-        knowledge_context = kb.get_relevant_context(
-            symptoms=extracted_symptoms,
-            diseases=extracted_diseases if extracted_diseases else None,
-            query=data.message,
-            max_chunks=3,
-        )
-    
-    # Build messages for LLM
-    messages = []
-    
-    # System prompt with expert rules
-    system_prompt = build_system_prompt(
-        include_rules=data.include_expert_context,
-        include_guidelines=True,
-    )
-    messages.append({"role": "system", "content": system_prompt})
-    
-    # Add conversation history
-    for msg in data.conversation_history:
-        messages.append({"role": msg.role, "content": msg.content})
-    
-    # Build user message with context
-    user_message = data.message
-    if knowledge_context or data.patient_context:
-        context = build_diagnosis_context(
-            symptoms=extracted_symptoms if extracted_symptoms else None,
-            patient_info=data.patient_context,
-            knowledge_context=knowledge_context,
-        )
-        if context:
-            user_message = f"[Context for assistant - user provided symptoms: {', '.join(extracted_symptoms) if extracted_symptoms else 'none extracted yet'}]\n\n{context}\n\n---\n\nUser: {data.message}"
-    
-    messages.append({"role": "user", "content": user_message})
+    with span("chat.prepare"):
+        prepared = _prepare_chat(data)
+    model = prepared.model
     
     # Call LLM
-    model = data.model or DEFAULT_MODEL
     client = LLMClient(model=model)
+    degraded = False
     
     try:
-        response_text = run_async(client.chat(
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1024,
-        ))
-    except Exception as e:
-        response_text = f"I apologize, but I encountered an error processing your request. Please try again or rephrase your question. (Error: {str(e)})"
+        with span("chat.llm", model=model) as s:
+            response_text = run_async(client.chat(
+                messages=prepared.packed.messages,
+                temperature=0.7,
+                max_tokens=CHAT_MAX_TOKENS,
+                # First-turn questions repeat across users; later turns are personal
+                cacheable=not data.conversation_history,
+            ))
+            s.set(model_used=client.last_model_used, cached=client.last_cache_hit)
+    except LLMBusyError:
+        # Surfaced as 503 + Retry-After by the API's exception handler
+        logger.warning("chat rejected, upstream capacity exhausted: model=%s", model)
+        raise
+    except (CircuitOpenError, LLMUnavailableError) as exc:
+        # Upstream is down: answer from the expert system within bounded latency
+        logger.warning("chat degraded to expert system: model=%s reason=%s", model, type(exc).__name__)
+        with span("chat.degraded_answer"):
+            response_text = run_async(
+                _expert_system_answer(data, prepared.extracted_symptoms, prepared.knowledge_context)
+            )
+        degraded = True
+    except Exception:
+        logger.exception("chat completion failed: model=%s", model)
+        response_text = CHAT_ERROR_MESSAGE
+    
+    usage = _build_usage(prepared.packed, client.last_usage, data.include_expert_context)
+    _log_usage(model, prepared.routing_reason, usage)
     
     # Update conversation history
     updated_history = list(data.conversation_history)
     updated_history.append(ChatMessage(role="user", content=data.message))
     updated_history.append(ChatMessage(role="assistant", content=response_text))
     
-    # Extract any new symptoms mentioned in the response
-    suggested_diseases = None
-    if extracted_symptoms:
-        # Based on extracted symptoms, suggest relevant diseases
-        suggested = []
-        if any(s in ["fever", "chills", "sweating", "bitter_taste"] for s in extracted_symptoms):
-            suggested.append("malaria")
-        if any(s in ["diarrhea", "vomiting", "dehydration"] for s in extracted_symptoms):
-            suggested.append("cholera")
-        if any(s in ["fever", "constipation", "abdominal_pain"] for s in extracted_symptoms):
-            suggested.append("typhoid_fever")
-        if suggested:
-            suggested_diseases = list(set(suggested))
-    
-    return ChatResponse(
+    # The body echoes the whole history: serialize it straight to JSON bytes
+    return model_response(ChatResponse(
         response=response_text,
-        model_used=model,
+        model_used=EXPERT_SYSTEM_MODEL if degraded else (client.last_model_used or model),
         conversation_history=updated_history,
-        extracted_symptoms=extracted_symptoms if extracted_symptoms else None,
-        suggested_diseases=suggested_diseases,
+        extracted_symptoms=prepared.extracted_symptoms or None,
+        suggested_diseases=_suggest_diseases(prepared.extracted_symptoms),
+        usage=usage,
+        cached=client.last_cache_hit,
+        routing_reason=prepared.routing_reason,
+        degraded=degraded,
+    ))
+
+
+def _sse(payload: dict, event: Optional[str] = None) -> bytes:
+    """Encode one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+async def _open_chat_stream(data: ChatRequest, prepared: PreparedChat, client: LLMClient):
+    """
+    Start the reply and return the generator of its SSE events.
+
+    The upstream stream is opened and its first chunk awaited before any
+    response headers go out, so a busy upstream still becomes a 503 with
+    Retry-After and an outage a degraded answer, as on /message.
+    """
+    model = prepared.model
+    try:
+        with span("chat.llm", model=model, stream=True) as s:
+            stream = await client.chat(
+                messages=prepared.packed.messages,
+                temperature=0.7,
+                max_tokens=CHAT_MAX_TOKENS,
+                stream=True,
+                cacheable=not data.conversation_history,
+            )
+            # Admission to the upstream, and its failures, come with the first chunk
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                first, stream = "", None
+            s.set(model_used=client.last_model_used, cached=client.last_cache_hit)
+    except LLMBusyError:
+        # Surfaced as 503 + Retry-After by the API's exception handler
+        logger.warning("chat stream rejected, upstream capacity exhausted: model=%s", model)
+        raise
+    except (CircuitOpenError, LLMUnavailableError) as exc:
+        logger.warning("chat stream degraded to expert system: model=%s reason=%s", model, type(exc).__name__)
+        with span("chat.degraded_answer"):
+            answer = await _expert_system_answer(data, prepared.extracted_symptoms, prepared.knowledge_context)
+        return _stream_chat_events(data, prepared, client, answer, None, degraded=True)
+    except Exception:
+        logger.exception("chat stream failed: model=%s", model)
+        return _stream_chat_events(data, prepared, client, CHAT_ERROR_MESSAGE, None)
+    return _stream_chat_events(data, prepared, client, first, stream)
+
+
+async def _stream_chat_events(
+    data: ChatRequest,
+    prepared: PreparedChat,
+    client: LLMClient,
+    first: str,
+    stream,
+    degraded: bool = False,
+):
+    """
+    Yield the reply as SSE "message" events carrying text deltas, then a
+    final "done" event with the same metadata as the JSON endpoint (or an
+    "error" event if the upstream fails part-way).
+    """
+    model = prepared.model
+    if first:
+        yield _sse({"delta": first})
+    if stream is not None:
+        try:
+            async for chunk in stream:
+                yield _sse({"delta": chunk})
+        except (CircuitOpenError, LLMUnavailableError) as exc:
+            logger.warning("chat stream interrupted: model=%s reason=%s", model, type(exc).__name__)
+            yield _sse({"error": "interrupted"}, event="error")
+            return
+        except Exception:
+            logger.exception("chat stream failed: model=%s", model)
+            yield _sse({"error": "interrupted"}, event="error")
+            return
+
+    usage = _build_usage(prepared.packed, client.last_usage, data.include_expert_context)
+    _log_usage(model, prepared.routing_reason, usage)
+    yield _sse({
+        "model_used": EXPERT_SYSTEM_MODEL if degraded else (client.last_model_used or model),
+        "extracted_symptoms": prepared.extracted_symptoms or None,
+        "suggested_diseases": _suggest_diseases(prepared.extracted_symptoms),
+        "usage": usage.model_dump(),
+        "cached": client.last_cache_hit,
+        "routing_reason": prepared.routing_reason,
+        "degraded": degraded,
+    }, event="done")
+
+
+@router.post(
+    "/message/stream",
+    summary="Stream chat message",
+    description=(
+        "Send a message and receive the reply as Server-Sent Events: text deltas as "
+        "'message' events, then a 'done' event with model, symptoms and usage metadata."
+    ),
+)
+async def chat_message_stream(request, data: ChatRequest):
+    """Streaming variant of /message; the client appends the exchange to its history."""
+    with span("chat.prepare"):
+        prepared = await asyncio.to_thread(_prepare_chat, data)
+    client = LLMClient(model=prepared.model)
+    response = StreamingHttpResponse(
+        await _open_chat_stream(data, prepared, client),
+        content_type="text/event-stream",
     )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 @router.get(
@@ -202,15 +510,34 @@ def chat_message(request, data: ChatRequest):
     description="Get list of available LLM models that can be used for chat.",
 )
 def list_models(request):
-    """Return all available LLM models."""
-    models = [
-        ModelInfo(**m) for m in get_available_models()
-    ]
-    return ModelsResponse(
-        models=models,
+    """Return all available LLM models and adaptive routing statistics."""
+    global _last_models_response
+    routing = get_model_router().stats()
+    body = ModelsResponse(
+        models=_model_infos(),
         default_model=DEFAULT_MODEL,
         current_model=None,  # Stateless - no session tracking
-    )
+        routing=RoutingInfo(
+            mode=routing["mode"],
+            latency_slo_ms=routing["latency_slo_ms"],
+            decisions=routing["decisions"],
+            models=[ModelStatsInfo(**m) for m in routing["models"]],
+        ),
+    ).model_dump_json().encode()
+    # Routing statistics change with chat traffic: reuse the compressed body
+    # and ETag until they do, and make clients revalidate every time.
+    cached = _last_models_response
+    if cached is None or cached.body != body:
+        cached = _last_models_response = PrecomputedResponse(body, cache_control="no-cache")
+    return cached.serve(request)
+
+
+_last_models_response: Optional[PrecomputedResponse] = None
+
+
+@precompute
+def _model_infos() -> List[ModelInfo]:
+    return [ModelInfo(**m) for m in get_available_models()]
 
 
 @router.post(
@@ -221,7 +548,7 @@ def list_models(request):
 def validate_model(request, data: ModelSettingsRequest):
     """Validate that a model ID is available."""
     available = [m["id"] for m in get_available_models()]
-    is_valid = data.model in available
+    is_valid = data.model in available or data.model == AUTO_MODEL
     
     return {
         "model": data.model,
@@ -7,7 +7,9 @@ Provides structured endpoints for direct interaction with the medical diagnosis
 from ninja import Router
 from typing import Optional, List
 
-from src.lib.expert_system.diagnosis_engine import run_diagnosis
+from src.lib.expert_system.process_pool import run_diagnosis_async
+from src.lib.telemetry.tracing import annotate
+from src.api.precomputed import PrecomputedResponse, precompute
 from src.api.schemas.expert import (
     DiagnoseRequest,
     DiagnoseResponse,
@@ -20,6 +22,10 @@ from src.api.schemas.expert import (
 router = Router(tags=["Expert System"])
 
 
+# Most certain diagnoses first
+CONFIDENCE_ORDER = {"confirmed": 0, "confident": 1, "suspect": 2, "uncertain": 3}
+
+
 # Valid symptoms the expert system accepts
 VALID_SYMPTOMS = {
     "fever": {
@@ -179,27 +185,38 @@ DISEASES = {
     summary="Run expert system diagnosis",
     description="Analyze symptoms using the rule-based expert system and return possible diagnoses.",
 )
-def diagnose(request, data: DiagnoseRequest):
+async def diagnose(request, data: DiagnoseRequest):
     """
     Run diagnosis using the medical expert system.
     
     The expert system uses rule-based reasoning to evaluate symptoms and
-    return possible diagnoses with confidence levels.
+    return possible diagnoses with confidence levels. The rules run in the
+    diagnosis process pool, off this worker's event loop; a full pool
+    answers 503 with Retry-After.
     """
-    # Convert Pydantic models to dicts for the expert system
-    symptoms = [s.model_dump(exclude_none=True) for s in data.symptoms]
-    patient_info = data.patient.model_dump(exclude_none=True) if data.patient else None
-    lab_results = [l.model_dump(exclude_none=True) for l in data.lab_results] if data.lab_results else None
-    dehydration_signs = [d.model_dump(exclude_none=True) for d in data.dehydration_signs] if data.dehydration_signs else None
-    
-    # Run the expert system
-    result = run_diagnosis(
-        symptoms=symptoms,
-        patient_info=patient_info,
-        lab_results=lab_results,
-        dehydration_signs=dehydration_signs,
+    inputs = diagnosis_inputs(data)
+    annotate(
+        symptoms=len(inputs["symptoms"]),
+        lab_results=len(inputs["lab_results"] or []),
+        dehydration_signs=len(inputs["dehydration_signs"] or []),
     )
-    
+    return diagnose_response(await run_diagnosis_async(**inputs))
+
+
+def diagnosis_inputs(data: DiagnoseRequest) -> dict:
+    """run_diagnosis keyword arguments for a request (plain dicts, picklable for the pool)."""
+    return {
+        "symptoms": [s.model_dump(exclude_none=True) for s in data.symptoms],
+        "patient_info": data.patient.model_dump(exclude_none=True) if data.patient else None,
+        "lab_results": [l.model_dump(exclude_none=True) for l in data.lab_results] if data.lab_results else None,
+        "dehydration_signs": (
+            [d.model_dump(exclude_none=True) for d in data.dehydration_signs] if data.dehydration_signs else None
+        ),
+    }
+
+
+def diagnose_response(result: dict) -> DiagnoseResponse:
+    """Build the response body from a run_diagnosis result."""
     # Transform diagnoses to response format
     diagnoses = []
     for diag in result.get("diagnoses", []):
@@ -212,13 +229,18 @@ def diagnose(request, data: DiagnoseRequest):
         ))
     
     # Sort by confidence level
-    confidence_order = {"confirmed": 0, "confident": 1, "suspect": 2, "uncertain": 3}
-    diagnoses.sort(key=lambda d: confidence_order.get(d.confidence, 4))
+    diagnoses.sort(key=lambda d: CONFIDENCE_ORDER.get(d.confidence, 4))
+    
+    # Urgent recommendations come from the engine as {'type', 'action'} dicts
+    recommendations = [
+        rec.get("action", "") if isinstance(rec, dict) else rec
+        for rec in result.get("recommendations", [])
+    ]
     
     # Extract dehydration info if present
     dehydration_level = None
     treatment_plan = None
-    for rec in result.get("recommendations", []):
+    for rec in recommendations:
         if "dehydration" in rec.lower():
             # Parse dehydration info from recommendations
             if "severe" in rec.lower():
@@ -233,7 +255,7 @@ def diagnose(request, data: DiagnoseRequest):
     
     return DiagnoseResponse(
         diagnoses=diagnoses,
-        recommendations=result.get("recommendations", []),
+        recommendations=recommendations,
         dehydration_level=dehydration_level,
         treatment_plan=treatment_plan,
     )
@@ -247,7 +269,12 @@ def diagnose(request, data: DiagnoseRequest):
 )
 def list_symptoms(request):
     """Return all valid symptoms the expert system accepts."""
-    return [
+    return _symptoms_response().serve(request)
+
+
+@precompute
+def _symptoms_response() -> PrecomputedResponse:
+    return PrecomputedResponse.from_value(List[SymptomInfo], [
         SymptomInfo(
             name=name,
             display_name=info["display_name"],
@@ -255,7 +282,16 @@ def list_symptoms(request):
             options=info["options"],
         )
         for name, info in VALID_SYMPTOMS.items()
-    ]
+    ])
+
+
+def _disease_info(info: dict) -> DiseaseInfo:
+    return DiseaseInfo(
+        name=info["name"],
+        description=info["description"],
+        key_symptoms=info["key_symptoms"],
+        pathognomonic_signs=info["pathognomonic_signs"],
+    )
 
 
 @router.get(
@@ -266,15 +302,17 @@ def list_symptoms(request):
 )
 def list_diseases(request):
     """Return all diseases the expert system can diagnose."""
-    return [
-        DiseaseInfo(
-            name=info["name"],
-            description=info["description"],
-            key_symptoms=info["key_symptoms"],
-            pathognomonic_signs=info["pathognomonic_signs"],
-        )
-        for info in DISEASES.values()
-    ]
+    return _diseases_response().serve(request)
+
+
+@precompute
+def _diseases_response() -> PrecomputedResponse:
+    return PrecomputedResponse.from_value(List[DiseaseInfo], [_disease_info(info) for info in DISEASES.values()])
+
+
+@precompute
+def _disease_responses() -> dict:
+    return {key: PrecomputedResponse.from_value(DiseaseInfo, _disease_info(info)) for key, info in DISEASES.items()}
 
 
 @router.get(
@@ -291,10 +329,4 @@ def get_disease(request, disease_name: str):
         from ninja.errors import HttpError
         raise HttpError(404, f"Disease '{disease_name}' not found. Available: {list(DISEASES.keys())}")
     
-    info = DISEASES[disease_key]
-    return DiseaseInfo(
-        name=info["name"],
-        description=info["description"],
-        key_symptoms=info["key_symptoms"],
-        pathognomonic_signs=info["pathognomonic_signs"],
-    )
+    return _disease_responses()[disease_key].serve(request)
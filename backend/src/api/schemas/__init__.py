@@ -20,8 +20,11 @@ from .chat import (
     ChatMessage,
     ChatRequest,
     ChatResponse,
+    TokenUsage,
     ModelInfo,
     ModelSettingsRequest,
+    ModelStatsInfo,
+    RoutingInfo,
 )
 
 __all__ = [
@@ -39,6 +42,9 @@ __all__ = [
     "ChatMessage",
     "ChatRequest",
     "ChatResponse",
+    "TokenUsage",
     "ModelInfo",
     "ModelSettingsRequest",
+    "ModelStatsInfo",
+    "RoutingInfo",
 ]
@@ -2,7 +2,7 @@
 Pydantic schemas for AI Chat API endpoints.
 """
 
-from typing import Optional, Literal, List
+from typing import Dict, Optional, Literal, List
 from pydantic import BaseModel, Field
 
 
@@ -31,7 +31,11 @@ class ChatRequest(BaseModel):
         description="Previous messages in the conversation for context"
     )
     model: Optional[str] = Field(
-        None, description="Model to use (defaults to llama-3.3-70b-versatile)"
+        None,
+        description=(
+            "Model to use (defaults to llama-3.3-70b-versatile); "
+            "'auto' picks one adaptively from observed latency and request size"
+        ),
     )
     include_expert_context: bool = Field(
         True, description="Whether to include expert system context in AI reasoning"
@@ -53,6 +57,28 @@ class ChatRequest(BaseModel):
     }
 
 
+class TokenUsage(BaseModel):
+    """Prompt token accounting for a single chat request."""
+    estimated_prompt_tokens: int = Field(
+        ..., description="Locally estimated prompt tokens sent to the model"
+    )
+    static_prefix_tokens: int = Field(
+        ..., description="Estimated tokens in the static, cacheable system prompt"
+    )
+    summarized_turns: int = Field(
+        0, description="Older turns folded into the conversation summary"
+    )
+    prompt_tokens: Optional[int] = Field(
+        None, description="Prompt tokens reported by the provider"
+    )
+    cached_prompt_tokens: Optional[int] = Field(
+        None, description="Prompt tokens served from the provider's prompt cache"
+    )
+    completion_tokens: Optional[int] = Field(
+        None, description="Completion tokens reported by the provider"
+    )
+
+
 class ChatResponse(BaseModel):
     """Response schema for chat endpoint."""
     response: str = Field(..., description="AI assistant's response")
@@ -66,6 +92,19 @@ class ChatResponse(BaseModel):
     suggested_diseases: Optional[List[str]] = Field(
         None, description="Diseases suggested based on conversation"
     )
+    usage: Optional[TokenUsage] = Field(
+        None, description="Prompt token accounting for this request"
+    )
+    cached: bool = Field(
+        False, description="Whether the response was served from the response cache"
+    )
+    routing_reason: Optional[str] = Field(
+        None, description="Why the model was chosen when adaptive routing picked it"
+    )
+    degraded: bool = Field(
+        False,
+        description="Whether the LLM was unavailable and the answer came from the expert system",
+    )
 
 
 class ModelInfo(BaseModel):
@@ -90,8 +129,30 @@ class ModelSettingsRequest(BaseModel):
     }
 
 
+class ModelStatsInfo(BaseModel):
+    """Rolling upstream statistics for one model (this worker only)."""
+    model: str = Field(..., description="Model identifier")
+    requests: int = Field(..., description="Upstream calls in the rolling window")
+    error_rate: float = Field(..., description="Fraction of calls that failed")
+    p50_latency_ms: Optional[float] = Field(None, description="Median latency of successful calls")
+    p95_latency_ms: Optional[float] = Field(None, description="95th percentile latency of successful calls")
+    tokens_per_second: Optional[float] = Field(None, description="Median completion throughput")
+    healthy: bool = Field(..., description="Whether the model meets the error and latency SLO")
+
+
+class RoutingInfo(BaseModel):
+    """Adaptive routing configuration and observed per-model statistics."""
+    mode: str = Field(..., description="'static' or 'adaptive'")
+    latency_slo_ms: float = Field(..., description="p95 latency a model must meet to be routed to")
+    decisions: Dict[str, int] = Field(
+        default_factory=dict, description="Routing decisions made, keyed by 'model:reason'"
+    )
+    models: List[ModelStatsInfo] = Field(..., description="Per-model statistics")
+
+
 class ModelsResponse(BaseModel):
     """Response listing available models."""
     models: List[ModelInfo] = Field(..., description="List of available models")
     default_model: str = Field(..., description="Default model ID")
     current_model: Optional[str] = Field(None, description="Currently selected model")
+    routing: Optional[RoutingInfo] = Field(None, description="Adaptive routing statistics")
@@ -0,0 +1,215 @@
+"""
+Worker warm-up and readiness.
+
+The first requests to a fresh worker used to pay for everything built
+lazily: loading and indexing the knowledge base, compiling the diagnosis
+engine's rule network, building the metadata response bodies and opening
+TLS connections to the LLM upstream. warm_up() does all of it once, before
+the worker reports ready:
+
+    knowledge_base   get_knowledge_base() (read, chunk and index markdown)
+    engine_pool      prebuild ENGINE_POOL_SIZE diagnosis engines (only when
+                     DIAGNOSIS_PROCESSES=0 runs diagnoses in the worker)
+    prompts          build the prompt packer
+    responses        load the URLconf (importing every router) and prime
+                     the precomputed metadata responses
+    diagnosis_pool   start the diagnosis processes (src.lib.expert_system.
+                     process_pool), each building its engine
+    llm_connections  open keep-alive connections to the LLM upstream
+                     (best effort: a down upstream does not block readiness)
+
+WarmupLifespan wraps the Django ASGI app and starts warm-up in the
+background on lifespan startup, so the server accepts connections at once
+while GET /api/ready answers 503 until warm-up has finished. Servers
+without a lifespan (the WSGI dev server, uvicorn --lifespan off) warm up on
+the first /api/ready call instead.
+
+The first four steps are synchronous and need no event loop, so the
+pre-fork server (src.config.prefork) runs them once in its master process
+with preload(); forked workers then find them done and only start their
+own diagnosis processes and upstream connections.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from django.urls import get_resolver
+
+from src.lib.ai.http_pool import close_http_pool, get_http_pool, open_http_pool
+from src.lib.ai.knowledge_base import get_knowledge_base
+from src.lib.ai.prompt_packer import get_prompt_packer
+from src.lib.ai.prompts import SYSTEM_PROMPT_VARIANTS
+from src.lib.expert_system.diagnosis_engine import get_engine_pool
+from src.lib.expert_system.process_pool import get_diagnosis_executor, shutdown_diagnosis_executor
+from .precomputed import prime_responses
+
+
+logger = logging.getLogger(__name__)
+
+PENDING, WARMING, READY, FAILED = "pending", "warming", "ready", "failed"
+
+
+class WarmupState:
+    """Progress of the worker's warm-up, reported by /api/ready."""
+
+    def __init__(self):
+        self.status = PENDING
+        self.steps: Dict[str, dict] = {}
+        self.error: Optional[str] = None
+        self.duration_ms: Optional[float] = None
+        # Set when the read-only state was built before this worker was forked
+        self.preloaded = False
+        self._lock = threading.Lock()
+
+    def begin(self) -> bool:
+        """Claim the warm-up; False when it already ran or is running."""
+        with self._lock:
+            if self.status != PENDING:
+                return False
+            self.status = WARMING
+            return True
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+
+    def to_dict(self) -> dict:
+        data = {"status": self.status, "steps": self.steps}
+        if self.preloaded:
+            data["preloaded"] = True
+        if self.duration_ms is not None:
+            data["duration_ms"] = self.duration_ms
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+state = WarmupState()
+
+
+def _load_knowledge_base() -> int:
+    return len(get_knowledge_base().chunks)
+
+
+def _prebuild_engines() -> int:
+    # Diagnoses run in the pool processes, which build their own engines
+    if get_diagnosis_executor() is not None:
+        return 0
+    return get_engine_pool().prebuild()
+
+
+def _build_prompts() -> int:
+    get_prompt_packer()
+    return len(SYSTEM_PROMPT_VARIANTS)
+
+
+def _prime_responses() -> int:
+    # Routers register their precomputed builders on import, which Django defers to the first request
+    get_resolver().url_patterns
+    return prime_responses()
+
+
+# Steps that build read-only, loop-independent state
+SYNC_STEPS = (
+    ("knowledge_base", _load_knowledge_base),
+    ("engine_pool", _prebuild_engines),
+    ("prompts", _build_prompts),
+    ("responses", _prime_responses),
+)
+
+
+def preload() -> Dict[str, float]:
+    """Run the synchronous steps in this process; returns their timings in ms."""
+    timings = {}
+    for name, run in SYNC_STEPS:
+        started = time.perf_counter()
+        run()
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    state.preloaded = True
+    return timings
+
+
+async def _start_diagnosis_pool() -> Optional[int]:
+    """Processes started, or None when diagnoses run in threads (DIAGNOSIS_PROCESSES=0)."""
+    executor = get_diagnosis_executor()
+    if executor is None:
+        return None
+    return await executor.start()
+
+
+async def _open_llm_connections() -> Optional[int]:
+    """Connections opened, or None when skipped (no pool on this loop, no API key)."""
+    if get_http_pool() is None or not os.getenv("GROQ_API_KEY"):
+        return None
+    from src.lib.ai.llm_client import LLMClient
+
+    count = int(os.getenv("LLM_WARM_CONNECTIONS", "2"))
+    return await LLMClient(use_cache=False).open_connections(count)
+
+
+async def _step(name: str, run, required: bool = True) -> None:
+    started = time.perf_counter()
+    try:
+        result = await run()
+    except Exception as exc:
+        state.steps[name] = {"ok": False, "ms": round((time.perf_counter() - started) * 1000, 1), "error": str(exc)}
+        if required:
+            raise
+        logger.warning("Warm-up step %s failed: %s", name, exc)
+        return
+    state.steps[name] = {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1), "result": result}
+
+
+async def warm_up() -> None:
+    """Run every warm-up step once; later calls return immediately."""
+    if not state.begin():
+        return
+    started = time.perf_counter()
+    try:
+        for name, run in SYNC_STEPS:
+            await _step(name, lambda run=run: asyncio.to_thread(run))
+        await _step("diagnosis_pool", _start_diagnosis_pool)
+        await _step("llm_connections", _open_llm_connections, required=False)
+    except Exception as exc:
+        state.error = str(exc)
+        state.status = FAILED
+        logger.exception("Warm-up failed")
+    else:
+        state.status = READY
+    state.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Warm-up %s in %.0f ms", state.status, state.duration_ms)
+
+
+class WarmupLifespan:
+    """
+    ASGI wrapper handling lifespan events for the Django app.
+
+    Startup opens the shared LLM connection pool on the server loop and
+    starts warm_up() in the background; shutdown closes the pool and stops
+    the diagnosis processes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._task: Optional[asyncio.Task] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "lifespan":
+            return await self.app(scope, receive, send)
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                open_http_pool()
+                self._task = asyncio.get_running_loop().create_task(warm_up())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._task is not None and not self._task.done():
+                    self._task.cancel()
+                await close_http_pool()
+                await asyncio.to_thread(shutdown_diagnosis_executor)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -13,7 +13,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up; handles lifespan startup (warm-up) and shutdown
+from src.api.warmup import WarmupLifespan  # noqa: E402
+
+application = WarmupLifespan(django_application)
 
 # Alias for uvicorn
 app = application
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+Pre-fork production server.
+
+`uvicorn --workers N` starts every worker with multiprocessing's spawn
+method, so each one imports Django, experta and the AI modules and builds
+the knowledge base, rule network and metadata responses on its own. This
+entry point does that work once, in a master process, and then forks the
+workers, which share those pages copy-on-write:
+
+    python -m src.config.prefork --host 0.0.0.0 --port 8000 --workers 4
+
+Sharing only survives if the workers do not write to the inherited pages.
+CPython writes to an object whenever its reference count changes, which
+cannot be avoided, and whenever the cyclic GC traverses it, which can. The
+master therefore disables the GC before importing anything (so freed
+objects leave no holes that later allocations fill in), calls gc.freeze()
+right before forking (moving every object into the permanent generation,
+which collections never traverse) and each worker re-enables the GC for
+its own objects. --no-gc-freeze turns this off, for comparison with
+benchmarks/bench_memory.py.
+
+The master binds the listening socket, forks the workers, restarts any
+that die and forwards SIGINT/SIGTERM to them on shutdown.
+"""
+
+import gc
+
+# Before Django and the app are imported, see above
+gc.disable()
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import signal  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from typing import Dict  # noqa: E402
+
+import uvicorn  # noqa: E402
+
+
+logger = logging.getLogger("uvicorn.error")
+
+# Workers that die sooner than this after starting are restarted after a pause
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+class PreforkServer:
+    """Preload the app in this process, then fork and supervise uvicorn workers."""
+
+    def __init__(self, config: uvicorn.Config, workers: int, gc_freeze: bool = True):
+        self.config = config
+        self.workers = workers
+        self.gc_freeze = gc_freeze
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.socket = None
+
+    def preload(self) -> None:
+        from src.api import warmup
+
+        started = time.perf_counter()
+        self.config.load()
+        timings = warmup.preload()
+        logger.info("Preloaded application in %.0f ms (%s)", (time.perf_counter() - started) * 1000,
+                    ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings.items()))
+
+    def run(self) -> None:
+        self.preload()
+        self.socket = self.config.bind_socket()
+        if self.gc_freeze:
+            gc.freeze()
+            logger.info("Froze %d objects before forking", gc.get_freeze_count())
+        else:
+            gc.enable()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self._spawn()
+        self._supervise()
+        logger.info("Stopping parent process [%d]", os.getpid())
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.children[pid] = time.monotonic()
+
+    def _run_worker(self) -> None:
+        """Child process: serve on the inherited socket until told to stop."""
+        status = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            gc.enable()
+            from src.lib.telemetry.metrics import get_registry
+
+            # Also starts this worker's metrics flusher
+            get_registry().reset_after_fork()
+            logger.info("Started worker process [%d]", os.getpid())
+            uvicorn.Server(self.config).run(sockets=[self.socket])
+        except BaseException:
+            logger.exception("Worker process [%d] failed", os.getpid())
+            status = 1
+        finally:
+            # Never return into the master's code (or run its atexit handlers),
+            # so write the final snapshot here
+            try:
+                get_registry().flush()
+            except BaseException:
+                pass
+            logging.shutdown()
+            os._exit(status)
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self) -> None:
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            logger.warning("Worker process [%d] exited with code %d; restarting",
+                           pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < RESTART_BACKOFF_SECONDS:
+                time.sleep(RESTART_BACKOFF_SECONDS)
+            if not self.stopping:
+                self._spawn()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork uvicorn server with a preloading master")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-gc-freeze", action="store_true",
+                        help="Keep the GC running in the master and skip gc.freeze()")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "src.config.settings_api")
+    # Workers share one metrics directory, named after the master (their parent)
+    os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"medical-expert-metrics-{os.getpid()}"))
+    config = uvicorn.Config("src.config.asgi:app", host=args.host, port=args.port, log_level=args.log_level,
+                            lifespan="on")
+    PreforkServer(config, args.workers, gc_freeze=not args.no_gc_freeze).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+API-only settings profile.
+
+The Ninja API is stateless: it uses no sessions, CSRF tokens, users,
+messages or templates from Django, and the admin site is not needed in
+production. This profile keeps everything from settings.py but drops those
+apps and their middleware from the request path, so each /api/ request
+only runs the telemetry, CORS, admission, compression, host validation and
+security-header (SecurityMiddleware, X-Frame-Options) middleware. The
+database is left unconfigured, so no connection is ever opened.
+
+Use it with DJANGO_SETTINGS_MODULE=src.config.settings_api (as `make prod`
+and the Dockerfile do); development keeps the full settings and the admin.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+
+INSTALLED_APPS = [
+    'corsheaders',
+]
+
+MIDDLEWARE = [
+    'src.api.middleware.MetricsMiddleware',
+    'src.api.middleware.TracingMiddleware',
+    # Ahead of admission control, so shed responses carry CORS headers too
+    # and preflights are answered without queueing
+    'corsheaders.middleware.CorsMiddleware',
+    'src.api.middleware.AdmissionMiddleware',
+    'src.api.middleware.ProfilingMiddleware',
+    'src.api.middleware.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    # Validates the Host header against ALLOWED_HOSTS
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'src.config.urls_api'
+
+# The Swagger page at /api/docs is rendered from a template string
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': False,
+        'OPTIONS': {},
+    },
+]
+
+DATABASES = {}
+
+AUTH_PASSWORD_VALIDATORS = []
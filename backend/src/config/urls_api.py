@@ -0,0 +1,9 @@
+"""
+URL configuration for the API-only settings profile (no admin site).
+"""
+from django.urls import path
+from src.api.api import api
+
+urlpatterns = [
+    path('api/', api.urls),
+]
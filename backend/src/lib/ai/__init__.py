@@ -2,16 +2,68 @@
 AI Service Layer for Medical Expert System.
 
 Provides LLM integration via Groq API for conversational diagnosis assistance.
+
+Exports are resolved lazily (PEP 562): importing one submodule, e.g.
+src.lib.ai.http_pool, no longer imports the LLM client, response cache,
+rate limiter and the rest along with the package.
 """
 
-from .llm_client import LLMClient, get_available_models
-from .knowledge_base import KnowledgeBase
-from .prompts import build_system_prompt, build_diagnosis_context
-
-__all__ = [
-    "LLMClient",
-    "get_available_models", 
-    "KnowledgeBase",
-    "build_system_prompt",
-    "build_diagnosis_context",
-]
+import importlib
+from typing import TYPE_CHECKING
+
+# Exported name -> submodule defining it
+_EXPORTS = {
+    "LLMClient": ".llm_client",
+    "get_available_models": ".llm_client",
+    "KnowledgeBase": ".knowledge_base",
+    "KeywordMatcher": ".keyword_matcher",
+    "KeywordMatch": ".keyword_matcher",
+    "build_system_prompt": ".prompts",
+    "build_diagnosis_context": ".prompts",
+    "PromptPacker": ".prompt_packer",
+    "get_prompt_packer": ".prompt_packer",
+    "ResponseCache": ".response_cache",
+    "get_response_cache": ".response_cache",
+    "LLMError": ".retry",
+    "LLMUnavailableError": ".retry",
+    "RetryPolicy": ".retry",
+    "ModelRouter": ".model_routing",
+    "get_model_router": ".model_routing",
+    "LLMBusyError": ".rate_limit",
+    "UpstreamLimiter": ".rate_limit",
+    "get_upstream_limiter": ".rate_limit",
+    "CircuitBreaker": ".circuit_breaker",
+    "CircuitOpenError": ".circuit_breaker",
+    "get_circuit_breaker": ".circuit_breaker",
+    "open_http_pool": ".http_pool",
+    "close_http_pool": ".http_pool",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .llm_client import LLMClient, get_available_models
+    from .knowledge_base import KnowledgeBase
+    from .keyword_matcher import KeywordMatcher, KeywordMatch
+    from .prompts import build_system_prompt, build_diagnosis_context
+    from .prompt_packer import PromptPacker, get_prompt_packer
+    from .response_cache import ResponseCache, get_response_cache
+    from .retry import LLMError, LLMUnavailableError, RetryPolicy
+    from .model_routing import ModelRouter, get_model_router
+    from .rate_limit import LLMBusyError, UpstreamLimiter, get_upstream_limiter
+    from .circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
+    from .http_pool import close_http_pool, open_http_pool
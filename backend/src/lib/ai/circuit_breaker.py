@@ -0,0 +1,153 @@
+"""
+Circuit Breaker for the Upstream LLM.
+
+Stops sending requests to an upstream that keeps failing or answering too
+slowly. After consecutive failures (or latency-SLO breaches) the circuit
+opens and calls fail immediately with CircuitOpenError; once the reset
+timeout passes, a single probe request is let through (half-open) and
+its outcome closes or re-opens the circuit.
+
+Configured from the environment:
+    LLM_BREAKER                 Enable the breaker (default 1, 0 disables)
+    LLM_BREAKER_FAILURES        Consecutive failures/slow calls that open it (default 5)
+    LLM_BREAKER_RESET_SECONDS   Time open before probing (default 30)
+    LLM_BREAKER_SLOW_CALL_MS    Calls slower than this count as failures (default 15000)
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from .retry import LLMError
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(LLMError):
+    """The upstream circuit is open; the call was not attempted."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream endpoint.
+
+    Usage:
+        breaker = get_circuit_breaker(base_url)
+        breaker.allow()              # raises CircuitOpenError while open
+        ...
+        breaker.record_success(latency)  # or breaker.record_failure()
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        slow_call_seconds: float = 15.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """Admit a call, or raise CircuitOpenError if the circuit is open."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probe_started_at = None
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back
+                # (e.g. rejected by the limiter) is replaced after reset_timeout
+                if self.probe_started_at is None or now - self.probe_started_at >= self.reset_timeout:
+                    self.probe_started_at = now
+                    return
+                retry_after = self.reset_timeout - (now - self.probe_started_at)
+            else:
+                retry_after = self.reset_timeout - (now - self.opened_at)
+            self.rejected += 1
+        raise CircuitOpenError("LLM upstream circuit is open", retry_after=max(0.0, retry_after))
+
+    def is_open(self) -> bool:
+        """Whether calls are currently being short-circuited (no probe due yet)."""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self, latency: float) -> None:
+        """Record a completed call; slow calls count as failures."""
+        if latency > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.probe_started_at = None
+
+    def record_failure(self) -> None:
+        """Record a failed (or too slow) call."""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probe_started_at = None
+                self.times_opened += 1
+
+    def stats(self) -> Dict:
+        """Breaker state and counters for this process."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+# One breaker per upstream base URL, shared by the process
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(base_url: str) -> Optional[CircuitBreaker]:
+    """Get or create the breaker for an upstream, or None if LLM_BREAKER=0."""
+    if os.getenv("LLM_BREAKER", "1") == "0":
+        return None
+    breaker = _circuit_breakers.get(base_url)
+    if breaker is None:
+        with _circuit_breakers_lock:
+            breaker = _circuit_breakers.get(base_url)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                    reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+                    slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_CALL_MS", "15000")) / 1000,
+                )
+                _circuit_breakers[base_url] = breaker
+    return breaker
+
+
+def all_circuit_breakers() -> Dict[str, CircuitBreaker]:
+    """Breakers created so far in this process, by upstream base URL."""
+    with _circuit_breakers_lock:
+        return dict(_circuit_breakers)
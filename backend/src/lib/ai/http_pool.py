@@ -0,0 +1,93 @@
+"""
+Shared HTTP Connection Pool for Upstream LLM Calls.
+
+An httpx.AsyncClient is bound to the event loop it was first used on, so
+the pool belongs to one long-lived loop: the ASGI server's, opened by the
+lifespan startup hook (open_http_pool) and closed on shutdown. Calls made
+on that loop reuse its keep-alive connections, skipping the TCP and TLS
+handshakes on every request; calls on any other loop (management
+commands, the WSGI dev server) get a short-lived client of their own, as
+before.
+
+Limits come from LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_MAX_KEEPALIVE and
+LLM_HTTP_KEEPALIVE_EXPIRY.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+
+import httpx
+
+
+_pool: Optional[Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = None
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60")),
+    )
+
+
+def open_http_pool() -> httpx.AsyncClient:
+    """Create the shared client for the running loop (idempotent)."""
+    global _pool
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool[0] is not loop:
+        _pool = (loop, httpx.AsyncClient(limits=pool_limits()))
+    return _pool[1]
+
+
+async def close_http_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _, client = _pool
+        _pool = None
+        await client.aclose()
+
+
+def get_http_pool() -> Optional[httpx.AsyncClient]:
+    """The shared client when called on its loop, else None."""
+    pool = _pool
+    if pool is None:
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    return pool[1] if pool[0] is loop else None
+
+
+@asynccontextmanager
+async def http_client() -> AsyncIterator[httpx.AsyncClient]:
+    """The shared client if available on this loop, else a client closed on exit."""
+    client = get_http_pool()
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient() as client:
+        yield client
+
+
+async def warm_connections(url: str, headers: dict, count: int = 2, timeout: float = 5.0) -> int:
+    """
+    Open up to count keep-alive connections to the upstream with GET requests.
+
+    Any HTTP response counts (the connection is what matters); returns the
+    number of requests that got one.
+    """
+    client = get_http_pool() or open_http_pool()
+
+    async def probe() -> bool:
+        try:
+            response = await client.get(url, headers=headers, timeout=timeout)
+        except httpx.HTTPError:
+            return False
+        await response.aclose()
+        return True
+
+    results = await asyncio.gather(*(probe() for _ in range(count)))
+    return sum(results)
@@ -0,0 +1,201 @@
+"""
+Multi-pattern Keyword Matcher.
+
+Aho-Corasick automaton over word tokens, used to find symptom and disease
+mentions in free text in a single pass regardless of vocabulary size.
+
+A keyword must start on a word boundary, but each of its words also matches
+its regular inflections: "headache" finds "headaches", "vomit" finds
+"vomited" and "vomiting", and "chills" finds "chill". The inflections are
+generated from the vocabulary when the matcher is built, so "hot" still
+never matches "shot" and "weak" never matches "tweak".
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+# Tokens are runs of word characters, so "rice-water" and "rice water" both
+# tokenize to ("rice", "water") and "hot" can never match inside "shot".
+_TOKEN_RE = re.compile(r"\w+")
+
+# Plural endings that are part of the word itself ("weakness", "diaphoresis")
+_NOT_PLURAL = ("ss", "us", "is")
+
+
+def _bases(token: str) -> List[str]:
+    """token and, for a plural, its singular candidates ("aches" -> "ache", "ach")."""
+    bases = [token]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(_NOT_PLURAL):
+        bases.append(token[:-1])
+        if token.endswith("es") and len(token) > 4:
+            bases.append(token[:-2])
+    return bases
+
+
+def _inflections(base: str) -> List[str]:
+    """base, its regular -s/-es/-ed/-ing forms and its -ish/-ness derivatives ("feverish")."""
+    forms = [base, base + "s", base + "es", base + "ed", base + "ing", base + "ish", base + "ness"]
+    if base.endswith("e"):
+        forms += [base + "d", base[:-1] + "ing"]
+    elif len(base) > 2 and base.endswith("y") and base[-2] not in "aeiou":
+        forms += [base[:-1] + "ies", base[:-1] + "ied"]
+    return forms
+
+
+@dataclass(frozen=True)
+class KeywordMatch:
+    """A single keyword occurrence in scanned text."""
+    label: str
+    keyword: str
+    start: int
+    end: int
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "keyword": self.keyword,
+            "start": self.start,
+            "end": self.end,
+        }
+
+
+class KeywordMatcher:
+    """
+    Precompiled Aho-Corasick automaton mapping keywords to labels.
+
+    The automaton's alphabet is word tokens rather than characters, which
+    gives word-boundary matching for free and keeps the scan loop short.
+
+    Usage:
+        matcher = KeywordMatcher({"fever": ["fever", "high temperature"]})
+        matcher.labels("I have a high temperature")   # {"fever"}
+        matcher.find_all("Fever since Monday")        # [KeywordMatch(...)]
+    """
+
+    def __init__(self, vocabulary: Dict[str, Iterable[str]]):
+        # State 0 is the root. _out holds (label, keyword, token_count) for
+        # every keyword ending at a state, including those reached via
+        # failure links.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[str, str, int], ...]] = [()]
+        # Every inflected form of a vocabulary word -> the word the automaton uses
+        self._forms: Dict[str, str] = {}
+
+        pending_out: List[List[Tuple[str, str, int]]] = [[]]
+        for label, keywords in vocabulary.items():
+            for keyword in keywords:
+                tokens = [self._add_word(token) for token in _TOKEN_RE.findall(keyword.lower())]
+                if not tokens:
+                    continue
+                state = 0
+                for token in tokens:
+                    next_state = self._goto[state].get(token)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][token] = next_state
+                        self._goto.append({})
+                        self._fail.append(0)
+                        pending_out.append([])
+                    state = next_state
+                pending_out[state].append((label, keyword, len(tokens)))
+
+        self._build_failure_links(pending_out)
+        self.pattern_count = sum(len(out) for out in pending_out)
+
+    def _add_word(self, token: str) -> str:
+        """Register token's inflections and return the word that stands for all of them."""
+        bases = _bases(token)
+        # Words that share a form ("ache", "aches") share one automaton token
+        word = next((self._forms[base] for base in bases if base in self._forms), token)
+        for base in bases:
+            for form in _inflections(base):
+                self._forms.setdefault(form, word)
+        return word
+
+    def _build_failure_links(self, pending_out: List[List[Tuple[str, str, int]]]) -> None:
+        """Compute failure links breadth-first and merge inherited outputs."""
+        queue = deque(self._goto[0].values())
+        order = []
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for token, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                queue.append(child)
+
+        # BFS order guarantees a state's failure target is finalized first
+        self._out = [()] * len(self._goto)
+        for state in order:
+            inherited = self._out[self._fail[state]]
+            self._out[state] = tuple(pending_out[state]) + inherited
+
+    @property
+    def state_count(self) -> int:
+        """Number of automaton states (useful for sizing benchmarks)."""
+        return len(self._goto)
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """
+        Return every keyword occurrence in text, ordered by end offset.
+
+        Offsets index into the original text; overlapping keywords
+        (e.g. "typhoid" inside "typhoid fever") are all reported.
+        """
+        goto, fail, out, forms = self._goto, self._fail, self._out, self._forms
+        lowered = _lower_preserving_offsets(text)
+
+        matches = []
+        starts = []
+        state = 0
+        for index, token_match in enumerate(_TOKEN_RE.finditer(lowered)):
+            token = token_match.group()
+            token = forms.get(token, token)
+            starts.append(token_match.start())
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                end = token_match.end()
+                for label, keyword, token_count in out[state]:
+                    matches.append(KeywordMatch(
+                        label=label,
+                        keyword=keyword,
+                        start=starts[index - token_count + 1],
+                        end=end,
+                    ))
+        return matches
+
+    def labels(self, text: str) -> Set[str]:
+        """Return the set of labels mentioned in text (no offsets)."""
+        return set(self.ordered_labels(text))
+
+    def ordered_labels(self, text: str) -> List[str]:
+        """Return labels mentioned in text, in order of first appearance."""
+        goto, fail, out, forms = self._goto, self._fail, self._out, self._forms
+
+        found: Dict[str, None] = {}
+        state = 0
+        for token in _TOKEN_RE.findall(text.lower()):
+            token = forms.get(token, token)
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for label, _, _ in out[state]:
+                found[label] = None
+        return list(found)
+
+
+def _lower_preserving_offsets(text: str) -> str:
+    """Lowercase text without changing its length (some code points expand)."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch.lower()[0] for ch in text)
@@ -7,10 +7,14 @@ Provides simple keyword-based retrieval (can be upgraded to embeddings later).
 
 import os
 import re
+import threading
+import time
 from pathlib import Path
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Set
 
+from ..telemetry.metrics import FAST_BUCKETS, histogram
+
 
 @dataclass
 class KnowledgeChunk:
@@ -58,6 +62,10 @@ DIAGNOSTIC_KEYWORDS = {
     "sensitivity", "specificity", "positive", "negative",
 }
 
+RETRIEVAL_LATENCY = histogram(
+    "knowledge_retrieval_duration_seconds", "Time to score and rank knowledge chunks", buckets=FAST_BUCKETS,
+)
+
 
 class KnowledgeBase:
     """
@@ -162,6 +170,7 @@ class KnowledgeBase:
         """
         if not self._loaded:
             self.load()
+        started = time.perf_counter()
         
         # Build search keywords
         search_keywords = set()
@@ -203,7 +212,9 @@ class KnowledgeBase:
         scored_chunks.sort(key=lambda x: x[0], reverse=True)
         
         # Return top chunks
-        return [chunk.to_dict() for _, chunk in scored_chunks[:max_chunks]]
+        results = [chunk.to_dict() for _, chunk in scored_chunks[:max_chunks]]
+        RETRIEVAL_LATENCY.observe(time.perf_counter() - started)
+        return results
     
     def get_disease_summary(self, disease: str) -> str:
         """Get a summary of knowledge for a specific disease."""
@@ -236,12 +247,16 @@ class KnowledgeBase:
 
 # Global instance for reuse
 _knowledge_base: Optional[KnowledgeBase] = None
+_knowledge_base_lock = threading.Lock()
 
 
 def get_knowledge_base() -> KnowledgeBase:
-    """Get or create the global knowledge base instance."""
+    """Get or create the global knowledge base instance (loaded once, even under concurrent first use)."""
     global _knowledge_base
     if _knowledge_base is None:
-        _knowledge_base = KnowledgeBase()
-        _knowledge_base.load()
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                knowledge_base = KnowledgeBase()
+                knowledge_base.load()
+                _knowledge_base = knowledge_base
     return _knowledge_base
@@ -4,11 +4,33 @@ LLM Client for Groq API.
 Provides async interface to Groq's OpenAI-compatible API with model switching support.
 """
 
+import asyncio
+import hashlib
+import json
 import os
+import time
 import httpx
 from typing import AsyncGenerator, Optional, List, Dict, Union
 from dataclasses import dataclass
 
+from .response_cache import get_response_cache, replay_stream
+from .single_flight import get_single_flight
+from .rate_limit import get_upstream_limiter
+from .circuit_breaker import CircuitOpenError, get_circuit_breaker
+from .http_pool import http_client, warm_connections
+from .retry import (
+    FALLBACK_MODELS,
+    LLMUnavailableError,
+    RetryPolicy,
+    is_retryable,
+    is_saturated,
+    parse_retry_after,
+)
+from .tokenizer import count_message_tokens
+from ..deadline import clamp as clamp_deadline
+from ..telemetry.metrics import LLM_BUCKETS, counter, histogram
+from ..telemetry.tracing import span
+
 
 @dataclass
 class ModelInfo:
@@ -57,16 +79,72 @@ AVAILABLE_MODELS = {
 
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
 
+LLM_ATTEMPTS = counter(
+    "llm_requests_total", "Upstream LLM attempts by model and outcome (ok, HTTP status, timeout, error)",
+    ["model", "outcome"],
+)
+LLM_LATENCY = histogram(
+    "llm_request_duration_seconds", "Upstream LLM latency until the completion finished",
+    ["model", "stream"], LLM_BUCKETS,
+)
+LLM_TTFT = histogram(
+    "llm_time_to_first_token_seconds", "Time from the upstream request to the first streamed token",
+    ["model"], LLM_BUCKETS,
+)
+LLM_TOKENS = counter("llm_tokens_total", "Tokens reported by the upstream", ["model", "kind"])
+
 
 def get_available_models() -> List[Dict]:
     """Return list of available models with their info."""
     return [model.to_dict() for model in AVAILABLE_MODELS.values()]
 
 
+def _attempt_outcome(exc: BaseException) -> str:
+    """Low-cardinality outcome label for a failed upstream attempt."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return str(exc.response.status_code)
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    return "error"
+
+
+async def _within(awaitable, timeout: float):
+    """
+    Await with a total time limit.
+
+    httpx applies its timeout to each connect, write and read separately,
+    so an upstream trickling bytes could outlive the deadline; running out
+    of time here raises an httpx timeout, which is retried like any other.
+    """
+    try:
+        return await asyncio.wait_for(awaitable, max(0.0, timeout))
+    except asyncio.TimeoutError:
+        raise httpx.TimeoutException("LLM request deadline exceeded") from None
+
+
+def _record_usage(model_id: str, usage: Optional[Dict]) -> None:
+    if usage:
+        LLM_TOKENS.inc(model_id, "prompt", amount=usage.get("prompt_tokens") or 0)
+        LLM_TOKENS.inc(model_id, "completion", amount=usage.get("completion_tokens") or 0)
+
+
 class LLMClient:
     """
     Async client for Groq's OpenAI-compatible API.
     
+    Transient upstream failures (429, 5xx, timeouts) are retried with
+    jittered exponential backoff, and a saturated model falls back along
+    FALLBACK_MODELS. The model that actually answered is recorded in
+    last_model_used. Latency and outcome of every upstream attempt feed
+    the model router's rolling per-model statistics.
+    
+    Upstream calls pass through the shared UpstreamLimiter (concurrency cap
+    and requests/tokens per minute); when no capacity frees up within the
+    queue wait, chat raises LLMBusyError instead of waiting on the provider.
+    A per-upstream circuit breaker fails calls fast with CircuitOpenError
+    while the provider is down or persistently slow. On the ASGI server's
+    loop, requests reuse the shared keep-alive connection pool (http_pool).
+    
     Usage:
         client = LLMClient()
         response = await client.chat([
@@ -80,10 +158,35 @@ class LLMClient:
         api_key: Optional[str] = None,
         base_url: Optional[str] = None,
         model: str = DEFAULT_MODEL,
+        use_cache: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        fallback_models: Optional[List[str]] = None,
+        request_timeout: Optional[float] = None,
     ):
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
         self.base_url = (base_url or os.getenv("OPEN_API_BASE_URL", "https://api.groq.com/openai/v1")).rstrip("/")
         self.model = model
+        # Token usage reported by the upstream for the most recent call
+        self.last_usage: Optional[Dict] = None
+        # Opt-in response cache (None unless LLM_CACHE_BACKEND is set)
+        self.cache = get_response_cache() if use_cache else None
+        self.last_cache_hit = False
+        # Identical in-flight requests share one upstream call
+        self.single_flight = (
+            get_single_flight() if os.getenv("LLM_SINGLE_FLIGHT", "1") != "0" else None
+        )
+        self.last_coalesced = False
+        # Retries and fallback
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        self.fallback_models = fallback_models
+        self.request_timeout = request_timeout or float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+        self.last_model_used: Optional[str] = None
+        # Client-side concurrency and rate limits, shared by the process (or host)
+        self.limiter = get_upstream_limiter()
+        self.breaker = get_circuit_breaker(self.base_url)
+        # Per-model latency/error statistics (imported here: model_routing imports this module)
+        from .model_routing import get_model_router
+        self.router = get_model_router()
         
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not set. Please set it in environment or .env file.")
@@ -98,12 +201,20 @@ class LLMClient:
         """Get info about the currently selected model."""
         return AVAILABLE_MODELS[self.model].to_dict()
     
+    async def open_connections(self, count: int = 2, timeout: float = 5.0) -> int:
+        """Pre-open keep-alive connections to the upstream (GET /models); returns how many answered."""
+        return await warm_connections(
+            f"{self.base_url}/models", {"Authorization": f"Bearer {self.api_key}"}, count, timeout,
+        )
+    
     async def chat(
         self,
         messages: List[Dict],
         temperature: float = 0.7,
         max_tokens: int = 2048,
         stream: bool = False,
+        cacheable: Optional[bool] = None,
+        timeout: Optional[float] = None,
     ) -> Union[str, AsyncGenerator[str, None]]:
         """
         Send a chat completion request.
@@ -113,9 +224,18 @@ class LLMClient:
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens in response
             stream: If True, returns an async generator for streaming
+            cacheable: Force (True) or forbid (False) response caching; by
+                default only low-temperature requests are cached
+            timeout: Deadline in seconds for the whole call, including
+                retries and fallbacks (defaults to request_timeout)
             
         Returns:
             Response text or async generator if streaming
+            
+        Raises:
+            LLMUnavailableError: Every attempt failed or the deadline passed
+            LLMBusyError: No upstream capacity freed up within the queue wait
+            CircuitOpenError: The upstream is failing and calls are short-circuited
         """
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -129,44 +249,239 @@ class LLMClient:
             "max_tokens": max_tokens,
             "stream": stream,
         }
+        # The request's own deadline (X-Request-Timeout-Ms), if it comes first
+        deadline = clamp_deadline(time.monotonic() + (timeout or self.request_timeout))
+        
+        self.last_cache_hit = False
+        self.last_coalesced = False
+        self.last_model_used = None
+        cache_key = None
+        if self.cache is not None:
+            if self.cache.is_cacheable(temperature, cacheable):
+                cache_key = self.cache.make_key(self.model, messages, temperature, max_tokens)
+                cached = await self.cache.aget(cache_key)
+                if cached is not None:
+                    self.last_cache_hit = True
+                    self.last_usage = None
+                    self.last_model_used = self.model
+                    return replay_stream(cached) if stream else cached
+            else:
+                self.cache.record_bypass()
+        
+        # Cache hits are still served while the upstream circuit is open
+        if self.breaker is not None:
+            self.breaker.allow()
+        
+        if self.single_flight is not None:
+            flight_key = self._flight_key(payload)
+            if stream:
+                return self.single_flight.stream(
+                    flight_key, lambda: self._stream_response(headers, payload, cache_key, deadline)
+                )
+            (text, usage, model_used), self.last_coalesced = await self.single_flight.do(
+                flight_key, lambda: self._fetch(headers, payload, cache_key, deadline)
+            )
+            self.last_usage = usage
+            self.last_model_used = model_used
+            return text
         
         if stream:
-            return self._stream_response(headers, payload)
-        else:
-            return await self._get_response(headers, payload)
+            return self._stream_response(headers, payload, cache_key, deadline)
+        text, _, _ = await self._fetch(headers, payload, cache_key, deadline)
+        return text
+    
+    def _flight_key(self, payload: dict) -> str:
+        """Hash identifying an upstream request for coalescing."""
+        body = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(f"{self.base_url}\n{body}".encode("utf-8")).hexdigest()
     
-    async def _get_response(self, headers: dict, payload: dict) -> str:
+    def _model_chain(self, payload: dict, needed: int) -> List[str]:
+        """Requested model followed by fallbacks whose context window fits the request."""
+        fallbacks = self.fallback_models
+        if fallbacks is None:
+            fallbacks = FALLBACK_MODELS.get(self.model, [])
+        chain = [self.model]
+        for model_id in fallbacks:
+            info = AVAILABLE_MODELS.get(model_id)
+            if model_id not in chain and info and info.context_window >= needed:
+                chain.append(model_id)
+        return chain
+    
+    async def _call_with_retries(self, payload: dict, deadline: float, call, record_success: bool = True):
+        """
+        Run call(payload_for_model, timeout) across retries and the fallback chain.
+        
+        Each attempt is charged against the limiter's per-minute budgets
+        (prompt tokens plus max_tokens, refunded down to actual usage).
+        Every retryable failure is recorded with the model router and the
+        circuit breaker; successes are recorded with the breaker here and
+        with the router unless record_success is False (streams record once
+        the last token has arrived). If the breaker opens mid-call the
+        remaining attempts are abandoned.
+        
+        Returns:
+            (result, model_id, started) from the first successful attempt,
+            where started is the attempt's monotonic start time
+        """
+        policy = self.retry_policy
+        last_error: Optional[BaseException] = None
+        reserved_tokens = count_message_tokens(payload["messages"]) + payload["max_tokens"]
+        
+        for model_id in self._model_chain(payload, reserved_tokens):
+            attempt_payload = {**payload, "model": model_id}
+            for attempt in range(policy.max_attempts):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMUnavailableError("LLM request deadline exceeded", last_error)
+                if self.breaker is not None and self.breaker.is_open():
+                    raise CircuitOpenError("LLM upstream circuit opened during retries",
+                                           retry_after=self.breaker.reset_timeout)
+                with span("llm.admit", tokens=reserved_tokens):
+                    await self.limiter.admit(reserved_tokens, deadline)
+                started = time.monotonic()
+                try:
+                    with span("llm.attempt", model=model_id, attempt=attempt + 1):
+                        result = await call(attempt_payload, remaining)
+                except Exception as exc:
+                    LLM_ATTEMPTS.inc(model_id, _attempt_outcome(exc))
+                    if not is_retryable(exc):
+                        raise
+                    last_error = exc
+                    self.router.record(model_id, time.monotonic() - started, ok=False)
+                    if self.breaker is not None:
+                        self.breaker.record_failure()
+                else:
+                    if self.breaker is not None:
+                        self.breaker.record_success(time.monotonic() - started)
+                    if record_success:
+                        usage = self.last_usage or {}
+                        LLM_ATTEMPTS.inc(model_id, "ok")
+                        LLM_LATENCY.observe(time.monotonic() - started, model_id, "false")
+                        _record_usage(model_id, usage)
+                        self.router.record(
+                            model_id, time.monotonic() - started, ok=True,
+                            completion_tokens=usage.get("completion_tokens"),
+                        )
+                        if usage.get("total_tokens"):
+                            await self.limiter.refund_tokens(reserved_tokens - usage["total_tokens"])
+                    return result, model_id, started
+                
+                retry_after = parse_retry_after(last_error)
+                if retry_after is not None and retry_after > policy.max_retry_after and is_saturated(last_error):
+                    # Saturated for longer than we are willing to wait
+                    break
+                if attempt + 1 < policy.max_attempts:
+                    delay = retry_after if retry_after is not None else policy.backoff(attempt)
+                    if time.monotonic() + delay >= deadline:
+                        break
+                    await asyncio.sleep(delay)
+        
+        raise LLMUnavailableError(
+            f"LLM request failed after retries and fallbacks: {last_error}", last_error
+        )
+    
+    async def _fetch(self, headers: dict, payload: dict, cache_key: Optional[str], deadline: float):
+        """Fetch a completion with retries; cache it and return (text, usage, model_used)."""
+        async with self.limiter.slot(deadline):
+            text, model_used, _ = await self._call_with_retries(
+                payload, deadline, lambda p, timeout: self._get_response(headers, p, timeout)
+            )
+        self.last_model_used = model_used
+        # Fallback answers are not cached under the requested model's key
+        if cache_key is not None and model_used == self.model:
+            await self.cache.aset(cache_key, text)
+        return text, self.last_usage, model_used
+    
+    async def _get_response(self, headers: dict, payload: dict, timeout: float = 60.0) -> str:
         """Get non-streaming response."""
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
+        async with http_client() as client:
+            response = await _within(client.post(
                 f"{self.base_url}/chat/completions",
                 headers=headers,
                 json=payload,
-            )
+                timeout=timeout,
+            ), timeout)
             response.raise_for_status()
             data = response.json()
+            self.last_usage = data.get("usage")
             return data["choices"][0]["message"]["content"]
     
-    async def _stream_response(self, headers: dict, payload: dict) -> AsyncGenerator[str, None]:
-        """Stream response chunks."""
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            async with client.stream(
-                "POST",
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-            ) as response:
-                response.raise_for_status()
-                async for line in response.aiter_lines():
+    async def _open_stream(self, client: httpx.AsyncClient, headers: dict, payload: dict,
+                           timeout: float) -> httpx.Response:
+        """Send a streaming request and return the response once headers arrive."""
+        request = client.build_request(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            headers=headers,
+            json=payload,
+            timeout=timeout,
+        )
+        response = await _within(client.send(request, stream=True), timeout)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError:
+            await response.aread()
+            await response.aclose()
+            raise
+        return response
+    
+    async def _stream_response(
+        self, headers: dict, payload: dict, cache_key: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream response chunks, caching the full completion if it finishes.
+        
+        Retries and fallbacks apply until the stream opens; once tokens have
+        been yielded a failure propagates to the caller.
+        """
+        if deadline is None:
+            deadline = clamp_deadline(time.monotonic() + self.request_timeout)
+        chunks = []
+        async with self.limiter.slot(deadline), http_client() as client:
+            response, model_used, started = await self._call_with_retries(
+                payload, deadline, lambda p, timeout: self._open_stream(client, headers, p, timeout),
+                record_success=False,
+            )
+            self.last_model_used = model_used
+            lines = response.aiter_lines()
+            try:
+                while True:
+                    # The body is read within the same deadline as the request
+                    try:
+                        line = await _within(lines.__anext__(), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        break
                     if line.startswith("data: "):
                         data = line[6:]
                         if data == "[DONE]":
                             break
                         try:
-                            import json
                             chunk = json.loads(data)
+                            # Groq reports usage on the final chunk
+                            usage = chunk.get("usage") or chunk.get("x_groq", {}).get("usage")
+                            if usage:
+                                self.last_usage = usage
                             delta = chunk["choices"][0].get("delta", {})
                             if "content" in delta:
+                                if not chunks:
+                                    LLM_TTFT.observe(time.monotonic() - started, model_used)
+                                chunks.append(delta["content"])
                                 yield delta["content"]
-                        except (json.JSONDecodeError, KeyError):
+                        except (json.JSONDecodeError, KeyError, IndexError):
                             continue
+            finally:
+                await response.aclose()
+        
+        usage = self.last_usage or {}
+        completion_tokens = usage.get("completion_tokens") or len(chunks)
+        LLM_ATTEMPTS.inc(model_used, "ok")
+        LLM_LATENCY.observe(time.monotonic() - started, model_used, "true")
+        _record_usage(model_used, usage)
+        self.router.record(model_used, time.monotonic() - started, ok=True, completion_tokens=completion_tokens)
+        if usage.get("total_tokens"):
+            reserved_tokens = count_message_tokens(payload["messages"]) + payload["max_tokens"]
+            await self.limiter.refund_tokens(reserved_tokens - usage["total_tokens"])
+        
+        if cache_key is not None and model_used == self.model:
+            await self.cache.aset(cache_key, "".join(chunks))
@@ -0,0 +1,236 @@
+"""
+Adaptive Latency-Aware Model Routing.
+
+Tracks rolling per-model latency, error rate and throughput from real
+traffic and, when routing is enabled, picks a model per request: short or
+simple conversations go to the fastest healthy model, long or complex ones
+to the large model as long as it stays within the latency SLO.
+
+"Fastest" is the highest measured tokens/sec (then the lowest median
+latency). A model cannot be measured without traffic, so while a healthy
+candidate has fewer than min_samples recent calls, simple requests explore
+it first; samples age out of the window, so every model is re-measured
+from time to time.
+
+Configured from the environment:
+    LLM_ROUTING_MODE              "static" (default) or "adaptive"
+    LLM_ROUTING_LATENCY_SLO_MS    p95 latency a model must meet (default 8000)
+    LLM_ROUTING_COMPLEX_TOKENS    Conversation tokens that mark a request complex (default 1200)
+    LLM_ROUTING_COMPLEX_TURNS     Prior turns that mark a request complex (default 6)
+"""
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from statistics import median
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .llm_client import AVAILABLE_MODELS, DEFAULT_MODEL
+
+
+# Model id clients send to ask for adaptive routing explicitly
+AUTO_MODEL = "auto"
+
+# The model reserved for long/complex conversations
+COMPLEX_MODEL = "llama-3.3-70b-versatile"
+
+# Relative speed before we have traffic to measure (lower is faster)
+SPEED_PRIORS = {
+    "llama-3.1-8b-instant": 1,
+    "gemma2-9b-it": 2,
+    "mixtral-8x7b-32768": 3,
+    "llama-3.3-70b-versatile": 4,
+}
+
+
+@dataclass
+class Observation:
+    """One upstream call."""
+    at: float
+    latency: float
+    ok: bool
+    tokens_per_second: Optional[float]
+
+
+class ModelStats:
+    """Rolling window of observations for one model."""
+
+    def __init__(self, window: int = 200, max_age: float = 300.0):
+        self.max_age = max_age
+        self._observations: Deque[Observation] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool, completion_tokens: Optional[int] = None) -> None:
+        tokens_per_second = None
+        if ok and completion_tokens and latency > 0:
+            tokens_per_second = completion_tokens / latency
+        with self._lock:
+            self._observations.append(Observation(time.monotonic(), latency, ok, tokens_per_second))
+
+    def _recent(self) -> List[Observation]:
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            return [obs for obs in self._observations if obs.at >= cutoff]
+
+    def snapshot(self) -> Dict:
+        """Summary statistics over the recent window."""
+        recent = self._recent()
+        latencies = sorted(obs.latency for obs in recent if obs.ok)
+        throughput = [obs.tokens_per_second for obs in recent if obs.tokens_per_second]
+        errors = sum(1 for obs in recent if not obs.ok)
+        return {
+            "requests": len(recent),
+            "error_rate": round(errors / len(recent), 4) if recent else 0.0,
+            "p50_latency_ms": round(_percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+            "p95_latency_ms": round(_percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            "tokens_per_second": round(median(throughput), 1) if throughput else None,
+        }
+
+
+class ModelRouter:
+    """
+    Chooses a model per request from rolling per-model statistics.
+
+    Usage:
+        router = get_model_router()
+        model, reason = router.choose(conversation_tokens=350, turns=2)
+        router.record(model, latency=1.2, ok=True, completion_tokens=240)
+    """
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        latency_slo_ms: Optional[float] = None,
+        complex_tokens: Optional[int] = None,
+        complex_turns: Optional[int] = None,
+        max_error_rate: float = 0.25,
+        min_samples: int = 5,
+    ):
+        self.mode = (mode or os.getenv("LLM_ROUTING_MODE", "static")).lower()
+        self.latency_slo_ms = latency_slo_ms or float(os.getenv("LLM_ROUTING_LATENCY_SLO_MS", "8000"))
+        self.complex_tokens = complex_tokens or int(os.getenv("LLM_ROUTING_COMPLEX_TOKENS", "1200"))
+        self.complex_turns = complex_turns or int(os.getenv("LLM_ROUTING_COMPLEX_TURNS", "6"))
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+
+        self._stats: Dict[str, ModelStats] = {model_id: ModelStats() for model_id in AVAILABLE_MODELS}
+        self._decisions: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def adaptive(self) -> bool:
+        return self.mode == "adaptive"
+
+    def record(self, model_id: str, latency: float, ok: bool, completion_tokens: Optional[int] = None) -> None:
+        """Record the outcome of one upstream call."""
+        stats = self._stats.get(model_id)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(model_id, ModelStats())
+        stats.record(latency, ok, completion_tokens)
+
+    def is_healthy(self, model_id: str, snapshot: Optional[Dict] = None) -> bool:
+        """Healthy = low error rate and p95 within the SLO (or too few samples to judge)."""
+        snapshot = snapshot or self._stats[model_id].snapshot()
+        if snapshot["requests"] < self.min_samples:
+            return True
+        if snapshot["error_rate"] > self.max_error_rate:
+            return False
+        p95 = snapshot["p95_latency_ms"]
+        return p95 is None or p95 <= self.latency_slo_ms
+
+    def choose(self, conversation_tokens: int, turns: int, required_context: int = 0) -> Tuple[str, str]:
+        """
+        Pick a model for a request.
+
+        Args:
+            conversation_tokens: Estimated tokens of history plus the new message
+            turns: Number of prior messages in the conversation
+            required_context: Smallest context window the request can use
+
+        Returns:
+            (model_id, reason)
+        """
+        snapshots = {model_id: stats.snapshot() for model_id, stats in self._stats.items()}
+        candidates = [
+            model_id for model_id, info in AVAILABLE_MODELS.items()
+            if info.context_window >= required_context
+        ] or [DEFAULT_MODEL]
+        healthy = [m for m in candidates if self.is_healthy(m, snapshots[m])]
+
+        is_complex = conversation_tokens >= self.complex_tokens or turns >= self.complex_turns
+        if is_complex and COMPLEX_MODEL in healthy:
+            model_id, reason = COMPLEX_MODEL, "complex"
+        elif healthy:
+            unmeasured = [m for m in healthy if snapshots[m]["requests"] < self.min_samples]
+            if unmeasured and not is_complex:
+                # Least-sampled first, fastest prior breaking ties
+                model_id = min(unmeasured, key=lambda m: (snapshots[m]["requests"], _prior(m)))
+                reason = "explore"
+            else:
+                model_id = min(healthy, key=lambda m: self._speed_key(m, snapshots[m]))
+                reason = "complex_fallback" if is_complex else "fastest"
+        else:
+            # Nothing meets the SLO: least-bad error rate, then speed
+            model_id = min(
+                candidates,
+                key=lambda m: (snapshots[m]["error_rate"], self._speed_key(m, snapshots[m])),
+            )
+            reason = "degraded"
+
+        with self._lock:
+            self._decisions[f"{model_id}:{reason}"] += 1
+        return model_id, reason
+
+    def _speed_key(self, model_id: str, snapshot: Dict) -> Tuple[int, float, float, int]:
+        """
+        Sort key, fastest first: measured models by tokens/sec, then median
+        latency; unmeasured ones after them, by prior.
+        """
+        prior = _prior(model_id)
+        if snapshot["requests"] < self.min_samples or snapshot["p50_latency_ms"] is None:
+            return 1, 0.0, 0.0, prior
+        return 0, -(snapshot["tokens_per_second"] or 0.0), snapshot["p50_latency_ms"], prior
+
+    def stats(self) -> Dict:
+        """Routing configuration, decision counts and per-model statistics."""
+        models = []
+        for model_id, stats in self._stats.items():
+            snapshot = stats.snapshot()
+            snapshot["model"] = model_id
+            snapshot["healthy"] = self.is_healthy(model_id, snapshot)
+            models.append(snapshot)
+        with self._lock:
+            decisions = dict(self._decisions)
+        return {
+            "mode": self.mode,
+            "latency_slo_ms": self.latency_slo_ms,
+            "decisions": decisions,
+            "models": models,
+        }
+
+
+def _prior(model_id: str) -> int:
+    return SPEED_PRIORS.get(model_id, len(SPEED_PRIORS) + 1)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Global instance for reuse
+_model_router: Optional[ModelRouter] = None
+_model_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Get or create the global model router."""
+    global _model_router
+    if _model_router is None:
+        with _model_router_lock:
+            if _model_router is None:
+                _model_router = ModelRouter()
+    return _model_router
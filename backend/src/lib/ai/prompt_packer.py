@@ -0,0 +1,243 @@
+"""
+Context-Window-Aware Prompt Packing.
+
+Fits a conversation into a model's context window: the system prompt, the
+new user turn and room for the reply are always reserved, the most recent
+turns are kept verbatim, and anything older is folded into a rolling
+summary that is cached across requests of the same conversation.
+
+Messages are laid out static-first (system prompt, summary, history, new
+turn, per-request context) so consecutive requests share the longest
+possible byte-identical prefix for provider-side prompt caching.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .llm_client import AVAILABLE_MODELS
+from .tokenizer import count_tokens, count_message_tokens, TOKENS_PER_MESSAGE
+
+
+# Context window assumed for model ids we don't know (smallest we serve)
+FALLBACK_CONTEXT_WINDOW = 8192
+
+SUMMARY_HEADER = "Summary of earlier conversation (older turns condensed):"
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+@dataclass
+class PackedPrompt:
+    """Result of packing a conversation into a prompt budget."""
+    messages: List[Dict]
+    prompt_tokens: int
+    budget_tokens: int
+    kept_turns: int
+    summarized_turns: int
+
+    def to_dict(self):
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "budget_tokens": self.budget_tokens,
+            "kept_turns": self.kept_turns,
+            "summarized_turns": self.summarized_turns,
+        }
+
+
+class PromptPacker:
+    """
+    Packs system prompt, history and user message into a token budget.
+
+    Usage:
+        packer = PromptPacker()
+        packed = packer.pack(system_prompt, history, "I still have a fever",
+                             model_id="gemma2-9b-it", max_tokens=1024)
+        await client.chat(packed.messages, max_tokens=1024)
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: Optional[int] = None,
+        summary_max_tokens: int = 384,
+        safety_margin: float = 0.05,
+        cache_size: int = 512,
+        fold_block: int = 8,
+    ):
+        if max_prompt_tokens is None:
+            max_prompt_tokens = int(os.getenv("CHAT_MAX_PROMPT_TOKENS", "6000"))
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.safety_margin = safety_margin
+        self.cache_size = cache_size
+        # Older turns are folded in blocks so the summary (and everything
+        # after it in the prompt) only changes every few exchanges.
+        self.fold_block = max(1, fold_block)
+
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def budget_for(self, model_id: str, max_tokens: int) -> int:
+        """Prompt token budget for a model after reserving the reply."""
+        model = AVAILABLE_MODELS.get(model_id)
+        context_window = model.context_window if model else FALLBACK_CONTEXT_WINDOW
+        usable = int(context_window * (1 - self.safety_margin)) - max_tokens
+        return max(0, min(usable, self.max_prompt_tokens))
+
+    def pack(
+        self,
+        system_prompt: str,
+        history: List[Dict],
+        user_message: str,
+        model_id: str,
+        max_tokens: int,
+        context_message: Optional[str] = None,
+    ) -> PackedPrompt:
+        """
+        Build the message list for an LLM call within the model's budget.
+
+        Args:
+            system_prompt: Static system prompt (always sent first)
+            history: Prior messages, oldest first, as role/content dicts
+            user_message: The new user turn (always sent last)
+            model_id: Target model, used to look up its context window
+            max_tokens: Tokens reserved for the model's reply
+            context_message: Optional per-request context, sent after the
+                user turn so it never disturbs the cacheable prefix
+
+        Returns:
+            PackedPrompt with the messages and token accounting
+        """
+        budget = self.budget_for(model_id, max_tokens)
+        system_message = {"role": "system", "content": system_prompt}
+        user_turn = {"role": "user", "content": user_message}
+        tail = [user_turn]
+        if context_message:
+            tail.append({"role": "system", "content": context_message})
+
+        used = count_message_tokens([system_message, *tail])
+        history_costs = [
+            TOKENS_PER_MESSAGE + count_tokens(msg.get("content", ""))
+            for msg in history
+        ]
+
+        # Everything fits: send the conversation untouched
+        if used + sum(history_costs) <= budget:
+            messages = [system_message, *history, *tail]
+            return PackedPrompt(
+                messages=messages,
+                prompt_tokens=used + sum(history_costs),
+                budget_tokens=budget,
+                kept_turns=len(history),
+                summarized_turns=0,
+            )
+
+        # Keep the newest turns that fit alongside a summary of the rest
+        remaining = budget - used - (TOKENS_PER_MESSAGE + self.summary_max_tokens)
+        split = len(history)
+        while split > 0 and history_costs[split - 1] <= remaining:
+            remaining -= history_costs[split - 1]
+            split -= 1
+        split = min(len(history), -(-split // self.fold_block) * self.fold_block)
+
+        older, recent = history[:split], history[split:]
+        summary = self.summarize(older)
+        summary_message = {"role": "system", "content": summary}
+
+        messages = [system_message, summary_message, *recent, *tail]
+        return PackedPrompt(
+            messages=messages,
+            prompt_tokens=count_message_tokens(messages),
+            budget_tokens=budget,
+            kept_turns=len(recent),
+            summarized_turns=len(older),
+        )
+
+    def summarize(self, messages: List[Dict]) -> str:
+        """
+        Condense older turns into a bounded summary.
+
+        Summaries are cached by a running hash of the folded messages, so a
+        conversation that grows by one exchange only condenses the new turns
+        and appends them to the cached summary of its previous prefix.
+        """
+        digests = _prefix_digests(messages)
+        key = digests[-1]
+
+        with self._lock:
+            cached = self._summaries.get(key)
+            if cached is not None:
+                self._summaries.move_to_end(key)
+                return cached
+
+            # Longest previously summarized prefix of this conversation
+            start, lines = 0, []
+            for index in range(len(messages) - 1, 0, -1):
+                prefix_summary = self._summaries.get(digests[index])
+                if prefix_summary is not None:
+                    start = index
+                    lines = prefix_summary.split("\n")[1:]
+                    break
+
+        lines.extend(_condense(msg) for msg in messages[start:])
+        lines = _trim_oldest(lines, self.summary_max_tokens - count_tokens(SUMMARY_HEADER))
+        summary = "\n".join([SUMMARY_HEADER, *lines])
+
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+        return summary
+
+
+def _prefix_digests(messages: List[Dict]) -> List[str]:
+    """digests[i] identifies messages[:i]; computed in one pass."""
+    running = hashlib.sha1()
+    digests = [running.hexdigest()]
+    for msg in messages:
+        running.update(msg.get("role", "").encode())
+        running.update(b"\x00")
+        running.update(msg.get("content", "").encode())
+        running.update(b"\x01")
+        digests.append(running.hexdigest())
+    return digests
+
+
+def _condense(message: Dict, max_words: int = 40) -> str:
+    """First sentence of a message, capped at max_words."""
+    content = " ".join(message.get("content", "").split())
+    first_sentence = _SENTENCE_END_RE.split(content, maxsplit=1)[0]
+    words = first_sentence.split()
+    if len(words) > max_words:
+        first_sentence = " ".join(words[:max_words]) + "..."
+    return f"- {message.get('role', 'user').title()}: {first_sentence}"
+
+
+def _trim_oldest(lines: List[str], max_tokens: int) -> List[str]:
+    """Drop the oldest summary lines until the rest fit in max_tokens."""
+    total = 0
+    kept = []
+    for line in reversed(lines):
+        cost = count_tokens(line) + 1
+        if total + cost > max_tokens:
+            break
+        kept.append(line)
+        total += cost
+    kept.reverse()
+    return kept
+
+
+# Global instance for reuse
+_prompt_packer: Optional[PromptPacker] = None
+
+
+def get_prompt_packer() -> PromptPacker:
+    """Get or create the global prompt packer instance."""
+    global _prompt_packer
+    if _prompt_packer is None:
+        _prompt_packer = PromptPacker()
+    return _prompt_packer
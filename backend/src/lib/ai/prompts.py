@@ -4,7 +4,9 @@ Prompt Engineering for Medical AI Assistant.
 Builds system prompts that embed expert system rules as structured medical guidelines.
 """
 
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
+
+from .tokenizer import count_tokens
 
 # Core system prompt that establishes the AI's role and guidelines
 SYSTEM_PROMPT_BASE = """You are a Medical Diagnostic Assistant powered by an expert system for tropical diseases. You help users understand their symptoms and provide guidance on possible conditions.
@@ -138,6 +140,33 @@ CONVERSATION_GUIDELINES = """
 """
 
 
+def _join_system_prompt(include_rules: bool, include_guidelines: bool) -> str:
+    """Join the static prompt sections for one variant."""
+    parts = [SYSTEM_PROMPT_BASE]
+    
+    if include_rules:
+        parts.append(EXPERT_RULES_SUMMARY)
+    
+    if include_guidelines:
+        parts.append(CONVERSATION_GUIDELINES)
+    
+    return "\n".join(parts)
+
+
+# All system prompt variants, built once at import and keyed by
+# (include_rules, include_guidelines). Every request gets the very same
+# string, so the prompt prefix stays byte-identical for provider caching.
+SYSTEM_PROMPT_VARIANTS: Dict[Tuple[bool, bool], str] = {
+    (rules, guidelines): _join_system_prompt(rules, guidelines)
+    for rules in (True, False)
+    for guidelines in (True, False)
+}
+
+SYSTEM_PROMPT_TOKENS: Dict[Tuple[bool, bool], int] = {
+    key: count_tokens(prompt) for key, prompt in SYSTEM_PROMPT_VARIANTS.items()
+}
+
+
 def build_system_prompt(include_rules: bool = True, include_guidelines: bool = True) -> str:
     """
     Build the complete system prompt for the medical AI assistant.
@@ -147,17 +176,37 @@ def build_system_prompt(include_rules: bool = True, include_guidelines: bool = T
         include_guidelines: Include conversation guidelines
         
     Returns:
-        Complete system prompt string
+        Complete system prompt string (precomputed)
     """
-    parts = [SYSTEM_PROMPT_BASE]
-    
-    if include_rules:
-        parts.append(EXPERT_RULES_SUMMARY)
+    return SYSTEM_PROMPT_VARIANTS[(bool(include_rules), bool(include_guidelines))]
+
+
+def get_system_prompt_tokens(include_rules: bool = True, include_guidelines: bool = True) -> int:
+    """Return the estimated token count of a system prompt variant."""
+    return SYSTEM_PROMPT_TOKENS[(bool(include_rules), bool(include_guidelines))]
+
+
+def build_context_message(context: str, symptoms: List[str] = None) -> str:
+    """
+    Wrap per-request context (patient info, retrieved knowledge) for the LLM.
     
-    if include_guidelines:
-        parts.append(CONVERSATION_GUIDELINES)
+    The result is sent as its own message after the user's turn, so the
+    user's words enter the conversation history unchanged and the
+    system prompt plus history remain a stable, cacheable prefix.
     
-    return "\n".join(parts)
+    Args:
+        context: Output of build_diagnosis_context
+        symptoms: Symptoms extracted from the conversation
+        
+    Returns:
+        Context message content
+    """
+    extracted = ", ".join(symptoms) if symptoms else "none extracted yet"
+    return (
+        f"[Context for assistant - user provided symptoms: {extracted}]\n\n"
+        f"{context}\n\n"
+        "Use this context to answer the user's last message."
+    )
 
 
 def build_diagnosis_context(
@@ -214,6 +263,88 @@ def build_diagnosis_context(
     return "\n".join(parts) if parts else ""
 
 
+DEGRADED_NOTICE = (
+    "I can't reach the AI assistant right now, so this answer comes directly "
+    "from the rule-based expert system and the medical knowledge base."
+)
+
+DEGRADED_SAFETY_NOTE = (
+    "This is not a diagnosis. If you notice danger signs - confusion, convulsions, "
+    "inability to drink, severe dehydration, bloody stool or dark urine - seek medical "
+    "care immediately. Please try again shortly for a full conversational answer."
+)
+
+
+def build_degraded_response(
+    symptoms: List[str] = None,
+    diagnoses: List[Dict] = None,
+    recommendations: List = None,
+    knowledge_context: List[Dict] = None,
+) -> str:
+    """
+    Build a templated answer from expert system output when the LLM is unavailable.
+    
+    Args:
+        symptoms: Symptoms extracted from the conversation
+        diagnoses: Diagnoses from run_diagnosis, most confident first
+        recommendations: Recommendations from run_diagnosis (strings or
+            dicts with an 'action' key)
+        knowledge_context: Retrieved knowledge chunks
+        
+    Returns:
+        Markdown response text
+    """
+    parts = [DEGRADED_NOTICE]
+    
+    if not symptoms:
+        parts.append(
+            "Please describe your symptoms (for example fever, chills, diarrhea, vomiting "
+            "or abdominal pain) and how long you have had them, and I can check them "
+            "against the expert system's rules."
+        )
+    else:
+        parts.append("**Symptoms noted:** " + ", ".join(s.replace("_", " ") for s in symptoms))
+        
+        if diagnoses:
+            lines = ["**Possible conditions:**"]
+            for diag in diagnoses:
+                disease = diag.get("disease", "unknown").replace("_", " ").title()
+                line = f"- {disease} ({diag.get('confidence', 'uncertain')})"
+                if diag.get("reason"):
+                    line += f": {diag['reason']}"
+                lines.append(line)
+            parts.append("\n".join(lines))
+        else:
+            parts.append(
+                "The expert system could not match these symptoms to malaria, cholera or "
+                "typhoid fever. More detail (fever pattern, stool description, travel or "
+                "water exposure) may help."
+            )
+        
+        actions = []
+        for rec in recommendations or []:
+            action = rec.get("action", "") if isinstance(rec, dict) else str(rec)
+            if action and action not in actions:
+                actions.append(action)
+        if actions:
+            parts.append("\n".join(["**Recommendations:**", *(f"- {action}" for action in actions)]))
+    
+    if knowledge_context:
+        lines = ["**From the medical knowledge base:**"]
+        for chunk in knowledge_context[:3]:
+            # Drop the chunk's own heading and emphasis markers
+            body = [line for line in chunk.get("content", "").splitlines() if not line.lstrip().startswith("#")]
+            content = " ".join(" ".join(body).replace("**", "").split())
+            if len(content) > 300:
+                content = content[:300].rsplit(" ", 1)[0] + "..."
+            title = chunk.get("title", "Reference").replace("**", "")
+            lines.append(f"- {title} ({chunk.get('disease', 'General')}): {content}")
+        parts.append("\n".join(lines))
+    
+    parts.append(DEGRADED_SAFETY_NOTE)
+    return "\n\n".join(parts)
+
+
 def build_user_message_with_context(
     user_message: str,
     context: Optional[str] = None,
@@ -0,0 +1,395 @@
+"""
+Client-Side Limits for Upstream LLM Calls.
+
+Caps concurrent upstream requests and keeps request/token rates within the
+provider's per-minute budgets. Callers that cannot be admitted within a
+short queue wait get an LLMBusyError right away instead of piling up
+behind the provider's rate limits and timing out.
+
+State lives in memory (per worker process) or in a SQLite file shared by
+all workers on the host, so the budgets hold for the whole deployment.
+
+Configured from the environment:
+    LLM_MAX_CONCURRENCY     Concurrent upstream requests (default 16, 0 = unlimited)
+    LLM_RPM                 Requests per minute (default 0 = unlimited)
+    LLM_TPM                 Prompt + completion tokens per minute (default 0 = unlimited)
+    LLM_QUEUE_MAX_WAIT      Longest a request may wait for capacity, seconds (default 2)
+    LLM_LIMITER_BACKEND     "memory" (default) or "sqlite"
+    LLM_LIMITER_PATH        SQLite file (default llm_limiter.sqlite3 in backend/)
+"""
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
+
+from .retry import LLMError
+
+if TYPE_CHECKING:
+    import sqlite3
+
+
+# How often a queued request re-checks for capacity
+POLL_INTERVAL = 0.02
+
+
+class LLMBusyError(LLMError):
+    """Upstream capacity is exhausted; the caller should retry after retry_after seconds."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LimiterBackend:
+    """
+    Storage for limiter state.
+
+    try_acquire_slot/try_consume return None on success, or the number of
+    seconds after which capacity is expected to be available (slots free
+    up whenever a request finishes, so they report POLL_INTERVAL).
+
+    Backends with blocking set do I/O (and may wait on other workers'
+    locks), so UpstreamLimiter calls them in a thread, off the event loop.
+    """
+
+    blocking = False
+
+    def try_acquire_slot(self, lease_id: str, limit: int, lease_ttl: float) -> Optional[float]:
+        raise NotImplementedError
+
+    def release_slot(self, lease_id: str) -> None:
+        raise NotImplementedError
+
+    def try_consume(self, name: str, amount: float, per_minute: float) -> Optional[float]:
+        raise NotImplementedError
+
+    def refund(self, name: str, amount: float, per_minute: float) -> None:
+        raise NotImplementedError
+
+    def in_flight(self) -> int:
+        raise NotImplementedError
+
+
+def _refill(level: float, updated_at: float, now: float, per_minute: float) -> float:
+    """Token-bucket level after refilling at per_minute/60 per second, capped at one minute's budget."""
+    return min(per_minute, level + (now - updated_at) * per_minute / 60.0)
+
+
+class MemoryLimiterBackend(LimiterBackend):
+    """Limiter state for a single worker process."""
+
+    def __init__(self):
+        self._leases: Dict[str, float] = {}
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire_slot(self, lease_id: str, limit: int, lease_ttl: float) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, expires_at in self._leases.items() if expires_at < now]:
+                del self._leases[key]
+            if len(self._leases) >= limit:
+                return POLL_INTERVAL
+            self._leases[lease_id] = now + lease_ttl
+            return None
+
+    def release_slot(self, lease_id: str) -> None:
+        with self._lock:
+            self._leases.pop(lease_id, None)
+
+    def try_consume(self, name: str, amount: float, per_minute: float) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            level, updated_at = self._buckets.get(name, (per_minute, now))
+            level = _refill(level, updated_at, now, per_minute)
+            # A request larger than the whole budget is admitted on a full bucket
+            needed = min(amount, per_minute)
+            if level < needed:
+                self._buckets[name] = [level, now]
+                return (needed - level) * 60.0 / per_minute
+            self._buckets[name] = [level - amount, now]
+            return None
+
+    def refund(self, name: str, amount: float, per_minute: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            level, updated_at = self._buckets.get(name, (per_minute, now))
+            self._buckets[name] = [min(per_minute, _refill(level, updated_at, now, per_minute) + amount), now]
+
+    def in_flight(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for expires_at in self._leases.values() if expires_at >= now)
+
+
+class SQLiteLimiterBackend(LimiterBackend):
+    """
+    Limiter state shared by all workers on a host.
+
+    Each check runs in a BEGIN IMMEDIATE transaction, which serializes
+    workers on the database write lock. Concurrency slots are leases with an
+    expiry, so a worker that dies mid-request cannot leak capacity.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_leases ("
+            " id TEXT PRIMARY KEY,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_buckets ("
+            " name TEXT PRIMARY KEY,"
+            " level REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _connect(self) -> "sqlite3.Connection":
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Imported here: only this backend needs it, the default (memory) one does not
+            import sqlite3
+
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def try_acquire_slot(self, lease_id: str, limit: int, lease_ttl: float) -> Optional[float]:
+        now = time.time()
+        conn = self._transaction()
+        try:
+            conn.execute("DELETE FROM llm_leases WHERE expires_at < ?", (now,))
+            count = conn.execute("SELECT COUNT(*) FROM llm_leases").fetchone()[0]
+            if count >= limit:
+                return POLL_INTERVAL
+            conn.execute("INSERT INTO llm_leases (id, expires_at) VALUES (?, ?)", (lease_id, now + lease_ttl))
+            return None
+        finally:
+            conn.execute("COMMIT")
+
+    def release_slot(self, lease_id: str) -> None:
+        self._connect().execute("DELETE FROM llm_leases WHERE id = ?", (lease_id,))
+
+    def _load_bucket(self, conn: "sqlite3.Connection", name: str, per_minute: float, now: float) -> float:
+        row = conn.execute("SELECT level, updated_at FROM llm_buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return per_minute
+        return _refill(row[0], row[1], now, per_minute)
+
+    def try_consume(self, name: str, amount: float, per_minute: float) -> Optional[float]:
+        now = time.time()
+        conn = self._transaction()
+        try:
+            level = self._load_bucket(conn, name, per_minute, now)
+            needed = min(amount, per_minute)
+            wait = None
+            if level < needed:
+                wait = (needed - level) * 60.0 / per_minute
+            else:
+                level -= amount
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                (name, level, now),
+            )
+            return wait
+        finally:
+            conn.execute("COMMIT")
+
+    def refund(self, name: str, amount: float, per_minute: float) -> None:
+        now = time.time()
+        conn = self._transaction()
+        try:
+            level = min(per_minute, self._load_bucket(conn, name, per_minute, now) + amount)
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                (name, level, now),
+            )
+        finally:
+            conn.execute("COMMIT")
+
+    def in_flight(self) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM llm_leases WHERE expires_at >= ?", (time.time(),)
+        ).fetchone()[0]
+
+
+class UpstreamLimiter:
+    """
+    Concurrency cap plus request/token per-minute budgets.
+
+    Usage:
+        limiter = get_upstream_limiter()
+        async with limiter.slot(deadline):
+            await limiter.admit(estimated_tokens, deadline)
+            ...  # upstream call
+            await limiter.refund_tokens(estimated_tokens - actual_tokens)
+    """
+
+    def __init__(
+        self,
+        backend: LimiterBackend,
+        max_concurrency: int = 16,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_wait: float = 2.0,
+        lease_ttl: float = 120.0,
+    ):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.lease_ttl = lease_ttl
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.wait_seconds = 0.0
+
+    async def _call(self, fn, *args):
+        """fn(*args) on the backend, in a thread when the backend blocks."""
+        if not self.backend.blocking:
+            return fn(*args)
+        call = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            # The thread runs on regardless; let it settle (e.g. finish taking
+            # a lease) before the caller cleans up after the cancellation
+            await asyncio.wait([call])
+            raise
+
+    async def _wait_for(self, attempt, deadline: Optional[float], what: str) -> None:
+        """Poll attempt() until it returns None or the queue wait runs out."""
+        start = time.monotonic()
+        give_up = start + self.max_wait
+        if deadline is not None:
+            give_up = min(give_up, deadline)
+
+        retry_in = await self._call(attempt)
+        if retry_in is None:
+            return
+        self.queued += 1
+        while retry_in is not None:
+            now = time.monotonic()
+            # Fail fast when capacity cannot come back before we would give up
+            if now + retry_in > give_up:
+                self.rejected += 1
+                self.wait_seconds += now - start
+                raise LLMBusyError(
+                    f"LLM capacity exhausted ({what}); retry later",
+                    retry_after=max(1.0, retry_in),
+                )
+            await asyncio.sleep(min(max(retry_in, POLL_INTERVAL), POLL_INTERVAL * 5))
+            retry_in = await self._call(attempt)
+        self.wait_seconds += time.monotonic() - start
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold one concurrent upstream slot for the duration of the block."""
+        if self.max_concurrency <= 0:
+            yield
+            return
+        lease_id = uuid.uuid4().hex
+        try:
+            # Acquired inside the try: a request cancelled just as its lease is
+            # granted must not leave it held until lease_ttl. Releasing a lease
+            # that was never granted is a no-op.
+            await self._wait_for(
+                lambda: self.backend.try_acquire_slot(lease_id, self.max_concurrency, self.lease_ttl),
+                deadline, "concurrency",
+            )
+            yield
+        finally:
+            # Shielded: a cancelled request must still give its lease back
+            await asyncio.shield(self._call(self.backend.release_slot, lease_id))
+
+    async def admit(self, tokens: int, deadline: Optional[float] = None) -> None:
+        """Charge one request and the estimated tokens against the per-minute budgets."""
+        if self.requests_per_minute > 0:
+            await self._wait_for(
+                lambda: self.backend.try_consume("requests", 1, self.requests_per_minute),
+                deadline, "requests per minute",
+            )
+        if self.tokens_per_minute > 0:
+            try:
+                await self._wait_for(
+                    lambda: self.backend.try_consume("tokens", tokens, self.tokens_per_minute),
+                    deadline, "tokens per minute",
+                )
+            except LLMBusyError:
+                if self.requests_per_minute > 0:
+                    await self._call(self.backend.refund, "requests", 1, self.requests_per_minute)
+                raise
+        self.admitted += 1
+
+    async def refund_tokens(self, tokens: int) -> None:
+        """Return reserved tokens that the call did not use."""
+        if self.tokens_per_minute > 0 and tokens > 0:
+            await self._call(self.backend.refund, "tokens", tokens, self.tokens_per_minute)
+
+    def stats(self) -> Dict:
+        """Admission metrics for this process."""
+        return {
+            "backend": type(self.backend).__name__,
+            "in_flight": self.backend.in_flight(),
+            "max_concurrency": self.max_concurrency,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+def create_upstream_limiter_from_env() -> UpstreamLimiter:
+    """Build the limiter described by LLM_* limit variables."""
+    backend_name = os.getenv("LLM_LIMITER_BACKEND", "memory").strip().lower()
+    if backend_name == "memory":
+        backend = MemoryLimiterBackend()
+    elif backend_name == "sqlite":
+        default_path = Path(__file__).resolve().parents[3] / "llm_limiter.sqlite3"
+        backend = SQLiteLimiterBackend(os.getenv("LLM_LIMITER_PATH", str(default_path)))
+    else:
+        raise ValueError(f"Unknown LLM_LIMITER_BACKEND: {backend_name}. Use 'memory' or 'sqlite'.")
+
+    return UpstreamLimiter(
+        backend,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        requests_per_minute=float(os.getenv("LLM_RPM", "0")),
+        tokens_per_minute=float(os.getenv("LLM_TPM", "0")),
+        max_wait=float(os.getenv("LLM_QUEUE_MAX_WAIT", "2")),
+        lease_ttl=float(os.getenv("LLM_REQUEST_TIMEOUT", "60")) * 2,
+    )
+
+
+# Global instance for reuse
+_upstream_limiter: Optional[UpstreamLimiter] = None
+_upstream_limiter_lock = threading.Lock()
+
+
+def get_upstream_limiter() -> UpstreamLimiter:
+    """Get or create the global upstream limiter."""
+    global _upstream_limiter
+    if _upstream_limiter is None:
+        with _upstream_limiter_lock:
+            if _upstream_limiter is None:
+                _upstream_limiter = create_upstream_limiter_from_env()
+    return _upstream_limiter
@@ -0,0 +1,293 @@
+"""
+LLM Response Cache.
+
+Opt-in cache in front of LLMClient.chat for repeated requests (typically
+first-turn questions such as "what are the symptoms of cholera?"). Keys
+cover the model, normalized messages, temperature and max_tokens; only
+low-temperature or explicitly cacheable requests are stored.
+
+Configured from the environment:
+    LLM_CACHE_BACKEND           "memory" or "sqlite" (unset disables caching)
+    LLM_CACHE_MAX_ENTRIES       Maximum cached completions (default 1024)
+    LLM_CACHE_TTL_SECONDS       Entry lifetime (default 3600)
+    LLM_CACHE_MAX_TEMPERATURE   Highest temperature cached implicitly (default 0.2)
+    LLM_CACHE_PATH              SQLite file (default llm_cache.sqlite3 in backend/)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncGenerator, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import sqlite3
+
+
+class CacheBackend:
+    """
+    Storage interface for cached completions.
+
+    Backends with blocking set do I/O, so async callers use
+    ResponseCache.aget/aset, which run them in a thread.
+    """
+
+    blocking = False
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    SQLite-backed cache shared by all workers on a host.
+
+    Uses WAL mode and one connection per thread; least recently used
+    entries are evicted once max_entries is exceeded.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 1024):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)"
+            )
+
+    def _connect(self) -> "sqlite3.Connection":
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Imported here: only this backend needs it, the default (memory) one does not
+            import sqlite3
+
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now),
+        )
+        conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM llm_cache")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Policy, keying and hit-rate accounting on top of a CacheBackend.
+
+    Usage:
+        cache = ResponseCache(MemoryCacheBackend(max_entries=512), ttl=600)
+        key = cache.make_key(model, messages, temperature, max_tokens)
+        text = cache.get(key)
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = 3600.0, max_temperature: float = 0.2):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+
+    def is_cacheable(self, temperature: float, cacheable: Optional[bool] = None) -> bool:
+        """
+        Decide whether a request may be served from / stored in the cache.
+
+        An explicit cacheable flag wins; otherwise only near-deterministic
+        (low temperature) requests are cached.
+        """
+        if cacheable is not None:
+            return cacheable
+        return temperature <= self.max_temperature
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        """Stable key over the model, whitespace-normalized messages and sampling params."""
+        normalized = [
+            [msg.get("role", ""), " ".join(msg.get("content", "").split())]
+            for msg in messages
+        ]
+        payload = json.dumps(
+            [model, normalized, round(float(temperature), 3), int(max_tokens)],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.backend.set(key, value, self.ttl)
+        self.stores += 1
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for async callers: a blocking backend is read in a thread, off the event loop."""
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """set() for async callers: a blocking backend is written in a thread, off the event loop."""
+        if self.backend.blocking:
+            await asyncio.to_thread(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def record_bypass(self) -> None:
+        """Count a request that was not eligible for caching."""
+        self.bypassed += 1
+
+    def stats(self) -> Dict:
+        """Hit-rate metrics for this process."""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+async def replay_stream(text: str, chunk_words: int = 3) -> AsyncGenerator[str, None]:
+    """Replay a cached completion as a stream of small chunks."""
+    words = text.split(" ")
+    for start in range(0, len(words), chunk_words):
+        chunk = " ".join(words[start:start + chunk_words])
+        if start + chunk_words < len(words):
+            chunk += " "
+        yield chunk
+
+
+def create_response_cache_from_env() -> Optional[ResponseCache]:
+    """Build the response cache described by LLM_CACHE_* variables, if enabled."""
+    backend_name = os.getenv("LLM_CACHE_BACKEND", "").strip().lower()
+    if not backend_name:
+        return None
+
+    max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+    if backend_name == "memory":
+        backend = MemoryCacheBackend(max_entries=max_entries)
+    elif backend_name == "sqlite":
+        default_path = Path(__file__).resolve().parents[3] / "llm_cache.sqlite3"
+        backend = SQLiteCacheBackend(os.getenv("LLM_CACHE_PATH", str(default_path)), max_entries=max_entries)
+    else:
+        raise ValueError(f"Unknown LLM_CACHE_BACKEND: {backend_name}. Use 'memory' or 'sqlite'.")
+
+    return ResponseCache(
+        backend,
+        ttl=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600")),
+        max_temperature=float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2")),
+    )
+
+
+# Global instance for reuse (None when caching is disabled)
+_response_cache: Optional[ResponseCache] = None
+_response_cache_loaded = False
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get or create the global response cache, or None if disabled."""
+    global _response_cache, _response_cache_loaded
+    if not _response_cache_loaded:
+        _response_cache = create_response_cache_from_env()
+        _response_cache_loaded = True
+    return _response_cache
@@ -0,0 +1,99 @@
+"""
+Retry and Fallback Policy for Upstream LLM Calls.
+
+Decides which upstream failures are worth retrying, how long to wait
+between attempts (jittered exponential backoff that honors Retry-After),
+and which models to fall back to when the requested one is saturated.
+"""
+
+import os
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+
+# Ordered fallbacks per model, fastest/most available first
+FALLBACK_MODELS: Dict[str, List[str]] = {
+    "llama-3.3-70b-versatile": ["llama-3.1-8b-instant", "gemma2-9b-it"],
+    "mixtral-8x7b-32768": ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
+    "llama-3.1-8b-instant": ["gemma2-9b-it"],
+    "gemma2-9b-it": ["llama-3.1-8b-instant"],
+}
+
+# 408 Request Timeout, 409 Conflict, 425 Too Early, 429 Too Many Requests
+RETRYABLE_STATUS = {408, 409, 425, 429}
+
+# Statuses meaning "this model is saturated" - move down the fallback chain
+# instead of waiting out a long Retry-After
+SATURATED_STATUS = {429, 503}
+
+
+class LLMError(Exception):
+    """Base error for failed LLM calls."""
+
+
+class LLMUnavailableError(LLMError):
+    """All attempts across the fallback chain failed or the deadline passed."""
+
+    def __init__(self, message: str, last_error: Optional[BaseException] = None):
+        super().__init__(message)
+        self.last_error = last_error
+
+
+@dataclass
+class RetryPolicy:
+    """Backoff settings for retrying a single model."""
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    # Retry-After longer than this sends us to the next model instead
+    max_retry_after: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("LLM_RETRY_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "8.0")),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given 0-based attempt."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transient transport errors, timeouts, 429s and 5xx are retryable."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError))
+
+
+def is_saturated(exc: BaseException) -> bool:
+    """Whether the error says the model is overloaded or rate limited."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in SATURATED_STATUS
+    return isinstance(exc, httpx.TimeoutException)
+
+
+def parse_retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date)."""
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,270 @@
+"""
+Single-Flight Request Coalescing.
+
+When identical LLM requests are in flight at the same time, only the first
+(the leader) goes upstream; the others (followers) await the leader's
+result, or replay the leader's token stream as it arrives.
+
+Only failures of the upstream call itself are shared. When the call ends
+for reasons of the request that made it (the leader was cancelled, its
+client went away, or its own deadline from src.lib.deadline passed), the
+followers are not failed with it: a follower that is still waiting issues
+the call again and the others coalesce onto it. A stream is read from
+upstream by a task of its own, so it keeps going for the followers when the
+leader's client disconnects, and stops once no one is reading it.
+
+Under ASGI every chat call runs on the server's event loop, but sync
+callers (WSGI, management commands) each get a loop of their own, so
+flights are coordinated with thread-safe primitives and followers are woken
+on their own loop via call_soon_threadsafe.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .. import deadline
+
+
+class CoalescedStreamAborted(RuntimeError):
+    """The stream a follower was replaying stopped before it finished."""
+
+
+class _LeaderGone(Exception):
+    """The leader's call ended for reasons of its own request; followers should retry."""
+
+
+def _ended_by_caller(exc: BaseException) -> bool:
+    """True when exc ended the call for the request that made it, not for everyone."""
+    if not isinstance(exc, Exception):
+        # CancelledError, GeneratorExit, KeyboardInterrupt
+        return True
+    remaining = deadline.remaining()
+    return remaining is not None and remaining <= 0
+
+
+class _Flight:
+    """State shared by the leader and followers of one in-flight request."""
+
+    def __init__(self):
+        self.result: concurrent.futures.Future = concurrent.futures.Future()
+        self.followers = 0
+        # Streaming state, guarded by lock
+        self.lock = threading.Lock()
+        self.chunks: List[str] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        # The error ended the call for the leader's request only
+        self.ended_by_caller = False
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.readers = 0
+        self.producer: Optional[asyncio.Task] = None
+        self.producer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def publish(self, chunk: Optional[str] = None, finished: bool = False,
+                error: Optional[BaseException] = None) -> None:
+        """Append a stream chunk (or finish the stream) and wake followers."""
+        with self.lock:
+            if chunk is not None:
+                self.chunks.append(chunk)
+            if finished:
+                self.finished = True
+                self.error = error
+                self.ended_by_caller = error is not None and _ended_by_caller(error)
+            waiters, self.waiters = self.waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # Follower's loop already closed (client went away)
+                pass
+
+    def leave(self) -> None:
+        """A reader stopped; cancel the upstream read once no one is left."""
+        with self.lock:
+            self.readers -= 1
+            abandoned = self.readers == 0 and not self.finished
+        if abandoned and self.producer is not None:
+            try:
+                self.producer_loop.call_soon_threadsafe(self.producer.cancel)
+            except RuntimeError:
+                # The producer's loop is closed, which already ended it
+                pass
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+
+    Usage:
+        flights = SingleFlight()
+        text, coalesced = await flights.do(key, lambda: fetch(payload))
+        async for chunk in flights.stream(key, lambda: open_stream(payload)):
+            ...
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.stream_leaders = 0
+        self.stream_coalesced = 0
+
+    def _join(self, key: str, reader: bool = False) -> Tuple[_Flight, bool]:
+        """Return the flight for key and whether the caller leads it."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+            else:
+                flight.followers += 1
+            if reader:
+                with flight.lock:
+                    flight.readers += 1
+            return flight, leader
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Returns:
+            (result, coalesced) where coalesced is True for followers
+        """
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            try:
+                result = await asyncio.wrap_future(flight.result)
+            except _LeaderGone:
+                # Run it again, or follow whoever got there first
+                continue
+            self.coalesced += 1
+            return result, True
+
+        self.leaders += 1
+        try:
+            result = await fn()
+        except BaseException as exc:
+            # Landed first, so a retrying follower starts a new flight
+            self._land(key, flight)
+            flight.result.set_exception(_LeaderGone() if _ended_by_caller(exc) else exc)
+            raise
+        self._land(key, flight)
+        flight.result.set_result(result)
+        return result, False
+
+    async def stream(
+        self, key: str, fn: Callable[[], AsyncIterator[str]]
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream fn's chunks once for all concurrent callers with the same key.
+
+        Followers that join late first receive the chunks already produced.
+        """
+        received = 0
+        while True:
+            flight, leader = self._join(key, reader=True)
+            if leader:
+                self.stream_leaders += 1
+                flight.producer_loop = asyncio.get_running_loop()
+                flight.producer = flight.producer_loop.create_task(self._produce(key, flight, fn))
+            else:
+                self.stream_coalesced += 1
+            try:
+                async for chunk in self._read(flight, leader):
+                    received += 1
+                    yield chunk
+                return
+            except _LeaderGone:
+                if received:
+                    # Another completion cannot be spliced onto the chunks already sent
+                    raise CoalescedStreamAborted("Upstream stream was ended by the request that owned it")
+            finally:
+                flight.leave()
+
+    async def _produce(self, key: str, flight: _Flight, fn: Callable[[], AsyncIterator[str]]) -> None:
+        """Read the upstream stream into the flight (a task on the leader's loop)."""
+        upstream = fn()
+        try:
+            async for chunk in upstream:
+                flight.publish(chunk)
+        except BaseException as exc:
+            self._land(key, flight)
+            flight.publish(finished=True, error=exc)
+            if not isinstance(exc, Exception):
+                raise
+            # Errors reach the readers through the flight; the task ends quietly
+        else:
+            self._land(key, flight)
+            flight.publish(finished=True)
+        finally:
+            await upstream.aclose()
+
+    async def _read(self, flight: _Flight, leader: bool) -> AsyncGenerator[str, None]:
+        loop = asyncio.get_running_loop()
+        index = 0
+        while True:
+            with flight.lock:
+                batch = flight.chunks[index:]
+                finished, error = flight.finished, flight.error
+                waiter = None
+                if not batch and not finished:
+                    waiter = loop.create_future()
+                    flight.waiters.append((loop, waiter))
+
+            for chunk in batch:
+                yield chunk
+            index += len(batch)
+
+            if waiter is not None:
+                await waiter
+            elif finished and index >= len(flight.chunks):
+                if error is None:
+                    return
+                if flight.ended_by_caller and not leader:
+                    raise _LeaderGone()
+                if not isinstance(error, Exception):
+                    raise CoalescedStreamAborted("Upstream stream was cancelled")
+                raise error
+
+    def stats(self) -> Dict:
+        """Coalescing metrics for this process."""
+        with self._lock:
+            in_flight = len(self._flights)
+        return {
+            "in_flight": in_flight,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "stream_leaders": self.stream_leaders,
+            "stream_coalesced": self.stream_coalesced,
+        }
+
+
+# Global instance shared by all LLMClient instances in the process
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Get or create the global single-flight coordinator."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,53 @@
+"""
+Local Token Counting.
+
+Approximates the token counts of the Llama/Mixtral/Gemma BPE tokenizers
+without shipping a tokenizer model. Estimates lean slightly high so that
+prompts sized against them stay inside the real context window.
+"""
+
+import re
+from typing import Dict, List
+
+
+# Mirrors the pre-tokenization split used by modern BPE tokenizers:
+# contractions, letter runs, up to 3 digits, punctuation runs, whitespace.
+_PRETOKEN_RE = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)"
+    r"| ?[^\W\d_]+"
+    r"| ?\d{1,3}"
+    r"| ?[^\s\w]+"
+    r"|\s+"
+)
+
+# Chat-format overhead (role markers and separators) per message, plus the
+# tokens that prime the assistant reply.
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text."""
+    if not text:
+        return 0
+
+    total = 0
+    for piece in _PRETOKEN_RE.findall(text):
+        length = len(piece.strip()) or 1
+        if piece[-1].isalpha():
+            # Common words are a single token; rarer long words split into
+            # roughly four-character subwords.
+            total += 1 if length <= 5 else (length + 3) // 4
+        elif piece.isspace() or piece[-1].isdigit():
+            total += 1
+        else:
+            total += (length + 1) // 2
+    return total
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """Estimate the prompt tokens for a list of chat messages."""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message.get("content", ""))
+    return total
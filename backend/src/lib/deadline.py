@@ -0,0 +1,45 @@
+"""
+Request deadlines.
+
+A deadline is the time.monotonic() value by which the current request must
+be answered. AdmissionMiddleware sets it for the request from the client's
+X-Request-Timeout-Ms header; code that waits (for a diagnosis process, for
+upstream capacity or for the LLM) bounds its waits with remaining() or
+clamp() so that no work continues for a caller that has already given up.
+Like the current trace, the deadline lives in a context variable, so it
+follows the request into threads started with sync_to_async or
+asyncio.to_thread.
+"""
+
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+
+_current_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def activate(deadline: Optional[float]) -> Token:
+    """Make deadline current; pass the token to deactivate() when the request ends."""
+    return _current_deadline.set(deadline)
+
+
+def deactivate(token: Token) -> None:
+    _current_deadline.reset(token)
+
+
+def current() -> Optional[float]:
+    """The current request's deadline, or None when it has none."""
+    return _current_deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (negative once passed), or None."""
+    deadline = _current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def clamp(deadline: float) -> float:
+    """deadline, or the current request's deadline if that comes first."""
+    current_deadline = _current_deadline.get()
+    return deadline if current_deadline is None else min(deadline, current_deadline)
@@ -1,12 +1,61 @@
-from .diagnosis_engine import MedicalDiagnosisEngine
-from .facts import (
-    Patient, Symptom, VitalSign, DehydrationSign,
-    LabResult, DehydrationLevel, SeverityIndicator,
-    Diagnosis, TreatmentPlan
-)
-from .visualize_knowledge import (
-    print_rules_summary,
-    generate_mermaid_diagram,
-    create_knowledge_graph,
-    visualize_graph
-)
\ No newline at end of file
+"""
+Rule-based expert system for cholera, malaria and typhoid fever.
+
+Exports are resolved lazily (PEP 562), so API workers importing the engine
+do not also load visualize_knowledge, which is only used for offline
+diagrams and summaries.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+# Before anything imports experta (see compat)
+from . import compat  # noqa: F401
+
+# Exported name -> submodule defining it
+_EXPORTS = {
+    "MedicalDiagnosisEngine": ".diagnosis_engine",
+    "Patient": ".facts",
+    "Symptom": ".facts",
+    "VitalSign": ".facts",
+    "DehydrationSign": ".facts",
+    "LabResult": ".facts",
+    "DehydrationLevel": ".facts",
+    "SeverityIndicator": ".facts",
+    "Diagnosis": ".facts",
+    "TreatmentPlan": ".facts",
+    "print_rules_summary": ".visualize_knowledge",
+    "generate_mermaid_diagram": ".visualize_knowledge",
+    "create_knowledge_graph": ".visualize_knowledge",
+    "visualize_graph": ".visualize_knowledge",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .diagnosis_engine import MedicalDiagnosisEngine
+    from .facts import (
+        Patient, Symptom, VitalSign, DehydrationSign,
+        LabResult, DehydrationLevel, SeverityIndicator,
+        Diagnosis, TreatmentPlan
+    )
+    from .visualize_knowledge import (
+        print_rules_summary,
+        generate_mermaid_diagram,
+        create_knowledge_graph,
+        visualize_graph
+    )
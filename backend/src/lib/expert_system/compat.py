@@ -0,0 +1,29 @@
+"""
+Compatibility shims for running experta on current CPython.
+
+experta 1.9.4 pins frozendict==1.2, whose frozendict subclasses
+``collections.Mapping``. That alias (deprecated since 3.3) was removed from
+``collections`` in Python 3.10, so importing experta fails with
+AttributeError on 3.10 and later. install() puts the alias back, pointing
+at ``collections.abc``, before experta is imported; on older interpreters
+it does nothing.
+
+The package __init__ imports this module first, so every import of
+experta through src.lib.expert_system is covered.
+"""
+
+import collections
+import collections.abc
+
+# ABC aliases removed from collections in 3.10 that experta's dependencies use
+REMOVED_ABC_ALIASES = ("Mapping",)
+
+
+def install() -> None:
+    """Restore the removed aliases (idempotent)."""
+    for name in REMOVED_ABC_ALIASES:
+        if not hasattr(collections, name):
+            setattr(collections, name, getattr(collections.abc, name))
+
+
+install()
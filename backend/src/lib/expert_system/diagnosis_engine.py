@@ -5,17 +5,75 @@ This module contains the main KnowledgeEngine with diagnostic rules
 for cholera, malaria, and typhoid fever based on clinical guidelines.
 """
 
+import os
+import threading
+import time
+from typing import List, Optional
+
 from experta import (
     KnowledgeEngine, Rule, DefFacts, Fact,
     AND, OR, NOT, AS, MATCH,
     L, W, P
 )
+from experta.agenda import Agenda
 
 from .facts import (
     Patient, Symptom, VitalSign, DehydrationSign,
     LabResult, DehydrationLevel, SeverityIndicator,
     Diagnosis, TreatmentPlan
 )
+from ..telemetry.metrics import FAST_BUCKETS, counter, histogram
+from ..telemetry.tracing import span
+
+
+DIAGNOSIS_LATENCY = histogram(
+    "diagnosis_duration_seconds", "Time to build the engine, declare facts and run inference",
+    buckets=FAST_BUCKETS + (0.5, 1.0),
+)
+RULE_FIRINGS = counter("diagnosis_rule_firings_total", "Expert system rule firings by rule", ["rule"])
+
+# Findings behind the urgent-referral rules (cerebral malaria, blackwater
+# fever, intestinal complications, severe dehydration)
+DANGER_SIGN_SYMPTOMS = frozenset({
+    "altered_consciousness", "convulsions", "prostration",
+    "dark_urine", "melena", "bloody_stool", "severe_abdominal_pain",
+})
+DANGER_SIGN_MENTAL_STATES = frozenset({"lethargic", "unconscious"})
+
+
+def has_danger_signs(symptoms: list, dehydration_signs: list = None) -> bool:
+    """
+    Whether the inputs of a diagnosis include a danger sign, checked
+    without running the engine (e.g. to prioritise the request). Takes the
+    same dicts as run_diagnosis.
+    """
+    for symptom in symptoms or []:
+        if not isinstance(symptom, dict) or symptom.get("present") is False:
+            continue
+        if symptom.get("name") in DANGER_SIGN_SYMPTOMS:
+            return True
+        if symptom.get("name") == "dehydration" and symptom.get("severity") == "severe":
+            return True
+    for sign in dehydration_signs or []:
+        if (isinstance(sign, dict) and sign.get("sign") == "mental_state"
+                and sign.get("finding") in DANGER_SIGN_MENTAL_STATES):
+            return True
+    return False
+
+
+class RecordingAgenda(Agenda):
+    """Agenda that remembers the name of every rule it hands out to fire."""
+    
+    def __init__(self, activations=()):
+        super().__init__()
+        self.activations = list(activations)
+        self.fired = []
+    
+    def get_next(self):
+        activation = super().get_next()
+        if activation is not None:
+            self.fired.append(activation.rule.__name__)
+        return activation
 
 
 class MedicalDiagnosisEngine(KnowledgeEngine):
@@ -48,6 +106,18 @@ class MedicalDiagnosisEngine(KnowledgeEngine):
     def get_recommendations(self):
         """Return all recommendations."""
         return self.recommendations
+    
+    def reset(self, **kwargs):
+        """Reset working memory and results, recording rule firings from here on."""
+        super().reset(**kwargs)
+        self.agenda = RecordingAgenda(self.agenda.activations)
+        # New lists: results handed out before the reset stay intact
+        self.diagnoses = []
+        self.recommendations = []
+    
+    def get_fired_rules(self):
+        """Names of the rules fired since the last reset, in firing order."""
+        return list(getattr(self.agenda, "fired", []))
 
     # =========================================================================
     # DEHYDRATION CLASSIFICATION (WHO Protocol)
@@ -605,6 +675,74 @@ class MedicalDiagnosisEngine(KnowledgeEngine):
         })
 
 
+class EnginePool:
+    """
+    Idle engines kept for reuse.
+
+    Building a MedicalDiagnosisEngine compiles the Rete network for every
+    rule, which is most of the cost of a cold diagnosis; reset() clears an
+    engine's working memory and results so it can serve the next request.
+    An engine is used by one thread at a time; engines whose run raised are
+    dropped rather than returned.
+    """
+    
+    def __init__(self, size: int = 4):
+        self.size = size
+        self._idle: List[MedicalDiagnosisEngine] = []
+        self._lock = threading.Lock()
+        self.built = 0
+        self.reused = 0
+    
+    def prebuild(self, count: Optional[int] = None) -> int:
+        """Fill the pool up to count (default: its size); returns engines built."""
+        target = min(self.size, self.size if count is None else count)
+        built = 0
+        while True:
+            with self._lock:
+                if len(self._idle) >= target:
+                    return built
+            engine = self._build()
+            with self._lock:
+                self._idle.append(engine)
+            built += 1
+    
+    def _build(self) -> MedicalDiagnosisEngine:
+        engine = MedicalDiagnosisEngine()
+        with self._lock:
+            self.built += 1
+        return engine
+    
+    def acquire(self) -> MedicalDiagnosisEngine:
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+        return self._build()
+    
+    def release(self, engine: MedicalDiagnosisEngine) -> None:
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(engine)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "idle": len(self._idle), "built": self.built, "reused": self.reused}
+
+
+_engine_pool: Optional[EnginePool] = None
+_engine_pool_lock = threading.Lock()
+
+
+def get_engine_pool() -> EnginePool:
+    """Get or create the process-wide engine pool (ENGINE_POOL_SIZE idle engines, 0 disables reuse)."""
+    global _engine_pool
+    if _engine_pool is None:
+        with _engine_pool_lock:
+            if _engine_pool is None:
+                _engine_pool = EnginePool(size=int(os.getenv("ENGINE_POOL_SIZE", "4")))
+    return _engine_pool
+
+
 def run_diagnosis(symptoms: list, patient_info: dict = None, lab_results: list = None,
                   dehydration_signs: list = None) -> dict:
     """
@@ -623,31 +761,47 @@ def run_diagnosis(symptoms: list, patient_info: dict = None, lab_results: list =
     Returns:
         Dict with diagnoses and recommendations
     """
-    engine = MedicalDiagnosisEngine()
-    engine.reset()
-    
-    # Declare patient info
-    if patient_info:
-        engine.declare(Patient(**patient_info))
-    
-    # Declare symptoms
-    for symptom in symptoms:
-        engine.declare(Symptom(**symptom))
-    
-    # Declare lab results
-    if lab_results:
-        for lab in lab_results:
-            engine.declare(LabResult(**lab))
-    
-    # Declare dehydration signs
-    if dehydration_signs:
-        for sign in dehydration_signs:
-            engine.declare(DehydrationSign(**sign))
-    
-    # Run the inference engine
-    engine.run()
+    started = time.perf_counter()
+    with span("diagnosis", symptoms=len(symptoms)) as diagnosis_span:
+        pool = get_engine_pool()
+        with span("diagnosis.engine_init"):
+            engine = pool.acquire()
+            engine.reset()
+        with span("diagnosis.declare"):
+            # Declare patient info
+            if patient_info:
+                engine.declare(Patient(**patient_info))
+            
+            # Declare symptoms
+            for symptom in symptoms:
+                engine.declare(Symptom(**symptom))
+            
+            # Declare lab results
+            if lab_results:
+                for lab in lab_results:
+                    engine.declare(LabResult(**lab))
+            
+            # Declare dehydration signs
+            if dehydration_signs:
+                for sign in dehydration_signs:
+                    engine.declare(DehydrationSign(**sign))
+        
+        # Run the inference engine
+        with span("diagnosis.run"):
+            engine.run()
+        
+        fired_rules = engine.get_fired_rules()
+        diagnoses = engine.get_diagnoses()
+        recommendations = engine.get_recommendations()
+        # Only reached when the run succeeded; an engine that raised is dropped
+        pool.release(engine)
+        diagnosis_span.set(rules_fired=len(fired_rules), diagnoses=len(diagnoses))
+    
+    DIAGNOSIS_LATENCY.observe(time.perf_counter() - started)
+    for rule in fired_rules:
+        RULE_FIRINGS.inc(rule)
     
     return {
-        'diagnoses': engine.get_diagnoses(),
-        'recommendations': engine.get_recommendations()
+        'diagnoses': diagnoses,
+        'recommendations': recommendations
     }
@@ -0,0 +1,245 @@
+"""
+Process pool for diagnoses.
+
+run_diagnosis is pure Python and CPU-bound. Run in a thread of an ASGI
+worker it holds the GIL for most of its duration, so a burst of diagnoses
+delays everything else on the worker's event loop, including the chunks of
+streaming chat responses. DiagnosisExecutor runs diagnoses in a small pool
+of separate processes instead, and bounds the work it accepts:
+
+    DIAGNOSIS_PROCESSES   processes per worker (default 2; 0 runs diagnoses
+                          in a thread of the worker, as before)
+    DIAGNOSIS_MAX_QUEUE   diagnoses allowed to wait for a free process
+                          (default 16); beyond that run() raises
+                          DiagnosisBusyError at once rather than queueing
+
+A diagnosis not finished by the request's deadline (src.lib.deadline) is
+given up with the same error, and dropped if it had not started yet.
+
+The pool is created on first use in the process that uses it, so workers
+forked by the pre-fork server each get their own. Its processes are
+started with DIAGNOSIS_START_METHOD (default spawn: forking a worker that
+runs an event loop and several threads is not safe) and each builds one
+engine up front.
+"""
+
+import asyncio
+import gc
+import os
+import signal
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Future
+from typing import TYPE_CHECKING, Optional
+
+from .diagnosis_engine import get_engine_pool, run_diagnosis
+from .. import deadline
+from ..telemetry.metrics import counter, gauge, get_registry, histogram
+from ..telemetry.tracing import span
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+POOL_IN_FLIGHT = gauge("diagnosis_pool_in_flight", "Diagnoses submitted to the process pool and not yet finished")
+POOL_REJECTED = counter(
+    "diagnosis_pool_rejected_total", "Diagnoses shed by the process pool (full queue, broken pool, deadline)",
+    ["reason"]
+)
+POOL_QUEUE_WAIT = histogram("diagnosis_pool_queue_wait_seconds", "Time diagnoses waited for a pool process")
+
+
+class DiagnosisBusyError(RuntimeError):
+    """The diagnosis pool is saturated; the caller should retry after retry_after seconds."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _init_process() -> None:
+    """Pool process start-up."""
+    # Spawned children re-import the parent's __main__, and the pre-fork
+    # server's disables the GC; Ctrl-C is handled by the server, not here
+    gc.enable()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    get_registry().start_flusher()
+    get_engine_pool().prebuild(1)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _diagnose(inputs: dict, submitted_at: float):
+    """Pool task: the result and the seconds it waited for and ran in this process."""
+    started = time.time()
+    result = run_diagnosis(**inputs)
+    return result, max(0.0, started - submitted_at), time.time() - started
+
+
+class DiagnosisExecutor:
+    """
+    Bounded process pool running run_diagnosis.
+
+    Args:
+        processes: Pool processes
+        max_queue: Diagnoses allowed to wait while every process is busy
+        start_method: multiprocessing start method for the processes
+    """
+
+    def __init__(self, processes: int = 2, max_queue: int = 16, start_method: str = "spawn"):
+        self.processes = processes
+        self.max_queue = max_queue
+        self.start_method = start_method
+        self.pid = os.getpid()
+        self._executor: Optional["ProcessPoolExecutor"] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        # Moving average of a diagnosis's run time, for Retry-After
+        self._run_seconds = 0.01
+
+    @property
+    def capacity(self) -> int:
+        return self.processes + self.max_queue
+
+    def _pool(self) -> "ProcessPoolExecutor":
+        with self._lock:
+            if self._executor is None:
+                # Deferred: keeps multiprocessing and pickle out of worker import time
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                registry = get_registry()
+                if registry.directory is not None:
+                    # Pool processes report to this worker's metrics directory
+                    os.environ.setdefault("METRICS_DIR", str(registry.directory))
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_process,
+                )
+            return self._executor
+
+    def _discard(self, executor: "ProcessPoolExecutor") -> None:
+        """Drop a broken pool; the next diagnosis starts a new one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def retry_after(self) -> float:
+        """Seconds until the current backlog is expected to have drained."""
+        return self.in_flight * self._run_seconds / self.processes
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                POOL_REJECTED.inc("full")
+                raise DiagnosisBusyError("Diagnosis queue is full", retry_after=self.retry_after())
+            self.in_flight += 1
+        POOL_IN_FLIGHT.inc()
+
+    def _finished(self, future: Optional[Future] = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        POOL_IN_FLIGHT.dec()
+
+    async def start(self) -> int:
+        """Start every pool process (each builds its engine); returns the process count."""
+        executor = self._pool()
+        await asyncio.gather(*(asyncio.wrap_future(executor.submit(_ping)) for _ in range(self.processes)))
+        return self.processes
+
+    async def run(self, **inputs) -> dict:
+        """run_diagnosis(**inputs) in a pool process; raises DiagnosisBusyError when saturated."""
+        executor = self._pool()
+        self._admit()
+        with span("diagnosis.pool", in_flight=self.in_flight) as pool_span:
+            try:
+                future = executor.submit(_diagnose, inputs, time.time())
+            except BrokenExecutor:
+                self._finished()
+                self._discard(executor)
+                POOL_REJECTED.inc("broken")
+                raise DiagnosisBusyError("Diagnosis pool is restarting", retry_after=1.0)
+            # Counted until the process is done with it, even if the caller goes away
+            future.add_done_callback(self._finished)
+            try:
+                # Cancelling a diagnosis still queued when the request's deadline passes drops it
+                result, waited, ran = await asyncio.wait_for(asyncio.wrap_future(future), deadline.remaining())
+            except asyncio.TimeoutError:
+                POOL_REJECTED.inc("deadline")
+                raise DiagnosisBusyError("Diagnosis did not finish before the request deadline",
+                                         retry_after=self.retry_after())
+            except BrokenExecutor:
+                # A process died (e.g. killed by the OOM killer) and took the pool with it
+                self._discard(executor)
+                POOL_REJECTED.inc("broken")
+                raise DiagnosisBusyError("Diagnosis pool is restarting", retry_after=1.0)
+            pool_span.set(queue_wait_ms=round(waited * 1000, 2), run_ms=round(ran * 1000, 2))
+        POOL_QUEUE_WAIT.observe(waited)
+        with self._lock:
+            self.completed += 1
+            self._run_seconds += 0.1 * (ran - self._run_seconds)
+        return result
+
+    def shutdown(self) -> None:
+        """Cancel queued diagnoses and wait for the running ones and the processes to finish."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "max_queue": self.max_queue,
+                "started": self._executor is not None,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+_executor: Optional[DiagnosisExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_diagnosis_executor() -> Optional[DiagnosisExecutor]:
+    """Get or create this process's executor; None when DIAGNOSIS_PROCESSES=0."""
+    global _executor
+    processes = int(os.getenv("DIAGNOSIS_PROCESSES", "2"))
+    if processes <= 0:
+        return None
+    # An executor inherited through fork has no pool threads in this process
+    if _executor is None or _executor.pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor.pid != os.getpid():
+                _executor = DiagnosisExecutor(
+                    processes=processes,
+                    max_queue=int(os.getenv("DIAGNOSIS_MAX_QUEUE", "16")),
+                    start_method=os.getenv("DIAGNOSIS_START_METHOD", "spawn"),
+                )
+    return _executor
+
+
+def shutdown_diagnosis_executor() -> None:
+    """Stop this process's pool, if one was started (blocks until its processes exit)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None and executor.pid == os.getpid():
+        executor.shutdown()
+
+
+async def run_diagnosis_async(**inputs) -> dict:
+    """run_diagnosis off the event loop: in the process pool, or in a thread when it is disabled."""
+    executor = get_diagnosis_executor()
+    if executor is None:
+        return await asyncio.to_thread(run_diagnosis, **inputs)
+    return await executor.run(**inputs)
@@ -0,0 +1,37 @@
+"""
+Telemetry for the Medical Expert System.
+
+Prometheus-style metrics aggregated across uvicorn worker processes, and
+sampled request tracing, slow-request logging and an on-demand sampling
+profiler.
+"""
+
+from .metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricFamily,
+    MetricsRegistry,
+    counter,
+    gauge,
+    get_registry,
+    histogram,
+)
+from .tracing import Span, Trace, annotate, current_trace, span
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricFamily",
+    "MetricsRegistry",
+    "counter",
+    "gauge",
+    "get_registry",
+    "histogram",
+    "Span",
+    "Trace",
+    "annotate",
+    "current_trace",
+    "span",
+]
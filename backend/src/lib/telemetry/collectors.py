@@ -0,0 +1,120 @@
+"""
+Collectors exporting the AI layer's component statistics as metrics.
+
+The response cache, single-flight coordinator, upstream limiter, circuit
+breakers and model router already count what they do; these collectors
+read their stats() at scrape time so the hot paths pay nothing extra.
+"""
+
+from typing import Dict, List
+
+from .metrics import MetricFamily
+
+
+def _family(name: str, kind: str, help: str, samples: Dict, aggregate: str = "sum") -> MetricFamily:
+    return MetricFamily(name, kind, help, samples, aggregate=aggregate)
+
+
+def ai_component_metrics() -> List[MetricFamily]:
+    """Families built from the AI components of this process."""
+    # Imported here: the AI modules themselves import the metrics module
+    from ..ai.circuit_breaker import OPEN, all_circuit_breakers
+    from ..ai.model_routing import get_model_router
+    from ..ai.rate_limit import SQLiteLimiterBackend, get_upstream_limiter
+    from ..ai.response_cache import get_response_cache
+    from ..ai.single_flight import get_single_flight
+
+    families = []
+
+    cache = get_response_cache()
+    if cache is not None:
+        stats = cache.stats()
+        families.append(_family("llm_cache_lookups_total", "counter", "Response cache lookups by result", {
+            (("result", "hit"),): stats["hits"],
+            (("result", "miss"),): stats["misses"],
+            (("result", "bypass"),): stats["bypassed"],
+        }))
+        families.append(_family("llm_cache_stores_total", "counter", "Completions stored in the response cache",
+                                {(): stats["stores"]}))
+        # A shared (sqlite) cache reports the same entries from every worker
+        shared = stats["backend"] != "MemoryCacheBackend"
+        families.append(_family("llm_cache_entries", "gauge", "Entries in the response cache",
+                                {(): stats["entries"]}, aggregate="max" if shared else "sum"))
+
+    flights = get_single_flight().stats()
+    families.append(_family("llm_single_flight_in_flight", "gauge", "Distinct upstream requests in flight",
+                            {(): flights["in_flight"]}))
+    families.append(_family("llm_single_flight_requests_total", "counter",
+                            "LLM requests by single-flight role (leaders call upstream, followers share)", {
+                                (("mode", "call"), ("role", "leader")): flights["leaders"],
+                                (("mode", "call"), ("role", "follower")): flights["coalesced"],
+                                (("mode", "stream"), ("role", "leader")): flights["stream_leaders"],
+                                (("mode", "stream"), ("role", "follower")): flights["stream_coalesced"],
+                            }))
+
+    limiter = get_upstream_limiter()
+    stats = limiter.stats()
+    # The sqlite backend counts slots for the whole host, not per worker
+    shared = isinstance(limiter.backend, SQLiteLimiterBackend)
+    families.append(_family("llm_limiter_in_flight", "gauge", "Upstream LLM concurrency slots in use",
+                            {(): stats["in_flight"]}, aggregate="max" if shared else "sum"))
+    families.append(_family("llm_limiter_requests_total", "counter", "Upstream admission decisions by outcome", {
+        (("outcome", "admitted"),): stats["admitted"],
+        (("outcome", "queued"),): stats["queued"],
+        (("outcome", "rejected"),): stats["rejected"],
+    }))
+    families.append(_family("llm_limiter_wait_seconds_total", "counter",
+                            "Time requests spent queued for upstream capacity", {(): stats["wait_seconds"]}))
+
+    breakers = all_circuit_breakers()
+    if breakers:
+        open_samples, opened_samples, rejected_samples = {}, {}, {}
+        for upstream, breaker in breakers.items():
+            stats = breaker.stats()
+            key = (("upstream", upstream),)
+            open_samples[key] = 1 if stats["state"] == OPEN else 0
+            opened_samples[key] = stats["times_opened"]
+            rejected_samples[key] = stats["rejected"]
+        families.append(_family("llm_circuit_breaker_open", "gauge",
+                                "1 while any worker's circuit to the upstream is open", open_samples, aggregate="max"))
+        families.append(_family("llm_circuit_breaker_opened_total", "counter",
+                                "Times the upstream circuit opened", opened_samples))
+        families.append(_family("llm_circuit_breaker_rejected_total", "counter",
+                                "Calls failed fast while the circuit was open", rejected_samples))
+
+    decisions = get_model_router().stats()["decisions"]
+    if decisions:
+        families.append(_family("llm_routing_decisions_total", "counter", "Model routing decisions by reason",
+                                {(("model", key.rpartition(":")[0]), ("reason", key.rpartition(":")[2])): count
+                                 for key, count in decisions.items()}))
+
+    return families
+
+
+def cache_hit_ratio(merged: Dict[str, MetricFamily]) -> List[MetricFamily]:
+    """Response cache hit ratio computed from the merged lookup counts."""
+    lookups = merged.get("llm_cache_lookups_total")
+    if lookups is None:
+        return []
+    hits = lookups.samples.get((("result", "hit"),), 0)
+    misses = lookups.samples.get((("result", "miss"),), 0)
+    ratio = hits / (hits + misses) if hits + misses else 0.0
+    return [_family("llm_cache_hit_ratio", "gauge", "Response cache hits / (hits + misses) across workers",
+                    {(): round(ratio, 4)})]
+
+
+def compression_ratio(merged: Dict[str, MetricFamily]) -> List[MetricFamily]:
+    """Overall compressed / original bytes per content coding, from the merged byte counts."""
+    compressed_bytes = merged.get("http_compression_bytes_total")
+    if compressed_bytes is None:
+        return []
+    totals: Dict[str, Dict[str, float]] = {}
+    for labels, value in compressed_bytes.samples.items():
+        label = dict(labels)
+        totals.setdefault(label["encoding"], {})[label["direction"]] = value
+    samples = {(("encoding", encoding),): round(sizes.get("out", 0) / sizes["in"], 4)
+               for encoding, sizes in totals.items() if sizes.get("in")}
+    if not samples:
+        return []
+    return [_family("http_compression_ratio_overall", "gauge",
+                    "Compressed / original response bytes across workers", samples)]
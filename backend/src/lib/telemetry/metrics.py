@@ -0,0 +1,537 @@
+"""
+Prometheus-style metrics.
+
+Counters, gauges and histograms keep one value table per thread, so the
+hot path is a plain dict update with no lock; the tables are only summed
+when metrics are collected. Component statistics (cache, limiter, breaker,
+...) are pulled at collection time through registered collectors.
+
+uvicorn runs several worker processes, so each process writes its snapshot
+to METRICS_DIR/metrics-<pid>.json every METRICS_FLUSH_SECONDS from a
+background thread, and the worker answering a scrape merges its own live
+values with the other workers' files: counters and histograms are summed
+over all processes that ever wrote (so totals survive worker restarts),
+gauges over live processes only. Other workers' values are therefore up to
+one flush interval old. The files of exited processes are folded into a
+single metrics-retired.json on the next scrape, so the directory does not
+grow with every restart.
+"""
+
+import atexit
+import bisect
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Counters and histograms of exited processes, folded into one snapshot
+RETIRED_SNAPSHOT = "metrics-retired.json"
+
+LabelPairs = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class MetricFamily:
+    """A metric and its samples, keyed by label pairs."""
+    name: str
+    kind: str  # counter, gauge or histogram
+    help: str
+    samples: Dict[LabelPairs, object] = field(default_factory=dict)
+    # Histogram upper bounds (without +Inf)
+    buckets: Optional[Tuple[float, ...]] = None
+    # How gauges combine across processes: "sum" or "max"
+    aggregate: str = "sum"
+
+
+class _Metric:
+    """Base class: per-thread value tables summed on collection."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def reset(self) -> None:
+        """Drop every recorded value."""
+        # A new lock: after a fork the old one may be held by a thread that no longer exists
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+
+    def _labels(self, labelvalues: Tuple) -> Tuple:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+        return tuple(str(v) for v in labelvalues)
+
+    def _snapshots(self) -> List[List[Tuple]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # Copying a dict's items is atomic under the GIL
+        return [list(shard.items()) for shard in shards]
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, self.kind, self.documentation)
+        for items in self._snapshots():
+            for labelvalues, value in items:
+                key = tuple(zip(self.labelnames, labelvalues))
+                family.samples[key] = family.samples.get(key, 0.0) + value
+        return family
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1.0) -> None:
+        values = self._shard()
+        key = self._labels(labelvalues)
+        values[key] = values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (e.g. requests in flight)."""
+
+    kind = "gauge"
+
+    def inc(self, *labelvalues, amount: float = 1.0) -> None:
+        values = self._shard()
+        key = self._labels(labelvalues)
+        values[key] = values.get(key, 0.0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1.0) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues) -> None:
+        values = self._shard()
+        key = self._labels(labelvalues)
+        # [count per bucket..., +Inf bucket, sum]
+        entry = values.get(key)
+        if entry is None:
+            entry = values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, self.kind, self.documentation, buckets=self.buckets)
+        for items in self._snapshots():
+            for labelvalues, entry in items:
+                entry = list(entry)
+                key = tuple(zip(self.labelnames, labelvalues))
+                current = family.samples.get(key)
+                if current is None:
+                    family.samples[key] = entry
+                else:
+                    family.samples[key] = [a + b for a, b in zip(current, entry)]
+        return family
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(target: Dict[str, MetricFamily], family: MetricFamily) -> None:
+    existing = target.get(family.name)
+    if existing is None:
+        target[family.name] = MetricFamily(
+            family.name, family.kind, family.help, dict(family.samples), family.buckets, family.aggregate,
+        )
+        return
+    for key, value in family.samples.items():
+        current = existing.samples.get(key)
+        if current is None:
+            existing.samples[key] = value
+        elif family.kind == "histogram":
+            existing.samples[key] = [a + b for a, b in zip(current, value)]
+        elif family.aggregate == "max":
+            existing.samples[key] = max(current, value)
+        else:
+            existing.samples[key] = current + value
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process, plus the files other workers wrote.
+
+    Args:
+        directory: Where per-process snapshots are exchanged (None keeps
+            metrics process-local)
+        flush_interval: Minimum seconds between snapshot writes
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 5.0):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._derived: List[Callable[[Dict[str, MetricFamily]], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+        self._flusher_pid: Optional[int] = None
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, *args, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """Add a callable returning MetricFamily objects built from component stats."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def register_derived(self, derive: Callable[[Dict[str, MetricFamily]], Iterable[MetricFamily]]) -> None:
+        """Add a callable computing extra families (e.g. ratios) from the merged totals."""
+        with self._lock:
+            self._derived.append(derive)
+
+    def collect(self) -> List[MetricFamily]:
+        """Families for this process only."""
+        families = [metric.collect() for metric in list(self._metrics.values())]
+        for collector in list(self._collectors):
+            families.extend(collector())
+        return families
+
+    def reset_after_fork(self) -> None:
+        """
+        Start a forked worker from zero.
+
+        Values recorded by the parent before forking (e.g. while preloading)
+        would otherwise be reported by every worker. The parent's flusher
+        thread (if any) does not exist in the child, so the child starts
+        its own.
+        """
+        self._lock = threading.Lock()
+        for metric in list(self._metrics.values()):
+            metric.reset()
+        self.start_flusher()
+
+    def flush(self) -> None:
+        """Write this process's snapshot for other workers to merge."""
+        if self.directory is None:
+            return
+        try:
+            _write_snapshot(self.directory / f"metrics-{os.getpid()}.json", os.getpid(), self.collect())
+        except OSError:
+            pass
+
+    def start_flusher(self) -> None:
+        """Flush every flush_interval from a daemon thread (once per process)."""
+        if self.directory is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        atexit.register(self.flush)
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        threading.Thread(target=run, name="metrics-flusher", daemon=True).start()
+
+    @contextmanager
+    def _directory_lock(self, exclusive: bool) -> Iterator[bool]:
+        """flock on the snapshot directory; yields False when it is not taken."""
+        try:
+            import fcntl
+        except ImportError:
+            # No flock (Windows): read without it and never compact
+            yield not exclusive
+            return
+        try:
+            handle = open(self.directory / ".lock", "a")
+        except OSError:
+            yield not exclusive
+            return
+        with handle:
+            try:
+                # Compaction is skipped, not waited for, while a scrape is reading
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _retire_dead_processes(self) -> None:
+        """
+        Fold the snapshots of exited processes into RETIRED_SNAPSHOT.
+
+        Their counters and histograms still count towards the totals, but
+        restarted workers and earlier runs no longer leave a file each to
+        be re-read on every scrape.
+        """
+        dead = []
+        for path in self.directory.glob("metrics-*.json"):
+            pid = path.stem[len("metrics-"):]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                dead.append(path)
+        if not dead:
+            return
+        with self._directory_lock(exclusive=True) as locked:
+            if not locked:
+                return
+            retired_path = self.directory / RETIRED_SNAPSHOT
+            merged: Dict[str, MetricFamily] = {}
+            for family in _read_snapshot(retired_path)[1]:
+                _merge(merged, family)
+            folded = []
+            for path in dead:
+                pid, families = _read_snapshot(path)
+                if pid is None:
+                    continue
+                for family in families:
+                    if family.kind != "gauge":
+                        _merge(merged, family)
+                folded.append(path)
+            if not folded:
+                return
+            try:
+                _write_snapshot(retired_path, None, merged.values())
+                for path in folded:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def _read_other_processes(self) -> List[Tuple[Optional[int], List[MetricFamily]]]:
+        processes = []
+        own_pid = os.getpid()
+        if not self.directory.is_dir():
+            return processes
+        self._retire_dead_processes()
+        with self._directory_lock(exclusive=False):
+            for path in self.directory.glob("metrics-*.json"):
+                pid, families = _read_snapshot(path)
+                if pid == own_pid or not families:
+                    continue
+                processes.append((pid, families))
+        return processes
+
+    def aggregate(self) -> List[MetricFamily]:
+        """Families merged across all worker processes."""
+        merged: Dict[str, MetricFamily] = {}
+        for family in self.collect():
+            _merge(merged, family)
+        if self.directory is not None:
+            for pid, families in self._read_other_processes():
+                alive = pid is not None and _pid_alive(pid)
+                for family in families:
+                    if family.kind == "gauge" and not alive:
+                        continue
+                    _merge(merged, family)
+        for derive in list(self._derived):
+            for family in derive(merged):
+                merged[family.name] = family
+        return [merged[name] for name in sorted(merged)]
+
+    def render(self) -> str:
+        """Prometheus text exposition of the merged metrics."""
+        lines = []
+        for family in self.aggregate():
+            lines.append(f"# HELP {family.name} {_escape_help(family.help)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for key, value in sorted(family.samples.items()):
+                if family.kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(family.buckets + (math.inf,), value[:-1]):
+                        cumulative += count
+                        lines.append(
+                            f"{family.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} "
+                            f"{cumulative}"
+                        )
+                    lines.append(f"{family.name}_sum{_format_labels(key)} {_format_value(value[-1])}")
+                    lines.append(f"{family.name}_count{_format_labels(key)} {cumulative}")
+                else:
+                    lines.append(f"{family.name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _write_snapshot(path: Path, pid: Optional[int], families: Iterable[MetricFamily]) -> None:
+    payload = {
+        "pid": pid,
+        "written_at": time.time(),
+        "families": [
+            {
+                "name": f.name,
+                "kind": f.kind,
+                "help": f.help,
+                "buckets": f.buckets,
+                "aggregate": f.aggregate,
+                "samples": [[list(map(list, key)), value] for key, value in f.samples.items()],
+            }
+            for f in families
+        ],
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_snapshot(path: Path) -> Tuple[Optional[int], List[MetricFamily]]:
+    """(pid, families) from a snapshot file; no families if it is gone or unreadable."""
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None, []
+    families = [
+        MetricFamily(
+            f["name"], f["kind"], f["help"],
+            {tuple(tuple(pair) for pair in key): value for key, value in f["samples"]},
+            tuple(f["buckets"]) if f.get("buckets") else None,
+            f.get("aggregate", "sum"),
+        )
+        for f in payload.get("families", [])
+    ]
+    return payload.get("pid"), families
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(pairs: LabelPairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(str(value))}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _server_pid() -> int:
+    """Pid of the server this process belongs to."""
+    # Only a process started by multiprocessing has a parent_process(), and
+    # spawn_main has imported multiprocessing by then
+    multiprocessing = sys.modules.get("multiprocessing")
+    if multiprocessing is not None and multiprocessing.parent_process() is not None:
+        return os.getppid()
+    return os.getpid()
+
+
+def create_registry_from_env() -> MetricsRegistry:
+    """
+    Build the registry described by METRICS_* variables.
+
+    Snapshots go to METRICS_DIR, by default a temp directory named after
+    the server process: the uvicorn supervisor for the workers it spawns,
+    otherwise this process itself. Keying it on the parent alone would let
+    servers restarted from the same shell share (and keep adding to) one
+    directory. METRICS_MULTIPROCESS=0 keeps metrics process-local.
+    """
+    directory = None
+    if os.getenv("METRICS_MULTIPROCESS", "1") != "0":
+        directory = os.getenv("METRICS_DIR") or os.path.join(
+            tempfile.gettempdir(), f"medical-expert-metrics-{_server_pid()}"
+        )
+    return MetricsRegistry(directory, flush_interval=float(os.getenv("METRICS_FLUSH_SECONDS", "5")))
+
+
+# Global instance for reuse
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """Get or create the process-wide metrics registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from .collectors import ai_component_metrics, cache_hit_ratio, compression_ratio
+
+                registry = create_registry_from_env()
+                registry.register_collector(ai_component_metrics)
+                registry.register_derived(cache_hit_ratio)
+                registry.register_derived(compression_ratio)
+                _registry = registry
+    return _registry
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Get or create a counter in the global registry."""
+    return get_registry().counter(name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Get or create a gauge in the global registry."""
+    return get_registry().gauge(name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a histogram in the global registry."""
+    return get_registry().histogram(name, documentation, labelnames, buckets)
@@ -0,0 +1,170 @@
+"""
+On-demand sampling profiler.
+
+A ProfileSession captures the next N requests handled by this worker: while
+at least one of them is running, a background thread reads every thread's
+Python stack (sys._current_frames) at a fixed interval and counts identical
+stacks. The result is returned in the collapsed-stack format understood by
+flamegraph.pl, speedscope and inferno:
+
+    root_func (module.py:12);child (other.py:40);leaf (leaf.py:7) 42
+
+Sampling all threads (rather than cProfile, which only instruments the
+thread that enables it) is what makes this work under ASGI, where sync views
+run in per-request worker threads and async code runs on the event loop.
+Idle threads (blocked in a wait/select/poll, or an idle executor worker) and
+known background threads are left out of the output.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+# Leaf frames of threads that are parked rather than working (a thread
+# blocked in C code shows the Python function that made the call)
+IDLE_FUNCTIONS = frozenset({"wait", "select", "poll", "accept", "_worker"})
+
+# Background threads that never handle requests
+IGNORED_THREADS = frozenset({"metrics-flusher", "sampling-profiler"})
+
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> Optional[str]:
+    """Collapsed form of the stack ending at frame (root first), or None if idle."""
+    if frame.f_code.co_name in IDLE_FUNCTIONS:
+        return None
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class ProfileSession:
+    """
+    Profile of the next `requests` requests in this process.
+
+    Middleware calls begin_request() for each incoming request (it returns
+    False once enough requests have been captured) and end_request() when a
+    captured response has been fully sent. `done` is set when the last
+    captured request ends or the session is stopped.
+    """
+
+    def __init__(self, requests: int = 10, interval: float = 0.005, path_prefix: str = "/"):
+        self.requests = requests
+        self.interval = interval
+        self.path_prefix = path_prefix
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.captured = 0
+        self.completed = 0
+        self.done = threading.Event()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def begin_request(self, path: str) -> bool:
+        if not path.startswith(self.path_prefix):
+            return False
+        with self._lock:
+            if self.done.is_set() or self.captured >= self.requests:
+                return False
+            self.captured += 1
+            self._active += 1
+            self._running.set()
+        return True
+
+    def end_request(self) -> None:
+        with self._lock:
+            self._active -= 1
+            self.completed += 1
+            if self._active == 0:
+                self._running.clear()
+            if self.completed >= self.requests:
+                self.done.set()
+
+    def stop(self) -> None:
+        self.done.set()
+        # Wake the sampler if it is waiting for a request
+        self._running.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+
+    def _sample_loop(self) -> None:
+        while not self.done.is_set():
+            self._running.wait()
+            if self.done.is_set():
+                break
+            ignored = {t.ident for t in threading.enumerate() if t.name in IGNORED_THREADS}
+            for ident, frame in sys._current_frames().items():
+                if ident in ignored:
+                    continue
+                stack = collapse_stack(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, most frequent first, one per line."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "captured": self.captured,
+            "completed": self.completed,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "interval_ms": self.interval * 1000,
+        }
+
+
+class ProfilerBusyError(RuntimeError):
+    """A profile session is already running in this worker."""
+
+
+_session: Optional[ProfileSession] = None
+_session_lock = threading.Lock()
+
+
+def current_session() -> Optional[ProfileSession]:
+    """The running session, if any; middleware checks this on every request."""
+    return _session
+
+
+def start_session(requests: int = 10, interval: float = 0.005, path_prefix: str = "/") -> ProfileSession:
+    """Start profiling the next `requests` requests; one session per process at a time."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            raise ProfilerBusyError("A profile session is already running in this worker")
+        session = ProfileSession(requests=requests, interval=interval, path_prefix=path_prefix)
+        session.start()
+        _session = session
+    return session
+
+
+def finish_session(session: ProfileSession) -> None:
+    """Stop the session and let the next one start."""
+    global _session
+    session.stop()
+    with _session_lock:
+        if _session is session:
+            _session = None
@@ -0,0 +1,237 @@
+"""
+Request-scoped tracing.
+
+A trace is started per request (sampled at TRACE_SAMPLE_RATE) and stored
+in a context variable; span() records nested, timed stages under whatever
+span is current. Context variables follow the request into asyncio tasks
+and asgiref worker threads, so spans opened in the view, the LLM client or
+the diagnosis engine all land in the same trace.
+
+When the request is not being traced, span() returns a shared no-op
+context manager after a single context-variable lookup.
+
+Finished traces are logged to "src.telemetry.trace" as one JSON object per
+span and can be summarized as a Server-Timing header. Traces can also be
+recorded without being sampled, so a request that turns out to be slow can
+still be logged (to "src.telemetry.slow_requests") with its stage timings.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger("src.telemetry.trace")
+slow_logger = logging.getLogger("src.telemetry.slow_requests")
+
+_SERVER_TIMING_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Span:
+    """One timed stage of a trace."""
+
+    __slots__ = ("trace", "name", "span_id", "parent", "attributes", "start", "end", "_token")
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(4)
+        self.parent = parent
+        self.attributes = attributes
+        self.start = 0.0
+        self.end: Optional[float] = None
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def set(self, **attributes) -> None:
+        """Attach attributes discovered while the span runs (e.g. model used)."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited in a different context (e.g. an async generator closed elsewhere)
+            _current_span.set(self.parent)
+        self.trace.spans.append(self)
+
+
+class _NoopSpan:
+    """Stand-in returned by span() when the request is not traced."""
+
+    __slots__ = ()
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans recorded for one request; only sampled traces are logged in full."""
+
+    def __init__(self, name: str, attributes: Optional[Dict] = None, sampled: bool = True):
+        self.trace_id = secrets.token_hex(8)
+        self.name = name
+        self.sampled = sampled
+        self.attributes = attributes or {}
+        self.spans: List[Span] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def finish(self) -> None:
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def to_records(self) -> List[Dict]:
+        """One JSON-ready dict per span, plus the root."""
+        records = [{
+            "trace_id": self.trace_id,
+            "span_id": "root",
+            "parent_id": None,
+            "name": self.name,
+            "start_ms": 0.0,
+            "duration_ms": round(self.duration_ms, 3),
+            **self.attributes,
+        }]
+        for span in sorted(self.spans, key=lambda s: s.start):
+            records.append({
+                "trace_id": self.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent.span_id if span.parent is not None else "root",
+                "name": span.name,
+                "start_ms": round((span.start - self.start) * 1000, 3),
+                "duration_ms": round(span.duration_ms, 3),
+                **span.attributes,
+            })
+        return records
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: finished spans in start order, then the total."""
+        entries = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            if span.end is None:
+                continue
+            entries.append(f"{_SERVER_TIMING_NAME.sub('_', span.name)};dur={span.duration_ms:.2f}")
+        entries.append(f"total;dur={self.duration_ms:.2f}")
+        return ", ".join(entries)
+
+    def stage_timings(self) -> Dict[str, float]:
+        """Total milliseconds per span name (repeated stages such as retries add up)."""
+        stages: Dict[str, float] = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            stages[span.name] = round(stages.get(span.name, 0.0) + span.duration_ms, 3)
+        return stages
+
+    def log(self) -> None:
+        for record in self.to_records():
+            logger.info(json.dumps(record, default=str))
+
+    def log_slow(self, threshold_ms: float) -> None:
+        slow_logger.warning(json.dumps({
+            "event": "slow_request",
+            "trace_id": self.trace_id,
+            "duration_ms": round(self.duration_ms, 3),
+            "threshold_ms": threshold_ms,
+            **self.attributes,
+            "stages": self.stage_timings(),
+        }, default=str))
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def span(name: str, **attributes):
+    """
+    Context manager timing a stage of the current trace.
+
+    Usage:
+        with span("chat.retrieve_knowledge", chunks=3) as s:
+            ...
+            s.set(model=model_used)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    return Span(trace, name, _current_span.get(), attributes)
+
+
+def current_trace() -> Optional[Trace]:
+    """Trace of the running request, if it is being traced."""
+    return _current_trace.get()
+
+
+def annotate(**attributes) -> None:
+    """Attach request-level attributes (e.g. input sizes) to the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def activate(trace: Optional[Trace]):
+    """Make trace current; returns a token for deactivate()."""
+    _current_span.set(None)
+    return _current_trace.set(trace)
+
+
+def deactivate(token) -> None:
+    try:
+        _current_trace.reset(token)
+    except ValueError:
+        _current_trace.set(None)
+    _current_span.set(None)
+
+
+def should_sample(rate: float) -> bool:
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+class TracingConfig:
+    """Sampling and output settings, read from TRACE_* variables."""
+
+    def __init__(self, sample_rate: float = 0.0, server_timing: bool = False, log_spans: bool = True,
+                 slow_request_ms: float = 0.0):
+        self.sample_rate = sample_rate
+        self.server_timing = server_timing
+        self.log_spans = log_spans
+        self.slow_request_ms = slow_request_ms
+
+    @classmethod
+    def from_env(cls) -> "TracingConfig":
+        return cls(
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0")),
+            server_timing=os.getenv("TRACE_SERVER_TIMING", "0") == "1",
+            log_spans=os.getenv("TRACE_LOG_SPANS", "1") != "0",
+            slow_request_ms=float(os.getenv("SLOW_REQUEST_MS", "0")),
+        )
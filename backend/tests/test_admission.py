@@ -0,0 +1,53 @@
+import os
+from unittest import mock
+
+from django.test import Client, RequestFactory, SimpleTestCase
+
+from src.api.admission import NORMAL, URGENT
+from src.api.middleware.admission import CHAT, EXPERT, request_priority, route_class
+
+ORIGIN = "http://localhost:3000"
+
+
+class ShedResponseTests(SimpleTestCase):
+    def client_with_limits(self, limits: str) -> Client:
+        # AdmissionMiddleware reads its limits when the handler loads the middleware
+        with mock.patch.dict(os.environ, {"ADMISSION_CONTROL": "1", "ADMISSION_LIMITS": limits}):
+            client = Client(HTTP_ORIGIN=ORIGIN)
+            client.get("/api/ping")
+        return client
+
+    def test_shed_response_carries_cors_headers(self):
+        client = self.client_with_limits("expert=0:0")
+        response = client.post("/api/expert/diagnose", {"symptoms": ["fever"]}, content_type="application/json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(response["Access-Control-Allow-Origin"], ORIGIN)
+
+    def test_preflight_is_not_shed(self):
+        client = self.client_with_limits("expert=0:0")
+        response = client.options("/api/expert/diagnose", HTTP_ACCESS_CONTROL_REQUEST_METHOD="POST")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Access-Control-Allow-Origin"], ORIGIN)
+
+
+class AdmissionClassTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_admin_endpoints_are_exempt(self):
+        request = self.factory.post("/api/admin/profile")
+        self.assertIsNone(route_class(request))
+
+    def test_priority_header_needs_the_token(self):
+        untrusted = self.factory.post("/api/chat/message", HTTP_X_PRIORITY="urgent")
+        trusted = self.factory.post("/api/chat/message", HTTP_X_PRIORITY="urgent", HTTP_X_PRIORITY_TOKEN="secret")
+        wrong = self.factory.post("/api/chat/message", HTTP_X_PRIORITY="urgent", HTTP_X_PRIORITY_TOKEN="guess")
+        self.assertEqual(request_priority(untrusted, CHAT), NORMAL)
+        self.assertEqual(request_priority(trusted, CHAT, "secret"), URGENT)
+        self.assertEqual(request_priority(wrong, CHAT, "secret"), NORMAL)
+
+    def test_danger_signs_are_urgent_without_the_header(self):
+        symptoms = [{"name": "fever", "present": True}, {"name": "convulsions", "present": True}]
+        request = self.factory.post("/api/expert/diagnose", {"symptoms": symptoms}, content_type="application/json")
+        self.assertEqual(request_priority(request, EXPERT), URGENT)
@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.test import AsyncClient, SimpleTestCase
+
+from src.lib.ai.rate_limit import LLMBusyError
+
+BODY = {"message": "I have a fever and chills"}
+
+
+class FakeClient:
+    chunks = ()
+    error = None
+
+    def __init__(self, model):
+        self.last_model_used = model
+        self.last_cache_hit = False
+        self.last_usage = None
+
+    async def chat(self, **kwargs):
+        async def stream():
+            if self.error is not None:
+                raise self.error
+            for chunk in self.chunks:
+                yield chunk
+
+        return stream()
+
+
+class ChatStreamTests(SimpleTestCase):
+    async def post(self, client_class):
+        with mock.patch("src.api.routers.chat.LLMClient", client_class):
+            response = await AsyncClient().post("/api/chat/message/stream", BODY, content_type="application/json")
+            body = b""
+            if response.streaming:
+                body = b"".join([chunk async for chunk in response.streaming_content])
+        return response, body
+
+    async def test_busy_upstream_is_a_503_before_the_stream_starts(self):
+        class Busy(FakeClient):
+            error = LLMBusyError("busy", retry_after=2.5)
+
+        response, _ = await self.post(Busy)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+
+    async def test_reply_is_streamed_as_events(self):
+        class Replying(FakeClient):
+            chunks = ("Rest ", "and drink fluids.")
+
+        response, body = await self.post(Replying)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertIn(b'data: {"delta": "Rest "}', body)
+        self.assertIn(b'data: {"delta": "and drink fluids."}', body)
+        self.assertIn(b"event: done", body)
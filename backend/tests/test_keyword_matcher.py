@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+
+from src.api.routers.chat import extract_diseases_from_text, extract_symptoms_from_text
+from src.lib.ai.keyword_matcher import KeywordMatcher
+
+
+class KeywordMatcherTests(SimpleTestCase):
+    def test_inflected_forms_match(self):
+        cases = {
+            "I have headaches and fevers": ["headache", "fever"],
+            "I vomited twice": ["vomiting"],
+            "a bad chill": ["chills"],
+            "fever and chills and headaches": ["fever", "chills", "headache"],
+            "body ache and loose stools": ["body_aches", "diarrhea"],
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(extract_symptoms_from_text(text), expected)
+
+    def test_derived_forms_match(self):
+        cases = {
+            "I feel nauseated": ["vomiting"],
+            "nauseous since morning": ["vomiting"],
+            "feeling feverish": ["fever"],
+            "tiredness all week": ["weakness"],
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(extract_symptoms_from_text(text), expected)
+
+    def test_inflected_disease_keywords_match(self):
+        self.assertEqual(extract_diseases_from_text("bitten by mosquitoes"), ["malaria"])
+        self.assertEqual(extract_diseases_from_text("lots of mosquitoes two weeks ago"), ["malaria"])
+
+    def test_keywords_start_on_a_word_boundary(self):
+        self.assertEqual(extract_symptoms_from_text("I got a flu shot and tweaked my back"), [])
+        self.assertEqual(extract_symptoms_from_text("a flat tire"), [])
+
+    def test_offsets_cover_the_inflected_word(self):
+        matcher = KeywordMatcher({"headache": ["headache"]})
+        [match] = matcher.find_all("Two Headaches today")
+        self.assertEqual((match.keyword, match.start, match.end), ("headache", 4, 13))
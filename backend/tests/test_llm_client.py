@@ -0,0 +1,68 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase
+
+from src.lib.ai.llm_client import LLMClient
+from src.lib.ai.retry import LLMUnavailableError, RetryPolicy
+
+MESSAGES = [{"role": "user", "content": "I have a fever"}]
+
+
+class Trickle(httpx.AsyncByteStream):
+    """A body that keeps every read well under httpx's per-read timeout."""
+
+    def __init__(self, lines, interval: float):
+        self.lines = lines
+        self.interval = interval
+
+    async def __aiter__(self):
+        for line in self.lines:
+            await asyncio.sleep(self.interval)
+            yield line.encode("utf-8")
+
+
+def trickling_upstream(stream: bool):
+    def handler(request):
+        if stream:
+            chunk = {"choices": [{"delta": {"content": "word "}}]}
+            lines = [f"data: {json.dumps(chunk)}\n\n"] * 20 + ["data: [DONE]\n\n"]
+        else:
+            body = json.dumps({"choices": [{"message": {"content": "Rest."}}]})
+            lines = [body[i:i + 4] for i in range(0, len(body), 4)]
+        return httpx.Response(200, stream=Trickle(lines, 0.05))
+
+    @asynccontextmanager
+    async def http_client():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            yield client
+
+    return mock.patch("src.lib.ai.llm_client.http_client", http_client)
+
+
+class DeadlineTests(SimpleTestCase):
+    def llm(self, base_url: str) -> LLMClient:
+        return LLMClient(
+            api_key="test", base_url=base_url, use_cache=False,
+            retry_policy=RetryPolicy(max_attempts=1), fallback_models=[], request_timeout=0.3,
+        )
+
+    async def test_trickling_response_does_not_outlive_the_deadline(self):
+        started = time.monotonic()
+        with trickling_upstream(stream=False), self.assertRaises(LLMUnavailableError):
+            await self.llm("http://trickle-json.test").chat(MESSAGES, timeout=0.3)
+        self.assertLess(time.monotonic() - started, 0.6)
+
+    async def test_trickling_stream_does_not_outlive_the_deadline(self):
+        started = time.monotonic()
+        chunks = []
+        with trickling_upstream(stream=True), self.assertRaises(httpx.TimeoutException):
+            stream = await self.llm("http://trickle-stream.test").chat(MESSAGES, stream=True, timeout=0.3)
+            async for chunk in stream:
+                chunks.append(chunk)
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertTrue(0 < len(chunks) < 20)
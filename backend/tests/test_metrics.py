@@ -0,0 +1,50 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from src.lib.telemetry.metrics import MetricsRegistry, _server_pid, create_registry_from_env
+
+
+class ForkedWorkerSnapshotTests(SimpleTestCase):
+    def test_forked_worker_writes_its_own_snapshot(self):
+        directory = tempfile.mkdtemp()
+        registry = MetricsRegistry(directory, flush_interval=0.05)
+        requests = registry.counter("requests_total", "Requests")
+        requests.inc()
+
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                registry.reset_after_fork()
+                requests.inc()
+                time.sleep(0.3)
+                status = 0
+            finally:
+                os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+        with open(os.path.join(directory, f"metrics-{pid}.json"), encoding="utf-8") as f:
+            snapshot = json.load(f)
+        [family] = [f for f in snapshot["families"] if f["name"] == "requests_total"]
+        # Only the child's own increment, not the parent's from before the fork
+        self.assertEqual(family["samples"], [[[], 1]])
+
+
+class DefaultDirectoryTests(SimpleTestCase):
+    def test_single_process_server_keys_directory_on_itself(self):
+        with mock.patch.dict(os.environ, {"METRICS_MULTIPROCESS": "1"}):
+            os.environ.pop("METRICS_DIR", None)
+            registry = create_registry_from_env()
+        # Not on the parent: servers restarted from one shell must not share it
+        self.assertEqual(registry.directory.name, f"medical-expert-metrics-{os.getpid()}")
+
+    def test_spawned_worker_keys_directory_on_its_supervisor(self):
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            self.assertEqual(pool.apply(_server_pid), os.getpid())
@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from src.lib.ai.model_routing import ModelRouter
+
+FAST = "gemma2-9b-it"
+SLOW = "llama-3.1-8b-instant"
+
+
+class ModelRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ModelRouter(mode="adaptive", min_samples=3)
+
+    def measure(self, model_id, latency, completion_tokens, times=3):
+        for _ in range(times):
+            self.router.record(model_id, latency, ok=True, completion_tokens=completion_tokens)
+
+    def test_unmeasured_models_are_explored_before_a_slow_measured_one(self):
+        self.measure(SLOW, latency=6.0, completion_tokens=60)
+        model_id, reason = self.router.choose(conversation_tokens=50, turns=0)
+        self.assertNotEqual(model_id, SLOW)
+        self.assertEqual(reason, "explore")
+
+    def test_fastest_is_ranked_by_measured_tokens_per_second(self):
+        self.measure(SLOW, latency=6.0, completion_tokens=60)
+        self.measure(FAST, latency=1.0, completion_tokens=200)
+        self.measure("mixtral-8x7b-32768", latency=2.0, completion_tokens=100)
+        self.measure("llama-3.3-70b-versatile", latency=4.0, completion_tokens=200)
+        self.assertEqual(self.router.choose(conversation_tokens=50, turns=0), (FAST, "fastest"))
+
+    def test_complex_requests_still_go_to_the_large_model(self):
+        model_id, reason = self.router.choose(conversation_tokens=5000, turns=8)
+        self.assertEqual((model_id, reason), ("llama-3.3-70b-versatile", "complex"))
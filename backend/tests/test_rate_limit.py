@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from django.test import SimpleTestCase
+
+from src.lib.ai.rate_limit import LLMBusyError, MemoryLimiterBackend, UpstreamLimiter
+
+
+class SlowBackend(MemoryLimiterBackend):
+    """Takes its lease in a worker thread, like the sqlite backend."""
+
+    blocking = True
+
+    def try_acquire_slot(self, lease_id, limit, lease_ttl):
+        time.sleep(0.1)
+        return super().try_acquire_slot(lease_id, limit, lease_ttl)
+
+
+class SlotTests(SimpleTestCase):
+    async def test_cancelled_acquire_gives_the_lease_back(self):
+        backend = SlowBackend()
+        limiter = UpstreamLimiter(backend, max_concurrency=1)
+
+        async def request():
+            async with limiter.slot():
+                await asyncio.sleep(1)
+
+        task = asyncio.create_task(request())
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        # Past the point where the backend thread has taken the lease
+        await asyncio.sleep(0.15)
+        self.assertEqual(backend.in_flight(), 0)
+
+    async def test_busy_slot_releases_nothing_it_does_not_hold(self):
+        backend = MemoryLimiterBackend()
+        limiter = UpstreamLimiter(backend, max_concurrency=1, max_wait=0)
+
+        async with limiter.slot():
+            with self.assertRaises(LLMBusyError):
+                async with limiter.slot():
+                    pass
+            self.assertEqual(backend.in_flight(), 1)
+        self.assertEqual(backend.in_flight(), 0)
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from django.test import SimpleTestCase
+
+from src.lib import deadline
+from src.lib.ai.single_flight import SingleFlight
+
+
+class SingleFlightTests(SimpleTestCase):
+    async def test_follower_takes_over_when_leader_is_cancelled(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def fetch(name):
+            calls.append(name)
+            await asyncio.sleep(0.05)
+            return name
+
+        leader = asyncio.create_task(flights.do("key", lambda: fetch("leader")))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flights.do("key", lambda: fetch("follower")))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        self.assertEqual(await follower, ("follower", False))
+        self.assertEqual(calls, ["leader", "follower"])
+
+    async def test_follower_takes_over_when_leader_deadline_passes(self):
+        flights = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            raise TimeoutError("deadline exceeded")
+
+        async def lead():
+            deadline.activate(time.monotonic() + 0.02)
+            return await flights.do("key", fetch)
+
+        async def follow():
+            await asyncio.sleep(0.01)
+            return await flights.do("key", lambda: asyncio.sleep(0, result="answer"))
+
+        leader, follower = await asyncio.gather(lead(), follow(), return_exceptions=True)
+        self.assertIsInstance(leader, TimeoutError)
+        self.assertEqual(follower, ("answer", False))
+
+    async def test_upstream_errors_reach_followers(self):
+        flights = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(flights.do("key", fetch), flights.do("key", fetch), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    async def test_stream_continues_for_followers_when_leader_disconnects(self):
+        flights = SingleFlight()
+
+        async def upstream():
+            for chunk in "abcd":
+                await asyncio.sleep(0.01)
+                yield chunk
+
+        async def read(limit=None):
+            chunks = []
+            stream = flights.stream("key", upstream)
+            async for chunk in stream:
+                chunks.append(chunk)
+                if len(chunks) == limit:
+                    await stream.aclose()
+                    break
+            return "".join(chunks)
+
+        leader, follower = await asyncio.gather(read(limit=1), read())
+        self.assertEqual((leader, follower), ("a", "abcd"))
@@ -0,0 +1,16 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from src.api.middleware.tracing import TracingMiddleware
+from src.lib.telemetry.tracing import TracingConfig
+
+
+class TracingMiddlewareTests(SimpleTestCase):
+    def test_malformed_content_length_is_not_traced(self):
+        middleware = TracingMiddleware(lambda request: HttpResponse("ok"))
+        middleware.config = TracingConfig(sample_rate=1.0, log_spans=False)
+        request = RequestFactory().post("/api/ping", CONTENT_LENGTH="12abc")
+
+        response = middleware(request)
+
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,6 @@
+"""
+Development and testing tools for the Medical Expert System backend.
+
+Run from the backend directory, e.g.:
+    python -m tools.stub_llm_server
+"""
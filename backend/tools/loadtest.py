@@ -0,0 +1,575 @@
+"""
+End-to-end load test for the Medical Expert API.
+
+Drives a mixed workload of expert diagnoses, chat (JSON and SSE streaming)
+and metadata requests against a running server, ramping concurrency in
+stages, and reports per-stage throughput, p50/p95/p99 latency, error rates
+and per-process CPU/RSS of the server workers. Results are written as JSON
+so runs can be compared across commits.
+
+With --spawn the tool starts the stub LLM server and a local uvicorn itself
+(and stops them afterwards), so a full run needs no API key or network.
+
+Usage:
+    python -m tools.loadtest --spawn --workers 4 --stages 1,8,32 --duration 20 \\
+        --output loadtest.json
+    python -m tools.loadtest --base-url http://127.0.0.1:8000 --server-pattern src.config.asgi
+    python -m tools.loadtest --spawn --baseline loadtest-main.json
+
+Workload:
+    --mix diagnose=40,chat=20,chat_stream=15,metadata=25 sets the share of
+    each operation. --cases FILE replaces the synthetic cases with recorded
+    ones: a JSON list of {"op": "diagnose"|"chat"|"chat_stream", "body": {...}}
+    or {"op": "metadata", "path": "/api/..."}.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+DIAGNOSE_CASES = [
+    # Classic malaria paroxysm
+    {
+        "symptoms": [
+            {"name": "fever", "pattern": "cyclical"},
+            {"name": "chills"},
+            {"name": "sweating"},
+            {"name": "headache"},
+        ],
+        "patient": {"travel_endemic_area": True, "age": 30},
+    },
+    # Cholera with severe dehydration
+    {
+        "symptoms": [
+            {"name": "diarrhea", "description": "rice_water", "severity": "severe"},
+            {"name": "dehydration", "severity": "severe"},
+            {"name": "vomiting"},
+        ],
+        "patient": {"endemic_resident": True, "unsafe_water": True, "age": 25},
+        "dehydration_signs": [
+            {"sign": "mental_state", "finding": "lethargic"},
+            {"sign": "eyes", "finding": "sunken"},
+            {"sign": "skin_pinch", "finding": "very_slow"},
+        ],
+    },
+    # Typhoid
+    {
+        "symptoms": [
+            {"name": "fever", "pattern": "stepladder", "duration_days": 7},
+            {"name": "relative_bradycardia"},
+            {"name": "rose_spots"},
+            {"name": "abdominal_pain"},
+        ],
+        "patient": {"street_food": True, "unsafe_water": True, "age": 35},
+    },
+    # Non-specific
+    {
+        "symptoms": [{"name": "fever"}, {"name": "headache"}],
+        "patient": {"age": 28},
+    },
+    # Danger signs (cerebral malaria)
+    {
+        "symptoms": [
+            {"name": "fever", "pattern": "cyclical"},
+            {"name": "chills"},
+            {"name": "altered_consciousness"},
+            {"name": "convulsions"},
+        ],
+        "patient": {"travel_endemic_area": True, "age": 6, "is_child": True},
+    },
+]
+
+CHAT_MESSAGES = [
+    "I've had a fever and chills for three days, mostly at night.",
+    "What are the symptoms of cholera?",
+    "My stool is watery like rice water and I keep vomiting. What should I do?",
+    "I have a headache, stomach pain and constipation after eating street food.",
+    "How is malaria diagnosed?",
+    "My child is confused and has a high fever after we travelled.",
+]
+
+CHAT_HISTORY = [
+    {"role": "user", "content": "I have had a fever for a few days."},
+    {"role": "assistant", "content": "I'm sorry to hear that. Does the fever come and go, and do you have chills?"},
+    {"role": "user", "content": "Yes, it comes every other day with shaking chills."},
+    {"role": "assistant", "content": "Cyclical fever with chills can suggest malaria. Have you travelled recently?"},
+]
+
+METADATA_PATHS = [
+    "/api/ping",
+    "/api/expert/symptoms",
+    "/api/expert/diseases",
+    "/api/expert/diseases/malaria",
+    "/api/chat/models",
+]
+
+DEFAULT_MIX = "diagnose=40,chat=20,chat_stream=15,metadata=25"
+
+
+def synthetic_cases() -> Dict[str, List[Dict]]:
+    """Built-in workload: diagnoses, first-turn and multi-turn chats, metadata reads."""
+    chats = []
+    for message in CHAT_MESSAGES:
+        chats.append({"message": message})
+        chats.append({"message": message, "conversation_history": CHAT_HISTORY})
+    return {
+        "diagnose": [{"body": case} for case in DIAGNOSE_CASES],
+        "chat": [{"body": body} for body in chats],
+        "chat_stream": [{"body": body} for body in chats],
+        "metadata": [{"path": path} for path in METADATA_PATHS],
+    }
+
+
+def load_cases(path: str) -> Dict[str, List[Dict]]:
+    """Recorded workload from a JSON list of {"op", "body"|"path"} entries."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    cases = defaultdict(list)
+    for entry in entries:
+        cases[entry["op"]].append(entry)
+    return dict(cases)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        op, _, weight = part.partition("=")
+        mix[op.strip()] = float(weight)
+    return mix
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# =============================================================================
+# Server process sampling (/proc)
+# =============================================================================
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _process_table() -> Dict[int, Dict]:
+    """pid -> {"ppid", "cmdline"} for every visible process."""
+    table = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            cmdline = (entry / "cmdline").read_bytes().replace(b"\0", b" ").decode(errors="replace")
+        except OSError:
+            continue
+        table[int(entry.name)] = {"ppid": int(stat.rsplit(")", 1)[1].split()[1]), "cmdline": cmdline}
+    return table
+
+
+def find_server_pids(pattern: str) -> List[int]:
+    """
+    PIDs whose command line contains pattern, plus their descendants
+    (uvicorn workers are spawned children of the master).
+    """
+    table = _process_table()
+    found = {
+        pid for pid, info in table.items()
+        if pattern in info["cmdline"] and "tools.loadtest" not in info["cmdline"] and pid != os.getpid()
+    }
+    frontier = set(found)
+    while frontier:
+        frontier = {pid for pid, info in table.items() if info["ppid"] in frontier} - found
+        found |= frontier
+    return sorted(found)
+
+
+def read_proc(pid: int) -> Optional[Dict]:
+    """CPU seconds and RSS of a process, or None if it is gone."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    fields = stat.rsplit(")", 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    rss_kb = 0
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+            break
+    return {"cpu_seconds": cpu_seconds, "rss_mb": rss_kb / 1024}
+
+
+class ProcessSampler:
+    """Samples CPU and RSS of the server processes while a stage runs."""
+
+    def __init__(self, pids: List[int], interval: float = 0.5):
+        self.pids = pids
+        self.interval = interval
+        self._start: Dict[int, Dict] = {}
+        self._peak_rss: Dict[int, float] = defaultdict(float)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            for pid in self.pids:
+                sample = read_proc(pid)
+                if sample:
+                    self._peak_rss[pid] = max(self._peak_rss[pid], sample["rss_mb"])
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._start = {pid: read_proc(pid) for pid in self.pids}
+        self._peak_rss.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, elapsed: float) -> List[Dict]:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        results = []
+        for pid in self.pids:
+            start, end = self._start.get(pid), read_proc(pid)
+            if not start or not end:
+                continue
+            results.append({
+                "pid": pid,
+                "cpu_percent": round(100 * (end["cpu_seconds"] - start["cpu_seconds"]) / elapsed, 1),
+                "rss_mb": round(end["rss_mb"], 1),
+                "peak_rss_mb": round(max(self._peak_rss[pid], end["rss_mb"]), 1),
+            })
+        return results
+
+
+# =============================================================================
+# Workload
+# =============================================================================
+
+class Recorder:
+    """Latency and outcome records for one stage."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.ttfb: List[float] = []
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.degraded = 0
+
+    def record(self, op: str, latency: float, status: str):
+        self.latencies[op].append(latency)
+        self.statuses[op][status] += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        ops = {}
+        total = errors = 0
+        for op, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            count = len(values)
+            op_errors = sum(n for status, n in self.statuses[op].items() if not status.startswith("2"))
+            total += count
+            errors += op_errors
+            ops[op] = {
+                "requests": count,
+                "throughput_rps": round(count / elapsed, 2),
+                "error_rate": round(op_errors / count, 4) if count else 0.0,
+                "statuses": dict(self.statuses[op]),
+                "latency_ms": _latency_summary(values),
+            }
+        all_latencies = sorted(v for values in self.latencies.values() for v in values)
+        return {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "degraded_chats": self.degraded,
+            "latency_ms": _latency_summary(all_latencies),
+            "stream_ttfb_ms": _latency_summary(sorted(self.ttfb)),
+            "operations": ops,
+        }
+
+
+def _latency_summary(sorted_values: List[float]) -> Dict:
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "p50": ms(percentile(sorted_values, 0.50)),
+        "p95": ms(percentile(sorted_values, 0.95)),
+        "p99": ms(percentile(sorted_values, 0.99)),
+        "max": ms(sorted_values[-1]) if sorted_values else None,
+    }
+
+
+async def run_operation(client: httpx.AsyncClient, op: str, case: Dict, recorder: Recorder):
+    started = time.perf_counter()
+    status = "error"
+    try:
+        if op == "metadata":
+            response = await client.get(case["path"])
+            status = str(response.status_code)
+        elif op == "diagnose":
+            response = await client.post("/api/expert/diagnose", json=case["body"])
+            status = str(response.status_code)
+        elif op == "chat":
+            response = await client.post("/api/chat/message", json=case["body"])
+            status = str(response.status_code)
+            if response.status_code == 200 and response.json().get("degraded"):
+                recorder.degraded += 1
+        elif op == "chat_stream":
+            async with client.stream("POST", "/api/chat/message/stream", json=case["body"]) as response:
+                status = str(response.status_code)
+                first = True
+                event = None
+                async for line in response.aiter_lines():
+                    if first and line.startswith("data:"):
+                        recorder.ttfb.append(time.perf_counter() - started)
+                        first = False
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:") and event == "error":
+                        status = "stream_error"
+                    elif line.startswith("data:") and event == "done":
+                        if json.loads(line[5:]).get("degraded"):
+                            recorder.degraded += 1
+        else:
+            raise ValueError(f"Unknown operation: {op}")
+    except httpx.TimeoutException:
+        status = "timeout"
+    except httpx.HTTPError:
+        status = "connection_error"
+    recorder.record(op, time.perf_counter() - started, status)
+
+
+async def run_stage(base_url: str, concurrency: int, duration: float, mix: Dict[str, float],
+                    cases: Dict[str, List[Dict]], pids: List[int], rng: random.Random,
+                    timeout: float) -> Dict:
+    """Run `concurrency` closed-loop users for `duration` seconds."""
+    ops = [op for op in mix if cases.get(op)]
+    weights = [mix[op] for op in ops]
+    recorder = Recorder()
+    sampler = ProcessSampler(pids)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                op = rng.choices(ops, weights)[0]
+                await run_operation(client, op, rng.choice(cases[op]), recorder)
+
+        sampler.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        processes = await sampler.stop(elapsed)
+
+    summary = recorder.summary(elapsed)
+    summary.update({
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 2),
+        "processes": processes,
+        "total_cpu_percent": round(sum(p["cpu_percent"] for p in processes), 1),
+        "total_rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+    })
+    return summary
+
+
+# =============================================================================
+# Spawned servers
+# =============================================================================
+
+def wait_for(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server did not come up: {url}")
+
+
+def spawn_servers(args) -> List[subprocess.Popen]:
+    """Start the stub LLM server and uvicorn with the API pointed at it."""
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "tools.stub_llm_server", "--port", str(args.stub_port),
+         *args.stub_args.split()],
+        cwd=BACKEND_DIR,
+    )
+    env = {**os.environ, "OPEN_API_BASE_URL": stub_url, "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "stub")}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.config.asgi:app", "--host", "127.0.0.1",
+         "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    processes = [stub, server]
+    try:
+        wait_for(f"{stub_url}/stub/stats")
+        wait_for(f"http://localhost:{args.port}/api/ping")
+    except RuntimeError:
+        stop_servers(processes)
+        raise
+    return processes
+
+
+def stop_servers(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =============================================================================
+# Reporting
+# =============================================================================
+
+def print_stage(stage: Dict) -> None:
+    latency = stage["latency_ms"]
+    print(
+        f"  c={stage['concurrency']:<4} {stage['throughput_rps']:>8.1f} req/s  "
+        f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms  "
+        f"errors={stage['error_rate']:.2%}  cpu={stage['total_cpu_percent']}%  rss={stage['total_rss_mb']}MB"
+    )
+    for op, info in stage["operations"].items():
+        print(
+            f"      {op:<12} {info['throughput_rps']:>8.1f} req/s  p95={info['latency_ms']['p95']}ms  "
+            f"errors={info['error_rate']:.2%}"
+        )
+
+
+def compare(result: Dict, baseline: Dict) -> None:
+    """Print throughput and p95 changes against a baseline run, stage by stage."""
+    print(f"\nCompared with baseline {baseline.get('revision') or baseline.get('started_at')}:")
+    base_stages = {stage["concurrency"]: stage for stage in baseline.get("stages", [])}
+    for stage in result["stages"]:
+        base = base_stages.get(stage["concurrency"])
+        if base is None:
+            continue
+        rps_delta = _relative(stage["throughput_rps"], base["throughput_rps"])
+        p95_delta = _relative(stage["latency_ms"]["p95"], base["latency_ms"]["p95"])
+        print(
+            f"  c={stage['concurrency']:<4} throughput {rps_delta}  p95 {p95_delta}  "
+            f"errors {base['error_rate']:.2%} -> {stage['error_rate']:.2%}"
+        )
+
+
+def _relative(new, old) -> str:
+    if not new or not old:
+        return "n/a"
+    return f"{(new - old) / old:+.1%}"
+
+
+async def run(args) -> Dict:
+    cases = load_cases(args.cases) if args.cases else synthetic_cases()
+    mix = parse_mix(args.mix)
+    stages = [int(c) for c in args.stages.split(",")]
+    pids = find_server_pids(args.server_pattern) if args.server_pattern else []
+    rng = random.Random(args.seed)
+
+    result = {
+        "revision": git_revision(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "base_url": args.base_url,
+        "config": {
+            "stages": stages,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": mix,
+            "cases": args.cases or "synthetic",
+            "workers": args.workers if args.spawn else None,
+            "stub_args": args.stub_args if args.spawn else None,
+            "seed": args.seed,
+        },
+        "server_pids": pids,
+        "stages": [],
+    }
+
+    if args.warmup > 0:
+        print(f"Warming up for {args.warmup}s...")
+        await run_stage(args.base_url, max(stages), args.warmup, mix, cases, [], rng, args.timeout)
+
+    for concurrency in stages:
+        stage = await run_stage(args.base_url, concurrency, args.duration, mix, cases, pids, rng, args.timeout)
+        result["stages"].append(stage)
+        print_stage(stage)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Medical Expert API")
+    parser.add_argument("--base-url", default=None, help="Server to test (default: spawned server)")
+    parser.add_argument("--stages", default="1,4,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per stage")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Warm-up seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights")
+    parser.add_argument("--cases", help="JSON file with recorded cases")
+    parser.add_argument("--timeout", type=float, default=90.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server-pattern", default=None,
+                        help="Command-line substring identifying server processes for CPU/RSS")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare with a previous JSON result")
+    parser.add_argument("--spawn", action="store_true", help="Start stub LLM + uvicorn for the run")
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn workers when spawning")
+    parser.add_argument("--port", type=int, default=8100, help="API port when spawning")
+    parser.add_argument("--stub-port", type=int, default=8101, help="Stub LLM port when spawning")
+    parser.add_argument("--stub-args", default="--seed 1", help="Extra stub server arguments")
+    args = parser.parse_args()
+
+    processes = []
+    if args.spawn:
+        processes = spawn_servers(args)
+        # "localhost" is in ALLOWED_HOSTS; uvicorn itself binds 127.0.0.1
+        args.base_url = args.base_url or f"http://localhost:{args.port}"
+        args.server_pattern = args.server_pattern or f"--port {args.port} --workers"
+    elif not args.base_url:
+        parser.error("--base-url is required unless --spawn is given")
+
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        stop_servers(processes)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Stub OpenAI-compatible LLM server for offline load and latency testing.
+
+Implements POST /chat/completions (JSON and SSE streaming) and GET /models
+with configurable time-to-first-token distributions, token throughput,
+error injection and deterministic canned outputs, so the whole chat path
+can be exercised without a GROQ_API_KEY or network access.
+
+Point the API at it with:
+    OPEN_API_BASE_URL=http://127.0.0.1:8001 GROQ_API_KEY=stub make dev
+
+Usage:
+    python -m tools.stub_llm_server [--port 8001] [--ttft lognormal:0.3,0.4]
+        [--tokens-per-sec 250] [--error-rate 0.02] [--error-status 429,500]
+        [--timeout-rate 0.01] [--model-speed llama-3.1-8b-instant=0.3] [--seed 7]
+
+Latency specs:
+    fixed:S            always S seconds
+    uniform:A,B        uniformly between A and B seconds
+    lognormal:M,SIGMA  log-normal with median M seconds and shape SIGMA
+
+GET /stub/stats returns request counts by model and outcome.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+
+# Deterministic replies, picked by a hash of the last user message
+CANNED_RESPONSES = [
+    "Thank you for sharing that. Fever with chills and sweating that comes and goes can "
+    "point to malaria, especially after travel to an endemic area. A rapid diagnostic test "
+    "or blood smear is the quickest way to confirm it. Please see a clinician today if the "
+    "fever is high or you feel confused or very weak.",
+    "Watery diarrhea with vomiting can dehydrate you quickly. Start oral rehydration "
+    "solution now, taking small frequent sips. Rice-water stools or signs of severe "
+    "dehydration such as sunken eyes or very slow skin pinch need urgent care.",
+    "A fever that climbs step by step over several days, with headache, abdominal pain and "
+    "constipation, is typical of typhoid fever. A blood culture in the first week is the "
+    "most reliable test. Avoid self-medicating with antibiotics before testing.",
+    "I understand. Could you tell me how long you have had these symptoms, whether the "
+    "fever follows a pattern, and whether you have travelled or drunk untreated water "
+    "recently? That helps narrow down the possibilities.",
+]
+
+WORD_RE = re.compile(r"\S+\s*")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Build a sampler from a latency spec such as 'uniform:0.1,0.5'."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise argparse.ArgumentTypeError(f"Invalid latency spec: {spec}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class StubConfig:
+    """Behavior of the stub server."""
+
+    def __init__(
+        self,
+        ttft: str = "lognormal:0.3,0.4",
+        tokens_per_sec: float = 250.0,
+        error_rate: float = 0.0,
+        error_status: Optional[List[int]] = None,
+        timeout_rate: float = 0.0,
+        timeout_seconds: float = 120.0,
+        retry_after: float = 1.0,
+        model_speed: Optional[Dict[str, float]] = None,
+        responses: Optional[List[str]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.ttft_spec = ttft
+        self.ttft = parse_latency(ttft)
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.error_status = error_status or [429, 500]
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.retry_after = retry_after
+        self.model_speed = model_speed or {}
+        self.responses = responses or CANNED_RESPONSES
+        self.rng = random.Random(seed)
+
+    def reply_for(self, messages: List[Dict]) -> str:
+        """Deterministic reply for a conversation (keyed on the last user turn)."""
+        last_user = next(
+            (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        digest = hashlib.sha256(last_user.encode("utf-8")).digest()
+        return self.responses[int.from_bytes(digest[:4], "big") % len(self.responses)]
+
+
+class StubLLMServer:
+    """ASGI application emulating the OpenAI chat completions API."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.stats: Counter = Counter()
+        self.started_at = time.time()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"].rstrip("/")
+        method = scope["method"]
+        if method == "POST" and path.endswith("/chat/completions"):
+            body = await self._read_body(receive)
+            await self._chat_completions(body, send)
+        elif method == "GET" and path.endswith("/models"):
+            await self._send_json(send, 200, {"object": "list", "data": self._models()})
+        elif method == "GET" and path == "/stub/stats":
+            await self._send_json(send, 200, {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "ttft": self.config.ttft_spec,
+                "tokens_per_sec": self.config.tokens_per_sec,
+                "requests": dict(self.stats),
+            })
+        else:
+            await self._send_json(send, 404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: Dict, headers: Optional[List] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *(headers or []),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def _models(self) -> List[Dict]:
+        from src.lib.ai.llm_client import AVAILABLE_MODELS
+
+        return [{"id": model_id, "object": "model", "owned_by": "stub"} for model_id in AVAILABLE_MODELS]
+
+    async def _chat_completions(self, raw_body: bytes, send) -> None:
+        config = self.config
+        try:
+            request = json.loads(raw_body)
+            messages = request["messages"]
+        except (ValueError, KeyError):
+            self.stats["bad_request"] += 1
+            await self._send_json(send, 400, {"error": {"message": "Invalid request body", "type": "invalid_request_error"}})
+            return
+
+        model = request.get("model", "stub")
+        speed = config.model_speed.get(model, 1.0)
+        roll = config.rng.random()
+
+        if roll < config.timeout_rate:
+            # Hang without answering; the client's timeout decides what happens
+            self.stats[f"{model}:timeout"] += 1
+            await asyncio.sleep(config.timeout_seconds)
+            return
+        if roll < config.timeout_rate + config.error_rate:
+            status = config.rng.choice(config.error_status)
+            self.stats[f"{model}:{status}"] += 1
+            headers = [(b"retry-after", str(config.retry_after).encode())] if status == 429 else []
+            await self._send_json(send, status, {
+                "error": {"message": f"Injected error {status}", "type": "stub_error"}
+            }, headers)
+            return
+
+        self.stats[f"{model}:ok"] += 1
+        text = config.reply_for(messages)
+        max_tokens = int(request.get("max_tokens") or 2048)
+        pieces = WORD_RE.findall(text)[:max_tokens]
+        usage = {
+            "prompt_tokens": sum(estimate_tokens(m.get("content", "")) + 4 for m in messages) + 3,
+            "completion_tokens": len(pieces),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = "chatcmpl-stub-" + hashlib.sha1(raw_body).hexdigest()[:12]
+        per_token = speed / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+
+        await asyncio.sleep(config.ttft(config.rng) * speed)
+
+        if not request.get("stream"):
+            await asyncio.sleep(per_token * len(pieces))
+            await self._send_json(send, 200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+        })
+
+        def event(delta: Dict, finish_reason: Optional[str] = None, **extra) -> Dict:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return {
+                "type": "http.response.body",
+                "body": f"data: {json.dumps(chunk)}\n\n".encode("utf-8"),
+                "more_body": True,
+            }
+
+        await send(event({"role": "assistant"}))
+        for piece in pieces:
+            if per_token:
+                await asyncio.sleep(per_token)
+            await send(event({"content": piece}))
+        # Groq reports usage on the final chunk under x_groq
+        await send(event({}, "stop", x_groq={"usage": usage}))
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n", "more_body": False})
+
+
+def parse_model_speed(values: List[str]) -> Dict[str, float]:
+    speeds = {}
+    for value in values or []:
+        model, _, factor = value.partition("=")
+        speeds[model] = float(factor)
+    return speeds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", default="lognormal:0.3,0.4",
+                        help="Time-to-first-token distribution (fixed:S, uniform:A,B, lognormal:M,SIGMA)")
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0,
+                        help="Completion throughput; 0 sends all tokens at once")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", default="429,500", help="Comma-separated statuses to inject")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Fraction of requests that never answer")
+    parser.add_argument("--timeout-seconds", type=float, default=120.0)
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with injected 429s")
+    parser.add_argument("--model-speed", action="append", metavar="MODEL=FACTOR",
+                        help="Latency multiplier for a model (repeatable)")
+    parser.add_argument("--responses", help="JSON file with a list of canned responses")
+    parser.add_argument("--seed", type=int, help="Seed for latency and error sampling")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            responses = json.load(f)
+
+    config = StubConfig(
+        ttft=args.ttft,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        error_status=[int(s) for s in args.error_status.split(",") if s],
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        retry_after=args.retry_after,
+        model_speed=parse_model_speed(args.model_speed),
+        responses=responses,
+        seed=args.seed,
+    )
+
+    import uvicorn
+
+    uvicorn.run(StubLLMServer(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()